@@ -29,17 +29,12 @@ class SectionAdmin(admin.ModelAdmin):
     list_filter = ['semester', 'course', 'teacher']
     search_fields = ['course__course_code', 'course__course_name', 'section_number']
     raw_id_fields = ['teacher']
-    
-    def enrolled_count(self, obj):
-        return obj.enrolled_count
-    enrolled_count.short_description = 'จำนวนที่ลงทะเบียน'
-    enrolled_count.admin_order_field = 'enrollments__count'
+    readonly_fields = ['enrolled_count', 'pending_count', 'withdrawn_count', 'completed_count']
     
     def view_enrollments_link(self, obj):
         """ลิงก์ไปดูรายละเอียดกลุ่มเรียน"""
         from django.utils.html import format_html
         from django.urls import reverse
-        count = obj.enrollments.filter(status='enrolled').count()
         # ลิงก์ไปยังหน้า view section detail
         url = reverse('academic:section_detail', args=[obj.id])
         section_name = f"{obj.course.course_code} - กลุ่ม {obj.section_number}"
@@ -47,7 +42,7 @@ class SectionAdmin(admin.ModelAdmin):
             '<a href="{}" class="button" style="background: #417690; color: white; padding: 8px 15px; text-decoration: none; border-radius: 4px; font-weight: bold; display: inline-block; margin: 2px;" target="_blank">📋 ดูกลุ่มเรียน<br><small style="font-size: 0.85em;">{}<br>👥 {} คน</small></a>',
             url,
             section_name,
-            count
+            obj.enrolled_count
         )
     view_enrollments_link.short_description = 'ดูกลุ่มเรียน'
     view_enrollments_link.allow_tags = True
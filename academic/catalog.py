@@ -0,0 +1,108 @@
+"""
+Course catalog snapshot (course_list)
+
+รายวิชาที่เปิดอยู่พร้อมอาจารย์ผู้สอนและจำนวนนักศึกษา สร้างด้วย query คงที่ 2 ตัว
+(รายวิชา + Count แบบ annotate, อาจารย์ของทุกรายวิชา) แล้วเก็บใน cache แยกตามภาคเรียน
+
+ข้อมูลใน cache เป็น dict ธรรมดา (ไม่ pickle model) key มีเลข version ของ catalog
+invalidate() เพิ่ม version ครั้งเดียวทำให้ snapshot ของทุกภาคเรียนหมดอายุพร้อมกัน
+เรียกจาก signals.py เมื่อ Course/Section/Enrollment เปลี่ยน และจากโค้ดที่ใช้ queryset.update()/bulk_create
+
+ตั้งค่า cache ที่ settings.ACADEMIC_CATALOG_CACHE_ALIAS / ACADEMIC_CATALOG_CACHE_TIMEOUT
+(cache แบบ locmem แยกตาม process - ถ้ามีหลาย worker ควรใช้ Redis/Memcached)
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Course, Section
+
+
+VERSION_KEY = 'academic:catalog:version'
+
+
+def _cache():
+    return caches[getattr(settings, 'ACADEMIC_CATALOG_CACHE_ALIAS', 'default')]
+
+
+def _new_version():
+    # เริ่มจากเวลาปัจจุบัน - ถ้า version key ถูก evict จะไม่ย้อนกลับไปใช้ key ของ snapshot เก่า
+    return time.time_ns()
+
+
+def _version(cache):
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def _key(cache, semester_id):
+    return f'academic:catalog:{_version(cache)}:{semester_id or "all"}'
+
+
+def invalidate():
+    """ทำให้ snapshot ทุกภาคเรียนหมดอายุ"""
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _new_version(), None)
+
+
+def invalidate_on_commit():
+    """invalidate() หลัง transaction commit (ไม่ให้ request อื่นสร้าง snapshot จากข้อมูลก่อน commit)"""
+    transaction.on_commit(invalidate)
+
+
+def build(semester_id=None):
+    """
+    รายการ dict ต่อรายวิชา: course (id, course_code, course_name, credit), teachers (id, name), total_students
+    semester_id: นับเฉพาะกลุ่มเรียนของภาคเรียนนั้น (และแสดงเฉพาะรายวิชาที่เปิดในภาคเรียนนั้น)
+    """
+    courses = Course.objects.filter(is_active=True)
+    sections = Section.objects.filter(course__is_active=True, teacher__isnull=False)
+    if semester_id:
+        # filter ก่อน annotate - Count ใช้ join เดียวกันจึงนับเฉพาะกลุ่มเรียนของภาคเรียนนี้
+        courses = courses.filter(sections__semester_id=semester_id)
+        sections = sections.filter(semester_id=semester_id)
+    courses = courses.annotate(total_students=Count(
+        'sections__enrollments__student',
+        distinct=True,
+        filter=Q(sections__enrollments__status='enrolled'),
+    )).values('id', 'course_code', 'course_name', 'credit', 'total_students').order_by('course_code')
+
+    teachers = {}
+    for course_id, teacher_id, username, first_name, last_name in (
+        sections.order_by('course_id', 'section_number')
+        .values_list('course_id', 'teacher_id', 'teacher__username', 'teacher__first_name', 'teacher__last_name')
+    ):
+        course_teachers = teachers.setdefault(course_id, {})
+        if teacher_id not in course_teachers:
+            full_name = f'{first_name} {last_name}'.strip()
+            course_teachers[teacher_id] = {'id': teacher_id, 'name': full_name or username}
+
+    return [
+        {
+            'course': {key: course[key] for key in ('id', 'course_code', 'course_name', 'credit')},
+            'teachers': list(teachers.get(course['id'], {}).values()),
+            'total_students': course['total_students'],
+        }
+        for course in courses
+    ]
+
+
+def snapshot(semester_id=None):
+    """build() ผ่าน cache"""
+    cache = _cache()
+    key = _key(cache, semester_id)
+    courses = cache.get(key)
+    if courses is None:
+        courses = build(semester_id)
+        cache.set(key, courses, getattr(settings, 'ACADEMIC_CATALOG_CACHE_TIMEOUT', 300))
+    return courses
@@ -0,0 +1,144 @@
+"""
+Per-status enrollment counters on Section (enrolled_count, pending_count, ...)
+
+ตัวนับถูกปรับด้วย UPDATE ... SET x = x + n (F expression) ใน transaction เดียวกับการเขียน Enrollment
+- Enrollment.save()/delete() และ queryset.delete(): signals.py (ใช้ Enrollment._counted เป็นค่าเดิม)
+- queryset.update()/bulk_create (ไม่ส่ง signal): ผู้เรียกคำนวณ delta แล้วเรียก apply() เอง
+  (enrollment_service, roster_import, register_view)
+
+queryset.delete() ส่ง post_delete ทีละแถว - ครอบด้วย batch() เพื่อรวมเป็น UPDATE เดียวต่อกลุ่มเรียน
+
+reconcile() นับใหม่จากตาราง Enrollment และแก้ตัวนับที่ไม่ตรง
+(python manage.py reconcile_section_counters)
+
+ทุกการปรับตัวนับส่ง signal counters_changed(section_ids) (teacher/signals.py ใช้ล้าง dashboard)
+"""
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.db.models import Count, F
+from django.dispatch import Signal
+
+from .models import Enrollment, Section
+
+
+STATUS_FIELDS = {
+    'enrolled': 'enrolled_count',
+    'pending': 'pending_count',
+    'withdrawn': 'withdrawn_count',
+    'completed': 'completed_count',
+}
+
+COUNTER_FIELDS = tuple(STATUS_FIELDS.values())
+
+_local = threading.local()
+
+# ส่งภายใน transaction ที่ปรับตัวนับ (ผู้รับที่ต้องรอ commit ใช้ transaction.on_commit เอง)
+counters_changed = Signal()
+
+
+def _send_changed(section_ids):
+    section_ids = frozenset(section_ids)
+    if section_ids:
+        counters_changed.send(sender=Section, section_ids=section_ids)
+
+
+def delta():
+    """Counter ของการเปลี่ยนแปลง {(section_id, status): n}"""
+    return Counter()
+
+
+def move(deltas, old, new, n=1):
+    """บันทึกการเปลี่ยนจาก old=(section_id, status) เป็น new (None = ไม่มี เช่นสร้างใหม่/ลบ)"""
+    if old == new:
+        return deltas
+    if old is not None:
+        deltas[old] -= n
+    if new is not None:
+        deltas[new] += n
+    return deltas
+
+
+def grouped(enrollments):
+    """Counter {(section_id, status): จำนวน} ของ queryset (query เดียว)"""
+    return Counter({
+        (row['section_id'], row['status']): row['n']
+        for row in enrollments.order_by().values('section_id', 'status').annotate(n=Count('id'))
+    })
+
+
+@contextmanager
+def batch():
+    """รวม apply() ทั้งหมดภายใน block แล้วปรับตัวนับครั้งเดียวตอนจบ (ซ้อนกันได้)"""
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        yield
+        return
+    _local.pending = Counter()
+    try:
+        yield
+        deltas = _local.pending
+    finally:
+        _local.pending = None
+    apply(deltas)
+
+
+def apply(deltas):
+    """ปรับตัวนับตาม deltas ด้วย UPDATE หนึ่งครั้งต่อกลุ่มเรียน (ภายใน batch(): เก็บไว้ก่อน)"""
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.update(deltas)
+        return
+    by_section = defaultdict(dict)
+    for (section_id, status), n in deltas.items():
+        field = STATUS_FIELDS.get(status)
+        if n and field and section_id is not None:
+            by_section[section_id][field] = by_section[section_id].get(field, 0) + n
+    for section_id, changes in by_section.items():
+        changes = {field: F(field) + n for field, n in changes.items() if n}
+        if changes:
+            Section.objects.filter(id=section_id).update(**changes)
+    _send_changed(by_section)
+
+
+def recount(section_ids=None):
+    """จำนวนจริงจากตาราง Enrollment {section_id: {field: n}}"""
+    enrollments = Enrollment.objects.all()
+    if section_ids is not None:
+        enrollments = enrollments.filter(section_id__in=section_ids)
+    counts = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    for (section_id, status), n in grouped(enrollments).items():
+        if status in STATUS_FIELDS:
+            counts[section_id][STATUS_FIELDS[status]] = n
+    return counts
+
+
+def reconcile(section_ids=None, dry_run=False):
+    """
+    เทียบตัวนับกับจำนวนจริงแล้วแก้ส่วนที่ไม่ตรง (2 query + bulk_update)
+    คืนค่า list ของ (section, {field: (stored, actual)}) ที่ไม่ตรง
+    """
+    sections = Section.objects.only('id', *COUNTER_FIELDS)
+    if section_ids is not None:
+        sections = sections.filter(id__in=section_ids)
+    actual = recount(section_ids)
+    empty = dict.fromkeys(COUNTER_FIELDS, 0)
+
+    mismatched = []
+    for section in sections.order_by('id'):
+        counts = actual.get(section.id, empty)
+        diff = {
+            field: (getattr(section, field), counts[field])
+            for field in COUNTER_FIELDS
+            if getattr(section, field) != counts[field]
+        }
+        if diff:
+            for field, (_, value) in diff.items():
+                setattr(section, field, value)
+            mismatched.append((section, diff))
+
+    if mismatched and not dry_run:
+        Section.objects.bulk_update([section for section, _ in mismatched], COUNTER_FIELDS, batch_size=500)
+        _send_changed(section.id for section, _ in mismatched)
+    return mismatched
@@ -0,0 +1,258 @@
+"""
+Set-based enrollment operations (P4: บันทึกข้อมูลผู้เรียน)
+
+แทนการวน get_or_create/save() ทีละนักศึกษา ทุกฟังก์ชันอ่านการลงทะเบียนที่มีอยู่ของกลุ่มเรียน
+ด้วย query เดียว เทียบกับรายชื่อเป้าหมาย แล้วใช้ bulk_create / update() / delete()
+ภายใน transaction เดียว (ตัวนับของ Section รวมเป็น UPDATE เดียวต่อกลุ่มเรียนด้วย counters.batch())
+จำนวน query คงที่ไม่ขึ้นกับจำนวนนักศึกษา
+
+    enroll_many(section, student_ids)                เพิ่ม/เปลี่ยนสถานะเป็น enrolled
+    withdraw_many(section, student_ids)              เปลี่ยนสถานะเป็น withdrawn (delete=True: ลบออก)
+    transfer_many(source, target, student_ids)       ย้ายกลุ่มเรียน
+    sync_roster(section, student_ids)                ทำให้รายชื่อในกลุ่มเรียนตรงกับรายชื่อที่ให้มา
+
+ทุกฟังก์ชันคืนค่า EnrollmentResult (จำนวนที่ใช้แสดงข้อความใน UI)
+update()/bulk_create ไม่ส่ง signal จึงปรับตัวนับของ Section (counters.apply) เอง
+และล้าง roster_cache/catalog ของกลุ่มเรียนที่เปลี่ยนหลัง commit
+"""
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from accounts.models import User
+from . import catalog, counters
+from .models import Enrollment
+
+
+@dataclass
+class EnrollmentResult:
+    created: int = 0     # สร้างการลงทะเบียนใหม่
+    updated: int = 0     # เปลี่ยนสถานะ
+    moved: int = 0       # ย้ายกลุ่มเรียน
+    removed: int = 0     # ลบหรือถอน
+    unchanged: int = 0   # อยู่ในสถานะที่ต้องการอยู่แล้ว
+    skipped: int = 0     # ไม่ใช่นักศึกษา หรือไม่มีการลงทะเบียนให้ถอน/ย้าย
+
+    @property
+    def changed(self):
+        return self.created + self.updated + self.moved + self.removed
+
+
+def _normalize_ids(student_ids):
+    """แปลง id (เช่นค่าจาก request.POST.getlist) เป็น int ไม่ซ้ำ คงลำดับเดิม ข้ามค่าที่ไม่ใช่ตัวเลข"""
+    ids = {}
+    for value in student_ids:
+        try:
+            ids[int(value)] = None
+        except (TypeError, ValueError):
+            continue
+    return list(ids)
+
+
+def _student_ids(student_ids):
+    """กรองเฉพาะ id ของผู้ใช้ role=student (query เดียว)"""
+    if not student_ids:
+        return set()
+    return set(User.objects.filter(id__in=student_ids, role='student').values_list('id', flat=True))
+
+
+def _invalidate_rosters(section_ids):
+    from attendance import roster_cache
+
+    section_ids = set(section_ids)
+
+    def invalidate():
+        for section_id in section_ids:
+            roster_cache.invalidate_section(section_id)
+        catalog.invalidate()
+
+    transaction.on_commit(invalidate)
+
+
+def _current(section, student_ids=None):
+    """student_id -> (enrollment id, status) ของกลุ่มเรียน"""
+    enrollments = Enrollment.objects.filter(section=section).order_by()
+    if student_ids is not None:
+        enrollments = enrollments.filter(student_id__in=student_ids)
+    return {
+        student_id: (enrollment_id, status)
+        for enrollment_id, student_id, status in enrollments.values_list('id', 'student_id', 'status')
+    }
+
+
+def _delete(enrollment_ids):
+    """ลบการลงทะเบียน คืนค่าจำนวนที่ลบ (ไม่นับ object ที่ถูกลบตาม cascade) - ตัวนับปรับผ่าน post_delete"""
+    _, deleted = Enrollment.objects.filter(id__in=enrollment_ids).delete()
+    return deleted.get(Enrollment._meta.label, 0)
+
+
+def _update(rows, section_id, status, **fields):
+    """
+    UPDATE การลงทะเบียน rows = [(enrollment id, section_id เดิม, status เดิม)] เป็น (section_id, status)
+    แล้วปรับตัวนับของ Section (update() ไม่ส่ง signal)
+    """
+    if not rows:
+        return 0
+    updated = Enrollment.objects.filter(id__in=[row[0] for row in rows]).update(status=status, **fields)
+    deltas = counters.delta()
+    for _, old_section_id, old_status in rows:
+        counters.move(deltas, (old_section_id, old_status), (section_id, status))
+    counters.apply(deltas)
+    return updated
+
+
+def _apply(section, current, targets, status, result, update_existing=True):
+    """สร้างการลงทะเบียนที่ยังไม่มีและเปลี่ยนสถานะของที่มีอยู่ให้เป็น status (ถ้า update_existing)"""
+    new_enrollments = []
+    changed = []
+    for student_id in targets:
+        existing = current.get(student_id)
+        if existing is None:
+            new_enrollments.append(Enrollment(student_id=student_id, section=section, status=status))
+        elif update_existing and existing[1] != status:
+            changed.append((existing[0], section.id, existing[1]))
+        else:
+            result.unchanged += 1
+    if new_enrollments:
+        Enrollment.objects.bulk_create(new_enrollments)
+        counters.apply({(section.id, status): len(new_enrollments)})
+    _update(changed, section.id, status)
+    result.created += len(new_enrollments)
+    result.updated += len(changed)
+
+
+def enroll_many(section, student_ids, status='enrolled', update_existing=True):
+    """
+    ลงทะเบียนนักศึกษาหลายคนเข้ากลุ่มเรียน
+    - ยังไม่มีการลงทะเบียน: สร้างใหม่ (bulk_create)
+    - มีอยู่แล้วแต่สถานะต่างกัน (pending/withdrawn/...): เปลี่ยนสถานะ (update_existing=False: คงไว้ นับเป็น unchanged)
+    id ที่ไม่ใช่นักศึกษานับเป็น skipped
+    """
+    result = EnrollmentResult()
+    requested = _normalize_ids(student_ids)
+    with transaction.atomic(), counters.batch():
+        valid = _student_ids(requested)
+        targets = [student_id for student_id in requested if student_id in valid]
+        result.skipped = len(requested) - len(targets)
+        if targets:
+            _apply(section, _current(section, targets), targets, status, result, update_existing)
+        if result.changed:
+            _invalidate_rosters([section.id])
+    return result
+
+
+def withdraw_many(section, student_ids, delete=False):
+    """
+    ถอนนักศึกษาหลายคนออกจากกลุ่มเรียน
+    delete=False เปลี่ยนสถานะเป็น withdrawn (เก็บประวัติการเช็คชื่อไว้), delete=True ลบการลงทะเบียน
+    นักศึกษาที่ไม่ได้ลงทะเบียนในกลุ่มนี้นับเป็น skipped
+    """
+    result = EnrollmentResult()
+    requested = _normalize_ids(student_ids)
+    if not requested:
+        return result
+    with transaction.atomic(), counters.batch():
+        current = _current(section, requested)
+        result.skipped = len(requested) - len(current)
+        if delete:
+            rows = [(enrollment_id, section.id, status) for enrollment_id, status in current.values()]
+        else:
+            rows = [(enrollment_id, section.id, status) for enrollment_id, status in current.values() if status != 'withdrawn']
+            result.unchanged = len(current) - len(rows)
+        if rows:
+            if delete:
+                result.removed = _delete([row[0] for row in rows])
+            else:
+                result.removed = _update(rows, section.id, 'withdrawn')
+            _invalidate_rosters([section.id])
+    return result
+
+
+def transfer_many(source, target, student_ids=None, status=None):
+    """
+    ย้ายการลงทะเบียนจากกลุ่มเรียน source ไป target (student_ids=None: ย้ายทั้งกลุ่ม)
+    - ย้ายด้วย UPDATE section_id (คงวันที่ลงทะเบียนเดิม) และเปลี่ยนสถานะเป็น status ถ้าระบุ
+    - นักศึกษาที่มีการลงทะเบียนใน target อยู่แล้ว: ลบของ source และเปลี่ยนสถานะของ target เป็น status ถ้าระบุ
+    นักศึกษาที่ไม่ได้ลงทะเบียนใน source นับเป็น skipped
+    """
+    result = EnrollmentResult()
+    if source.id == target.id:
+        return _status_only(source, student_ids, status)
+    requested = None if student_ids is None else _normalize_ids(student_ids)
+    with transaction.atomic(), counters.batch():
+        moving = _current(source, requested)
+        if requested is not None:
+            result.skipped = len(requested) - len(moving)
+        if not moving:
+            return result
+        existing = _current(target, list(moving))
+
+        # ย้ายทีละสถานะเดิม (status=None คงสถานะเดิมไว้)
+        by_status = {}
+        for student_id, (enrollment_id, current_status) in moving.items():
+            if student_id not in existing:
+                by_status.setdefault(status or current_status, []).append((enrollment_id, source.id, current_status))
+        for new_status, rows in by_status.items():
+            result.moved += _update(rows, target.id, new_status, section=target)
+
+        duplicate_ids = [moving[student_id][0] for student_id in existing]
+        if duplicate_ids:
+            result.moved += _delete(duplicate_ids)
+            if status:
+                _update(
+                    [(enrollment_id, target.id, current_status)
+                     for enrollment_id, current_status in existing.values() if current_status != status],
+                    target.id, status,
+                )
+
+        _invalidate_rosters([source.id, target.id])
+    return result
+
+
+def _status_only(section, student_ids, status):
+    """transfer_many ไปกลุ่มเดิม - เปลี่ยนเฉพาะสถานะ"""
+    result = EnrollmentResult()
+    if not status:
+        return result
+    with transaction.atomic(), counters.batch():
+        requested = None if student_ids is None else _normalize_ids(student_ids)
+        current = _current(section, requested)
+        if requested is not None:
+            result.skipped = len(requested) - len(current)
+        _apply(section, current, list(current), status, result)
+        if result.updated:
+            _invalidate_rosters([section.id])
+    return result
+
+
+def sync_roster(section, student_ids, status='enrolled', withdraw=False):
+    """
+    ทำให้รายชื่อในกลุ่มเรียนตรงกับ student_ids (diff กับรายชื่อปัจจุบันด้วย query เดียว)
+    - อยู่ในรายชื่อแต่ยังไม่ลงทะเบียน: สร้าง / สถานะไม่ตรง: เปลี่ยนเป็น status
+    - ลงทะเบียนอยู่แต่ไม่อยู่ในรายชื่อ: ลบ (withdraw=True: เปลี่ยนสถานะเป็น withdrawn)
+    """
+    result = EnrollmentResult()
+    requested = _normalize_ids(student_ids)
+    with transaction.atomic(), counters.batch():
+        valid = _student_ids(requested)
+        targets = [student_id for student_id in requested if student_id in valid]
+        result.skipped = len(requested) - len(targets)
+
+        current = _current(section)
+        _apply(section, current, targets, status, result)
+
+        wanted = set(targets)
+        extra = [
+            (enrollment_id, section.id, current_status)
+            for student_id, (enrollment_id, current_status) in current.items()
+            if student_id not in wanted and not (withdraw and current_status == 'withdrawn')
+        ]
+        if extra:
+            if withdraw:
+                result.removed = _update(extra, section.id, 'withdrawn')
+            else:
+                result.removed = _delete([row[0] for row in extra])
+
+        if result.changed:
+            _invalidate_rosters([section.id])
+    return result
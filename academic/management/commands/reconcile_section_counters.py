@@ -0,0 +1,28 @@
+"""
+ตรวจและแก้ตัวนับการลงทะเบียนของ Section (enrolled_count, pending_count, ...) ให้ตรงกับตาราง Enrollment
+
+    python manage.py reconcile_section_counters                  # ทุกกลุ่มเรียน
+    python manage.py reconcile_section_counters --section 12 15  # เฉพาะกลุ่มเรียนที่กำหนด
+    python manage.py reconcile_section_counters --dry-run        # แสดงรายการที่ไม่ตรงโดยไม่แก้
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from academic import counters
+
+
+class Command(BaseCommand):
+    help = 'Recount per-status enrollment counters on sections and fix any that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--section', type=int, nargs='+', dest='sections', help='Section id(s) to reconcile')
+        parser.add_argument('--dry-run', action='store_true', help='Report mismatches without fixing them')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            mismatched = counters.reconcile(options['sections'], dry_run=options['dry_run'])
+        for section, diff in mismatched:
+            changes = ', '.join(f'{field} {stored} -> {actual}' for field, (stored, actual) in diff.items())
+            self.stdout.write(f'section {section.id}: {changes}')
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(mismatched)} section(s) with drifted counters'))
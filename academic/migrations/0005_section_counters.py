@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:17
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+STATUS_FIELDS = {
+    'enrolled': 'enrolled_count',
+    'pending': 'pending_count',
+    'withdrawn': 'withdrawn_count',
+    'completed': 'completed_count',
+}
+
+
+def backfill_counters(apps, schema_editor):
+    Enrollment = apps.get_model('academic', 'Enrollment')
+    Section = apps.get_model('academic', 'Section')
+    counts = {}
+    for row in Enrollment.objects.order_by().values('section_id', 'status').annotate(n=Count('id')):
+        if row['status'] in STATUS_FIELDS:
+            counts.setdefault(row['section_id'], {})[STATUS_FIELDS[row['status']]] = row['n']
+    for section_id, fields in counts.items():
+        Section.objects.filter(id=section_id).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0004_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='section',
+            name='completed_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='จำนวนที่เรียนจบ'),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='enrolled_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='จำนวนที่ลงทะเบียน'),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='pending_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='จำนวนรอลงทะเบียน'),
+        ),
+        migrations.AddField(
+            model_name='section',
+            name='withdrawn_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='จำนวนที่ถอน'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
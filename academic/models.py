@@ -107,6 +107,11 @@ class Section(models.Model):
     capacity = models.IntegerField(default=30, verbose_name='จำนวนรับ')
     room = models.CharField(max_length=50, blank=True, null=True, verbose_name='ห้องเรียน')
     schedule = models.CharField(max_length=200, blank=True, null=True, verbose_name='ตารางเรียน')
+    # จำนวนการลงทะเบียนแยกตามสถานะ (ปรับด้วย F() ทุกครั้งที่ Enrollment เปลี่ยน - ดู counters.py)
+    enrolled_count = models.IntegerField(default=0, editable=False, verbose_name='จำนวนที่ลงทะเบียน')
+    pending_count = models.IntegerField(default=0, editable=False, verbose_name='จำนวนรอลงทะเบียน')
+    withdrawn_count = models.IntegerField(default=0, editable=False, verbose_name='จำนวนที่ถอน')
+    completed_count = models.IntegerField(default=0, editable=False, verbose_name='จำนวนที่เรียนจบ')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='วันที่สร้าง')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='วันที่อัพเดท')
     
@@ -120,9 +125,19 @@ class Section(models.Model):
         return f"{self.course.course_code} - กลุ่ม {self.section_number} ({self.semester})"
     
     @property
-    def enrolled_count(self):
-        """จำนวนนักศึกษาที่ลงทะเบียน"""
-        return self.enrollments.count()
+    def total_count(self):
+        """จำนวนการลงทะเบียนทุกสถานะ"""
+        return self.enrolled_count + self.pending_count + self.withdrawn_count + self.completed_count
+    
+    def save(self, *args, **kwargs):
+        # ตัวนับถูกปรับด้วย F() โดยตรงในฐานข้อมูล - save() ของ instance ที่โหลดไว้ก่อนต้องไม่เขียนค่าเก่าทับ
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            from .counters import COUNTER_FIELDS
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
 
 class Enrollment(models.Model):
@@ -161,7 +176,25 @@ class Enrollment(models.Model):
         verbose_name_plural = 'การลงทะเบียน'
         unique_together = [['student', 'section']]
         ordering = ['-enrolled_at']
+        indexes = [
+            models.Index(fields=['section', 'status'], name='enrollment_section_status_idx'),
+            models.Index(fields=['student', 'status'], name='enrollment_student_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.section}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # (section_id, status) ที่นับไว้ใน Section แล้ว - ใช้คำนวณการเปลี่ยนแปลงตอน save/delete
+        if 'section_id' in field_names and 'status' in field_names:
+            instance._counted = (instance.section_id, instance.status)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # บันทึกการลงทะเบียนและปรับตัวนับของ Section (signals.py) ใน transaction เดียวกัน
+        from django.db import transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
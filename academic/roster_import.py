@@ -0,0 +1,240 @@
+"""
+Batched Excel roster import (P4: บันทึกข้อมูลผู้เรียน)
+
+ใช้ร่วมกันโดย import_students_excel และการอัปโหลดใน section_list
+อ่านไฟล์แบบ read-only (stream) แล้วประมวลผลเป็นชุด (chunk) ละ CHUNK_SIZE แถว:
+1. หา UserProfile ที่มีรหัสนักศึกษาอยู่แล้วด้วย query เดียว
+2. จอง username ที่ไม่ซ้ำด้วย query เดียว (query เพิ่มเฉพาะ username ที่ชนกัน)
+3. สร้างบัญชีด้วย accounts.provisioning (unusable password - นักศึกษาตั้งรหัสผ่านตอนสมัคร)
+   และ bulk_create Enrollment (สถานะ pending)
+ทั้งไฟล์อยู่ใน transaction เดียว ข้อผิดพลาดรายแถวถูกรวบรวมไว้ใน ImportResult
+"""
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from accounts.models import User, UserProfile
+from accounts.provisioning import StudentAccount, provision_students
+from . import counters
+from .models import Enrollment
+
+
+CHUNK_SIZE = 500
+
+STUDENT_ID_MAX_LENGTH = UserProfile._meta.get_field('student_id').max_length
+
+
+@dataclass
+class RowError:
+    """ข้อผิดพลาดของแถวหนึ่งในไฟล์"""
+    row: int
+    student_id: str
+    message: str
+
+
+@dataclass
+class ImportResult:
+    """ผลการนำเข้าไฟล์"""
+    rows: int = 0
+    users_created: int = 0
+    enrolled: int = 0
+    already_enrolled: int = 0
+    errors: list = field(default_factory=list)
+
+    @property
+    def error_count(self):
+        return len(self.errors)
+
+
+@dataclass
+class RosterRow:
+    row: int
+    student_id: str
+    first_name: str = ''
+    last_name: str = ''
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    # รหัสนักศึกษาที่เป็นตัวเลขใน Excel จะถูกอ่านเป็น float (6512345.0)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def detect_columns(worksheet, read_names=True):
+    """
+    หาแถวหัวตาราง (ภายใน 10 แถวแรก) และตำแหน่งคอลัมน์
+    Expected columns: รหัสนักศึกษา, ชื่อ, นามสกุล
+    คืนค่า (header_row, student_id_col, first_name_col, last_name_col) เป็น index เริ่มที่ 1
+    """
+    for row_idx, row in enumerate(worksheet.iter_rows(max_row=10, values_only=True), start=1):
+        row_lower = [str(cell).lower().strip() if cell else '' for cell in row]
+        if 'รหัส' in ' '.join(row_lower) or 'student' in ' '.join(row_lower):
+            student_id_col = first_name_col = last_name_col = None
+            for col_idx, cell_str in enumerate(row_lower, start=1):
+                if student_id_col is None and ('รหัส' in cell_str or 'student' in cell_str or 'id' in cell_str):
+                    student_id_col = col_idx
+                elif 'ชื่อ' in cell_str and 'นามสกุล' not in cell_str or 'first' in cell_str:
+                    first_name_col = col_idx
+                elif 'นามสกุล' in cell_str or 'last' in cell_str or 'surname' in cell_str:
+                    last_name_col = col_idx
+            if not read_names:
+                first_name_col = last_name_col = None
+            return row_idx, student_id_col, first_name_col, last_name_col
+
+    # If no header found, assume first row is header and use first 3 columns
+    if read_names:
+        return 1, 1, 2, 3
+    return 1, 1, None, None
+
+
+def iter_roster_rows(worksheet, read_names=True):
+    """อ่านแถวข้อมูลทีละแถว (ข้ามแถวว่างและแถวที่ไม่มีรหัสนักศึกษา)"""
+    header_row, student_id_col, first_name_col, last_name_col = detect_columns(worksheet, read_names)
+
+    def cell(row, col):
+        return _cell_text(row[col - 1]) if col and len(row) >= col else ''
+
+    for row_idx, row in enumerate(worksheet.iter_rows(min_row=header_row + 1, values_only=True), start=header_row + 1):
+        if not any(row):
+            continue
+        student_id = cell(row, student_id_col)
+        if not student_id or student_id == 'None':
+            continue
+        yield RosterRow(row_idx, student_id, cell(row, first_name_col), cell(row, last_name_col))
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def allocate_usernames(student_ids):
+    """
+    username = student_<รหัส> (เติม _1, _2, ... ถ้าซ้ำ)
+    ใช้ query เดียวสำหรับทุกรหัส และ query เพิ่มเฉพาะ username ที่ชนกันเท่านั้น
+    """
+    bases = {student_id: f'student_{student_id}' for student_id in student_ids}
+    taken = set(User.objects.filter(username__in=bases.values()).values_list('username', flat=True))
+    usernames = {}
+    for student_id, base in bases.items():
+        username = base
+        if username in taken:
+            taken.update(User.objects.filter(username__startswith=f'{base}_').values_list('username', flat=True))
+            counter = 1
+            while f'{base}_{counter}' in taken:
+                counter += 1
+            username = f'{base}_{counter}'
+        taken.add(username)
+        usernames[student_id] = username
+    return usernames
+
+
+def _import_chunk(chunk, section, result, seen, read_names, report_already_enrolled):
+    rows = []
+    for row in chunk:
+        if len(row.student_id) > STUDENT_ID_MAX_LENGTH:
+            result.errors.append(RowError(row.row, row.student_id, f'รหัสนักศึกษายาวเกิน {STUDENT_ID_MAX_LENGTH} ตัวอักษร'))
+        elif row.student_id not in seen:
+            # รหัสซ้ำในไฟล์เดียวกันนับเป็นแถวเดียว
+            seen.add(row.student_id)
+            rows.append(row)
+    if not rows:
+        return
+
+    profiles = {
+        profile.student_id: profile
+        for profile in UserProfile.objects.filter(
+            student_id__in=[row.student_id for row in rows]
+        ).select_related('user')
+    }
+
+    # Existing students: update name if provided and user doesn't have name
+    students = {}
+    renamed = []
+    for row in rows:
+        profile = profiles.get(row.student_id)
+        if profile is None:
+            continue
+        student = profile.user
+        students[row.student_id] = student
+        if read_names and ((not student.first_name and row.first_name) or (not student.last_name and row.last_name)):
+            student.first_name = student.first_name or row.first_name
+            student.last_name = student.last_name or row.last_name
+            renamed.append(student)
+    if renamed:
+        User.objects.bulk_update(renamed, ['first_name', 'last_name'])
+
+    # New students: placeholder accounts until the student registers (see register_view)
+    new_rows = [row for row in rows if row.student_id not in students]
+    if new_rows:
+        usernames = allocate_usernames([row.student_id for row in new_rows])
+        provisioned = provision_students(
+            [
+                StudentAccount(
+                    username=usernames[row.student_id],
+                    student_id=row.student_id,
+                    first_name=row.first_name,
+                    last_name=row.last_name,
+                    email=f'{usernames[row.student_id]}@example.com',  # Temporary email
+                )
+                for row in new_rows
+            ],
+            password=None,
+            update_existing=False,
+        )
+        for row in new_rows:
+            students[row.student_id] = provisioned.users[usernames[row.student_id]]
+        result.users_created += provisioned.created
+
+    # Create enrollments with pending status (keep existing ones as they are)
+    existing = dict(Enrollment.objects.filter(
+        section=section,
+        student_id__in=[student.id for student in students.values()],
+    ).values_list('student_id', 'status'))
+
+    enrollments = []
+    for row in rows:
+        student = students[row.student_id]
+        status = existing.get(student.id)
+        if status is None:
+            enrollments.append(Enrollment(student=student, section=section, status='pending'))
+            continue
+        result.already_enrolled += 1
+        if report_already_enrolled and status != 'pending':
+            result.errors.append(RowError(row.row, row.student_id, 'ลงทะเบียนอยู่แล้ว'))
+    Enrollment.objects.bulk_create(enrollments)
+    if enrollments:
+        counters.apply({(section.id, 'pending'): len(enrollments)})
+    result.enrolled += len(enrollments)
+
+
+def import_roster(excel_file, section, read_names=True, report_already_enrolled=False, chunk_size=CHUNK_SIZE):
+    """
+    นำเข้ารายชื่อนักศึกษาจากไฟล์ Excel เข้ากลุ่มเรียน (สถานะ pending จนกว่านักศึกษาจะลงทะเบียนเอง)
+    - read_names: อ่านคอลัมน์ชื่อ/นามสกุล (import_students_excel)
+    - report_already_enrolled: นับนักศึกษาที่ลงทะเบียนแล้ว (ไม่ใช่ pending) เป็นข้อผิดพลาด (section_list)
+    ข้อผิดพลาดของไฟล์หรือฐานข้อมูลจะ raise และ rollback ทั้งไฟล์
+    """
+    from openpyxl import load_workbook  # import เมื่อใช้ (ไม่โหลดตอน start worker)
+
+    workbook = load_workbook(excel_file, read_only=True)
+    try:
+        worksheet = workbook.active
+        result = ImportResult()
+        seen = set()
+        with transaction.atomic():
+            for chunk in _chunks(iter_roster_rows(worksheet, read_names), chunk_size):
+                result.rows += len(chunk)
+                _import_chunk(chunk, section, result, seen, read_names, report_already_enrolled)
+        return result
+    finally:
+        workbook.close()
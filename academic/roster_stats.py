@@ -0,0 +1,66 @@
+"""
+Roster statistics ของกลุ่มเรียน (section_detail)
+
+- จำนวนทั้งกลุ่มเรียนแยกตามสถานะ: อ่านจากตัวนับของ Section (counters.py) ไม่ต้อง query
+- จำนวนของรายชื่อที่กรองแล้ว (ค้นหา/สถานะ): GROUP BY status query เดียว
+- รายชื่อแยกตามสถานะ: แบ่งใน Python จากรายการที่ดึงมาแล้ว (ไม่ query ซ้ำต่อสถานะ)
+"""
+from dataclasses import dataclass, field
+
+from django.db.models import Count
+
+from .counters import STATUS_FIELDS
+from .models import Enrollment
+
+
+STATUSES = tuple(STATUS_FIELDS)
+
+STATUS_DISPLAY = dict(Enrollment._meta.get_field('status').choices)
+
+
+@dataclass
+class RosterStats:
+    counts: dict                                         # status -> จำนวนทั้งกลุ่มเรียน
+    filtered_counts: dict = field(default=None)          # status -> จำนวนหลังกรอง (None = ไม่ได้กรอง)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    @property
+    def result_count(self):
+        if self.filtered_counts is None:
+            return None
+        return sum(self.filtered_counts.values())
+
+
+def section_counts(section):
+    """จำนวนทั้งกลุ่มเรียนแยกตามสถานะ (จาก Section.*_count)"""
+    return {status: getattr(section, name) for status, name in STATUS_FIELDS.items()}
+
+
+def grouped_counts(enrollments):
+    """จำนวนแยกตามสถานะของ queryset (query เดียว)"""
+    counts = dict.fromkeys(STATUSES, 0)
+    for status, n in enrollments.order_by().values_list('status').annotate(n=Count('id')):
+        counts[status] = n
+    return counts
+
+
+def roster_stats(section, enrollments=None):
+    """
+    สถิติของกลุ่มเรียน
+    enrollments: queryset ที่กรองแล้ว (ค้นหา/สถานะ) - ถ้าให้มาจะนับแยกตามสถานะด้วย query เดียว
+    """
+    return RosterStats(
+        counts=section_counts(section),
+        filtered_counts=grouped_counts(enrollments) if enrollments is not None else None,
+    )
+
+
+def partition(enrollments):
+    """แบ่งรายการการลงทะเบียนที่ดึงมาแล้วตามสถานะ {status: [enrollment, ...]}"""
+    groups = {status: [] for status in STATUSES}
+    for enrollment in enrollments:
+        groups.setdefault(enrollment.status, []).append(enrollment)
+    return groups
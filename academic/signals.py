@@ -0,0 +1,45 @@
+"""
+Signal handlers for academic app
+- ล้าง catalog snapshot (catalog.py) เมื่อรายวิชา กลุ่มเรียน หรือการลงทะเบียนเปลี่ยน
+- ปรับตัวนับตามสถานะของ Section (counters.py) เมื่อ Enrollment ถูกสร้าง/แก้ไข/ลบ
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import catalog, counters
+from .models import Course, Enrollment, Section
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_catalog(sender, instance, **kwargs):
+    catalog.invalidate_on_commit()
+
+
+@receiver(pre_save, sender=Enrollment)
+def remember_counted_enrollment(sender, instance, raw=False, **kwargs):
+    # instance ที่ไม่ได้โหลดผ่าน from_db (เช่นสร้าง Enrollment(id=...) เอง) - อ่านค่าเดิมจากฐานข้อมูล
+    if raw or instance._state.adding or hasattr(instance, '_counted'):
+        return
+    instance._counted = Enrollment.objects.filter(pk=instance.pk).values_list('section_id', 'status').first()
+
+
+@receiver(post_save, sender=Enrollment)
+def count_saved_enrollment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else getattr(instance, '_counted', None)
+    new = (instance.section_id, instance.status)
+    counters.apply(counters.move(counters.delta(), old, new))
+    instance._counted = new
+
+
+@receiver(post_delete, sender=Enrollment)
+def count_deleted_enrollment(sender, instance, **kwargs):
+    old = getattr(instance, '_counted', (instance.section_id, instance.status))
+    counters.apply(counters.move(counters.delta(), old, None))
+    instance._counted = None
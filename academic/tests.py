@@ -1,4 +1,376 @@
-from django.test import TestCase
+"""
+Query budget tests (checkin_project.testing.query_budget)
 
-# Create your tests here.
+ข้อมูลตัวอย่างมีหลายรายวิชา/กลุ่มเรียน/นักศึกษา จำนวน query ของแต่ละหน้าต้องไม่เกินงบ
+ไม่ว่าข้อมูลจะมีกี่แถว - ถ้าเกินแปลว่ามี query ต่อแถว (N+1)
+รวมถึง enrollment_service ตัวนับการลงทะเบียนของ Section (counters.py)
+และการนำเข้ารายชื่อจาก Excel (roster_import.py)
+"""
+from io import BytesIO, StringIO
 
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User, UserProfile
+from checkin_project.testing import query_budget
+from . import counters, enrollment_service, roster_import
+from .models import AcademicYear, Semester, Course, Section, Enrollment
+
+
+class QueryBudgetTests(TestCase):
+    COURSES = 12
+    STUDENTS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        year = AcademicYear.objects.create(year='2568')
+        cls.semester = Semester.objects.create(
+            academic_year=year, semester_number=1, start_date='2025-06-01', end_date='2025-09-30',
+        )
+        cls.admin = User.objects.create_user('admin', password='pw', role='admin')
+        cls.teacher = User.objects.create_user('teacher', password='pw', role='teacher')
+        teachers = [cls.teacher, User.objects.create_user('teacher2', password='pw', role='teacher')]
+        students = User.objects.bulk_create([
+            User(username=f'student{i:02d}', password='!', role='student') for i in range(cls.STUDENTS)
+        ])
+        for i in range(cls.COURSES):
+            course = Course.objects.create(course_code=f'CS{i:03d}', course_name=f'Course {i}', credit=3)
+            for number in ('1', '2'):
+                section = Section.objects.create(
+                    course=course, semester=cls.semester, section_number=number, teacher=teachers[i % 2],
+                )
+                Enrollment.objects.bulk_create([
+                    Enrollment(student=student, section=section, status='enrolled') for student in students
+                ])
+
+    def get(self, user, path, data=None):
+        client = Client()
+        client.force_login(user)
+        response = client.get(path, data)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_course_list(self):
+        client = Client()
+        client.force_login(self.admin)
+        with query_budget(5):
+            response = client.get('/academic/courses/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['courses_with_info']), self.COURSES)
+        self.assertEqual(response.context['courses_with_info'][0]['total_students'], self.STUDENTS)
+        self.assertEqual(len(response.context['courses_with_info'][0]['teachers']), 1)
+
+        # snapshot จาก cache - ไม่ query รายวิชา/อาจารย์ซ้ำ
+        with query_budget(3):
+            client.get('/academic/courses/')
+        with query_budget(5):
+            client.get('/academic/courses/', {'semester': self.semester.id})
+
+    def test_course_list_invalidated_on_enrollment_change(self):
+        client = Client()
+        client.force_login(self.admin)
+        client.get('/academic/courses/')
+        first, second = Section.objects.filter(course__course_code='CS000').order_by('section_number')
+        student = Enrollment.objects.filter(section=first).first().student
+        # ถอนนักศึกษาหนึ่งคนออกจากทั้งสองกลุ่มเรียน: ผ่าน signal (delete) และผ่าน enrollment_service (update)
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.get(section=first, student=student).delete()
+        self.assertEqual(client.get('/academic/courses/').context['courses_with_info'][0]['total_students'], self.STUDENTS)
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment_service.withdraw_many(second, [student.id])
+        response = client.get('/academic/courses/')
+        self.assertEqual(response.context['courses_with_info'][0]['total_students'], self.STUDENTS - 1)
+
+    def test_course_detail(self):
+        course = Course.objects.get(course_code='CS000')
+        client = Client()
+        client.force_login(self.admin)
+        with query_budget(4):
+            response = client.get(f'/academic/courses/{course.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_students'], self.STUDENTS)
+        self.assertEqual([item['student_count'] for item in response.context['sections_with_info']], [self.STUDENTS] * 2)
+
+    def test_section_list(self):
+        client = Client()
+        client.force_login(self.teacher)
+        with query_budget(4):
+            self.assertEqual(client.get('/academic/sections/').status_code, 200)
+        with query_budget(8):
+            response = client.get('/academic/sections/', {
+                'academic_year': self.semester.academic_year_id,
+                'semester_number': 1,
+            })
+        self.assertEqual(response.status_code, 200)
+
+    def test_section_detail(self):
+        section = Section.objects.filter(course__course_code='CS000').first()
+        counters.reconcile([section.id])
+        client = Client()
+        client.force_login(self.admin)
+        # session + user + กลุ่มเรียน + รายชื่อหนึ่งหน้า (สถิติอ่านจากตัวนับ)
+        with query_budget(4):
+            response = client.get(f'/academic/sections/{section.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_enrolled'], self.STUDENTS)
+        self.assertEqual(len(response.context['enrolled_students']), self.STUDENTS)
+        self.assertIsNone(response.context['result_count'])
+
+        # กรองแล้ว: + GROUP BY status query เดียว
+        with query_budget(5):
+            response = client.get(f'/academic/sections/{section.id}/', {'status': 'enrolled', 'search': 'student1'})
+        self.assertEqual(response.context['result_count'], 10)
+        self.assertEqual(response.context['filtered_status_counts']['enrolled'], 10)
+        self.assertEqual(response.context['total_students'], self.STUDENTS)
+
+
+class EnrollmentServiceTests(TestCase):
+    """enrollment_service ใช้ query จำนวนคงที่ไม่ว่าจะมีนักศึกษากี่คน"""
+    STUDENTS = 40
+
+    @classmethod
+    def setUpTestData(cls):
+        year = AcademicYear.objects.create(year='2568')
+        semester = Semester.objects.create(
+            academic_year=year, semester_number=1, start_date='2025-06-01', end_date='2025-09-30',
+        )
+        course = Course.objects.create(course_code='CS101', course_name='Course', credit=3)
+        cls.section = Section.objects.create(course=course, semester=semester, section_number='1')
+        cls.other_section = Section.objects.create(course=course, semester=semester, section_number='2')
+        cls.teacher = User.objects.create_user('teacher', password='pw', role='teacher')
+        cls.students = User.objects.bulk_create([
+            User(username=f'student{i:02d}', password='!', role='student') for i in range(cls.STUDENTS)
+        ])
+        cls.ids = [student.id for student in cls.students]
+
+    def statuses(self, section):
+        # ตัวนับของ Section ต้องตรงกับตาราง Enrollment หลังทุกการเปลี่ยนแปลง
+        self.assertEqual(counters.reconcile([section.id], dry_run=True), [])
+        return dict(Enrollment.objects.filter(section=section).values_list('student_id', 'status'))
+
+    def test_enroll_many(self):
+        Enrollment.objects.create(student=self.students[0], section=self.section, status='pending')
+        Enrollment.objects.create(student=self.students[1], section=self.section, status='enrolled')
+        with query_budget(7):
+            result = enrollment_service.enroll_many(self.section, [str(i) for i in self.ids] + [self.teacher.id, 'x'])
+        self.assertEqual((result.created, result.updated, result.unchanged, result.skipped), (self.STUDENTS - 2, 1, 1, 1))
+        self.assertEqual(set(self.statuses(self.section).values()), {'enrolled'})
+
+        result = enrollment_service.enroll_many(self.section, self.ids, status='pending', update_existing=False)
+        self.assertEqual((result.changed, result.unchanged), (0, self.STUDENTS))
+
+    def test_withdraw_many(self):
+        enrollment_service.enroll_many(self.section, self.ids[:10])
+        with query_budget(5):
+            result = enrollment_service.withdraw_many(self.section, self.ids[:5] + self.ids[20:22])
+        self.assertEqual((result.removed, result.skipped), (5, 2))
+        self.assertEqual(list(self.statuses(self.section).values()).count('withdrawn'), 5)
+
+        result = enrollment_service.withdraw_many(self.section, self.ids[:10], delete=True)
+        self.assertEqual(result.removed, 10)
+        self.assertFalse(self.statuses(self.section))
+
+    def test_transfer_many(self):
+        enrollment_service.enroll_many(self.section, self.ids[:10])
+        enrollment_service.enroll_many(self.other_section, self.ids[:2], status='pending')
+        with query_budget(10):
+            result = enrollment_service.transfer_many(self.section, self.other_section, status='enrolled')
+        self.assertEqual(result.moved, 10)
+        self.assertFalse(self.statuses(self.section))
+        self.assertEqual(self.statuses(self.other_section), {student_id: 'enrolled' for student_id in self.ids[:10]})
+
+    def test_sync_roster(self):
+        enrollment_service.enroll_many(self.section, self.ids[:20])
+        enrollment_service.withdraw_many(self.section, self.ids[:5])
+        with query_budget(8):
+            result = enrollment_service.sync_roster(self.section, self.ids[10:30])
+        self.assertEqual((result.created, result.updated, result.removed, result.unchanged), (10, 0, 10, 10))
+        self.assertEqual(set(self.statuses(self.section)), set(self.ids[10:30]))
+
+        result = enrollment_service.sync_roster(self.section, self.ids[:5], withdraw=True)
+        self.assertEqual((result.created, result.removed), (5, 20))
+        self.assertEqual(list(self.statuses(self.section).values()).count('enrolled'), 5)
+
+
+class SectionCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        year = AcademicYear.objects.create(year='2568')
+        semester = Semester.objects.create(
+            academic_year=year, semester_number=1, start_date='2025-06-01', end_date='2025-09-30',
+        )
+        course = Course.objects.create(course_code='CS101', course_name='Course', credit=3)
+        cls.section = Section.objects.create(course=course, semester=semester, section_number='1')
+        cls.other_section = Section.objects.create(course=course, semester=semester, section_number='2')
+        cls.students = [User.objects.create_user(f'student{i}', password='pw', role='student') for i in range(3)]
+
+    def counts(self, section):
+        section.refresh_from_db()
+        return section.enrolled_count, section.pending_count, section.withdrawn_count, section.completed_count
+
+    def test_orm_writes(self):
+        first = Enrollment.objects.create(student=self.students[0], section=self.section, status='enrolled')
+        Enrollment.objects.create(student=self.students[1], section=self.section, status='pending')
+        self.assertEqual(self.counts(self.section), (1, 1, 0, 0))
+
+        first = Enrollment.objects.get(id=first.id)
+        first.status = 'completed'
+        first.save()
+        self.assertEqual(self.counts(self.section), (0, 1, 0, 1))
+
+        first.section = self.other_section
+        first.save()
+        self.assertEqual(self.counts(self.section), (0, 1, 0, 0))
+        self.assertEqual(self.counts(self.other_section), (0, 0, 0, 1))
+
+        with counters.batch():
+            Enrollment.objects.filter(section=self.section).delete()
+        self.assertEqual(self.counts(self.section), (0, 0, 0, 0))
+        self.students[0].delete()
+        self.assertEqual(self.counts(self.other_section), (0, 0, 0, 0))
+
+    def test_section_save_keeps_counters(self):
+        stale = Section.objects.get(id=self.section.id)
+        Enrollment.objects.create(student=self.students[0], section=self.section, status='enrolled')
+        stale.room = 'LAB-1'
+        stale.save()
+        self.assertEqual(self.counts(self.section), (1, 0, 0, 0))
+
+    def test_reconcile(self):
+        Enrollment.objects.bulk_create([
+            Enrollment(student=student, section=self.section, status='enrolled') for student in self.students
+        ])
+        mismatched = counters.reconcile(dry_run=True)
+        self.assertEqual([(section.id, diff) for section, diff in mismatched], [(self.section.id, {'enrolled_count': (0, 3)})])
+        self.assertEqual(self.counts(self.section), (0, 0, 0, 0))
+
+        out = StringIO()
+        call_command('reconcile_section_counters', stdout=out)
+        self.assertIn(f'section {self.section.id}: enrolled_count 0 -> 3', out.getvalue())
+        self.assertEqual(self.counts(self.section), (3, 0, 0, 0))
+        self.assertEqual(counters.reconcile(), [])
+
+    def test_counters_changed_signal(self):
+        sent = []
+
+        def receiver(sender, section_ids, **kwargs):
+            sent.append(set(section_ids))
+
+        counters.counters_changed.connect(receiver)
+        self.addCleanup(counters.counters_changed.disconnect, receiver)
+
+        with counters.batch():
+            Enrollment.objects.create(student=self.students[0], section=self.section, status='enrolled')
+            Enrollment.objects.create(student=self.students[1], section=self.other_section, status='pending')
+        self.assertEqual(sent, [{self.section.id, self.other_section.id}])
+
+        Section.objects.filter(id=self.section.id).update(enrolled_count=9)
+        counters.reconcile(dry_run=True)
+        counters.reconcile()
+        self.assertEqual(sent[1:], [{self.section.id}])
+
+
+def roster_workbook(rows, header=('รหัสนักศึกษา', 'ชื่อ', 'นามสกุล')):
+    """ไฟล์ Excel ในหน่วยความจำ: แถวหัวตาราง + rows"""
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.append(['รายชื่อนักศึกษา'])
+    worksheet.append(list(header))
+    for row in rows:
+        worksheet.append(list(row))
+    data = BytesIO()
+    workbook.save(data)
+    data.seek(0)
+    return data
+
+
+class RosterImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        year = AcademicYear.objects.create(year='2568')
+        semester = Semester.objects.create(
+            academic_year=year, semester_number=1, start_date='2025-06-01', end_date='2025-09-30',
+        )
+        course = Course.objects.create(course_code='CS101', course_name='Course', credit=3)
+        cls.section = Section.objects.create(course=course, semester=semester, section_number='1')
+
+    def import_rows(self, rows, **kwargs):
+        return roster_import.import_roster(roster_workbook(rows), self.section, **kwargs)
+
+    def test_import_creates_placeholder_accounts(self):
+        result = self.import_rows([
+            (6500001, 'สมชาย', 'ใจดี'),
+            ('6500002', 'สมศรี', ''),
+            (None, None, None),
+            ('6500001', 'ซ้ำ', 'ในไฟล์'),
+        ])
+        self.assertEqual((result.rows, result.users_created, result.enrolled, result.error_count), (3, 2, 2, 0))
+        user = UserProfile.objects.select_related('user').get(student_id='6500001').user
+        self.assertEqual((user.username, user.first_name, user.last_name), ('student_6500001', 'สมชาย', 'ใจดี'))
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(
+            sorted(Enrollment.objects.filter(section=self.section).values_list('student__username', 'status')),
+            [('student_6500001', 'pending'), ('student_6500002', 'pending')],
+        )
+        self.section.refresh_from_db()
+        self.assertEqual(self.section.pending_count, 2)
+        self.assertEqual(counters.reconcile(dry_run=True), [])
+
+    def test_existing_students_and_username_collisions(self):
+        registered = User.objects.create_user('somchai', password='pw', role='student')
+        UserProfile.objects.filter(user=registered).update(student_id='6500001')
+        # username ของรหัส 6500002 ถูกใช้ไปแล้ว (และ _1 ด้วย)
+        User.objects.create_user('student_6500002', password='pw', role='student')
+        User.objects.create_user('student_6500002_1', password='pw', role='student')
+
+        result = self.import_rows([('6500001', 'สมชาย', 'ใจดี'), ('6500002', 'สมศรี', 'ใจงาม')])
+        self.assertEqual((result.users_created, result.enrolled), (1, 2))
+        registered.refresh_from_db()
+        self.assertEqual((registered.first_name, registered.last_name), ('สมชาย', 'ใจดี'))   # ชื่อว่าง - เติมจากไฟล์
+        self.assertEqual(UserProfile.objects.get(student_id='6500002').user.username, 'student_6500002_2')
+
+        # นำเข้าซ้ำ: ไม่สร้างบัญชีหรือการลงทะเบียนเพิ่ม
+        again = self.import_rows([('6500001', 'อื่น', 'อื่น'), ('6500002', '', '')])
+        self.assertEqual((again.users_created, again.enrolled, again.already_enrolled), (0, 0, 2))
+        registered.refresh_from_db()
+        self.assertEqual(registered.first_name, 'สมชาย')
+        self.assertEqual(Enrollment.objects.filter(section=self.section).count(), 2)
+
+    def test_row_error_report(self):
+        enrolled = User.objects.create_user('somchai', password='pw', role='student')
+        UserProfile.objects.filter(user=enrolled).update(student_id='6500001')
+        Enrollment.objects.create(student=enrolled, section=self.section, status='enrolled')
+        too_long = '9' * (roster_import.STUDENT_ID_MAX_LENGTH + 1)
+
+        result = self.import_rows(
+            [('6500001', '', ''), (too_long, 'ยาว', 'เกิน'), ('6500003', 'มานะ', 'ใจดี')],
+            report_already_enrolled=True,
+        )
+        self.assertEqual(
+            [(error.row, error.student_id, error.message) for error in result.errors],
+            [
+                (4, too_long, f'รหัสนักศึกษายาวเกิน {roster_import.STUDENT_ID_MAX_LENGTH} ตัวอักษร'),
+                (3, '6500001', 'ลงทะเบียนอยู่แล้ว'),
+            ],
+        )
+        self.assertEqual((result.rows, result.enrolled, result.already_enrolled), (3, 1, 1))
+
+    def test_query_count_independent_of_rows(self):
+        def queries(first_id, n):
+            rows = [(str(first_id + i), f'ชื่อ{i}', f'สกุล{i}') for i in range(n)]
+            with CaptureQueriesContext(connection) as ctx:
+                result = self.import_rows(rows)
+            self.assertEqual(result.enrolled, n)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries(6500000, 5), queries(6600000, 50))
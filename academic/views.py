@@ -4,60 +4,34 @@ Views for academic app (P2, P3, P4 - Academic Data Management)
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Q
 from django.http import JsonResponse
 from .models import AcademicYear, Semester, Course, Section, Enrollment
+from . import catalog, counters, enrollment_service, roster_import, roster_stats
+from accounts import authz
+from accounts.authz import is_admin, is_teacher
 from accounts.models import User, UserProfile
-import openpyxl
-from openpyxl import load_workbook
+from accounts.provisioning import StudentAccount, provision_students
+from accounts.search import search_users
+from checkin_project.pagination import json_page, paginate_request, wants_json
 from datetime import date
 
 
-def is_admin(user):
-    """Check if user is admin"""
-    return user.is_authenticated and user.is_admin()
-
-
-def is_teacher(user):
-    """Check if user is teacher"""
-    return user.is_authenticated and user.is_teacher()
-
-
 @login_required
 @user_passes_test(is_admin)
 def course_list(request):
     """
     Process 2: จัดการข้อมูลพื้นฐาน - ดูรายวิชา
+    ข้อมูลรายวิชา/อาจารย์/จำนวนนักศึกษามาจาก catalog snapshot (cache แยกตามภาคเรียน)
     """
-    from django.db.models import Count, Q
-    from academic.models import Enrollment
-    
-    courses = Course.objects.filter(is_active=True).prefetch_related('sections', 'sections__teacher', 'sections__enrollments')
-    
-    # Add teacher and student count info to each course
-    courses_with_info = []
-    for course in courses:
-        # Get all teachers teaching this course (from all sections)
-        teachers = []
-        for section in course.sections.all():
-            if section.teacher and section.teacher not in teachers:
-                teachers.append(section.teacher)
-        
-        # Count total enrolled students across all sections
-        total_students = Enrollment.objects.filter(
-            section__course=course,
-            status='enrolled'
-        ).values('student').distinct().count()
-        
-        courses_with_info.append({
-            'course': course,
-            'teachers': teachers,
-            'total_students': total_students,
-            'sections': course.sections.all(),  # Add sections for edit teacher link
-        })
+    semesters = Semester.objects.select_related('academic_year')
+    selected_semester = request.GET.get('semester', '')
+    if not selected_semester.isdigit():
+        selected_semester = ''
     
     context = {
-        'courses_with_info': courses_with_info,
+        'courses_with_info': catalog.snapshot(int(selected_semester) if selected_semester else None),
+        'semesters': semesters,
+        'selected_semester': selected_semester,
     }
     return render(request, 'academic/course_list.html', context)
 
@@ -68,45 +42,41 @@ def course_detail(request, course_id):
     """
     ดูรายละเอียดรายวิชา
     """
-    from django.db.models import Count
-    from academic.models import Enrollment
-    
-    course = get_object_or_404(Course, id=course_id, is_active=True)
-    
-    # Get all sections for this course
-    sections = course.sections.all().select_related('teacher', 'semester').order_by('section_number')
+    from django.db.models import Count, Q
     
-    # Get section details with teacher and student count
-    sections_with_info = []
-    for section in sections:
-        # Count enrolled students
-        student_count = Enrollment.objects.filter(
-            section=section,
-            status='enrolled'
-        ).count()
-        
-        sections_with_info.append({
+    course = get_object_or_404(
+        Course.objects.annotate(total_students=Count(
+            'sections__enrollments__student',
+            distinct=True,
+            filter=Q(sections__enrollments__status='enrolled'),
+        )),
+        id=course_id,
+        is_active=True,
+    )
+    
+    # Get section details with teacher and enrolled student count (one query)
+    sections = course.sections.select_related('teacher', 'semester').annotate(
+        student_count=Count('enrollments', filter=Q(enrollments__status='enrolled')),
+    ).order_by('section_number')
+    sections_with_info = [
+        {
             'section': section,
             'teacher': section.teacher,
-            'student_count': student_count,
-        })
-    
-    # Get total students across all sections
-    total_students = Enrollment.objects.filter(
-        section__course=course,
-        status='enrolled'
-    ).values('student').distinct().count()
+            'student_count': section.student_count,
+        }
+        for section in sections
+    ]
     
     # Get all unique teachers
     teachers = []
-    for section in sections:
-        if section.teacher and section.teacher not in teachers:
-            teachers.append(section.teacher)
+    for item in sections_with_info:
+        if item['teacher'] and item['teacher'] not in teachers:
+            teachers.append(item['teacher'])
     
     context = {
         'course': course,
         'sections_with_info': sections_with_info,
-        'total_students': total_students,
+        'total_students': course.total_students,
         'teachers': teachers,
     }
     return render(request, 'academic/course_detail.html', context)
@@ -174,12 +144,11 @@ def manage_course(request, course_id=None):
                 teacher.set_password('changeme123')  # Default password
                 teacher.save()
                 
-                # Create teacher profile
-                UserProfile.objects.create(
-                    user=teacher,
-                    teacher_employee_id=employee_id if employee_id else None,
-                    teacher_department=department if department else None
-                )
+                # Teacher profile (สร้างโดย post_save ดู accounts/signals.py)
+                profile = teacher.profile
+                profile.teacher_employee_id = employee_id if employee_id else None
+                profile.teacher_department = department if department else None
+                profile.save()
                 
                 teacher_name = teacher.get_full_name() or teacher.username
                 return JsonResponse({
@@ -385,12 +354,7 @@ def manage_course_students(request, course_id):
     # Search functionality
     search_query = request.GET.get('search', '')
     if search_query:
-        enrollments = enrollments.filter(
-            Q(student__username__icontains=search_query) |
-            Q(student__first_name__icontains=search_query) |
-            Q(student__last_name__icontains=search_query) |
-            Q(student__profile__student_id__icontains=search_query)
-        )
+        enrollments = search_users(enrollments, search_query, prefix='student__')
     
     # Filter by section if provided
     section_filter = request.GET.get('section_id')
@@ -406,27 +370,18 @@ def manage_course_students(request, course_id):
         action = request.POST.get('action')
         
         if action == 'add':
-            student_id = request.POST.get('student_id')
+            student_ids = request.POST.getlist('student_id')
             section_id = request.POST.get('section_id')
             
-            if student_id and section_id:
-                student = get_object_or_404(User, id=student_id, role='student')
+            if student_ids and section_id:
                 section = get_object_or_404(Section, id=section_id, course=course)
-                
-                enrollment, created = Enrollment.objects.get_or_create(
-                    student=student,
-                    section=section,
-                    defaults={'status': 'enrolled'}
-                )
-                if created:
-                    messages.success(request, f'เพิ่มนักศึกษา {student.get_full_name() or student.username} สำเร็จ')
-                else:
-                    if enrollment.status != 'enrolled':
-                        enrollment.status = 'enrolled'
-                        enrollment.save()
-                        messages.success(request, f'เพิ่มนักศึกษา {student.get_full_name() or student.username} สำเร็จ')
-                    else:
-                        messages.info(request, 'นักศึกษาคนนี้ลงทะเบียนอยู่แล้ว')
+                result = enrollment_service.enroll_many(section, student_ids)
+                if result.created or result.updated:
+                    messages.success(request, f'เพิ่มนักศึกษา {result.created + result.updated} คนสำเร็จ')
+                if result.unchanged:
+                    messages.info(request, f'ลงทะเบียนอยู่แล้ว {result.unchanged} คน')
+                if result.skipped:
+                    messages.warning(request, f'ข้าม {result.skipped} รายการ (ไม่พบนักศึกษา)')
                 return redirect('academic:manage_course_students', course_id=course_id)
         
         elif action == 'edit':
@@ -436,12 +391,13 @@ def manage_course_students(request, course_id):
             
             if enrollment_id:
                 enrollment = get_object_or_404(Enrollment, id=enrollment_id, section__course=course)
+                new_section = enrollment.section
                 if new_section_id:
                     new_section = get_object_or_404(Section, id=new_section_id, course=course)
-                    enrollment.section = new_section
-                if new_status:
-                    enrollment.status = new_status
-                enrollment.save()
+                if new_status not in dict(Enrollment._meta.get_field('status').choices):
+                    new_status = None
+                # ย้ายกลุ่มที่มีการลงทะเบียนอยู่แล้วจะรวมเป็นรายการเดียว (ไม่ชน unique_together)
+                enrollment_service.transfer_many(enrollment.section, new_section, [enrollment.student_id], status=new_status)
                 messages.success(request, 'แก้ไขข้อมูลสำเร็จ')
                 return redirect('academic:manage_course_students', course_id=course_id)
         
@@ -555,25 +511,21 @@ def manage_enrollment(request, section_id):
     
     if request.method == 'POST':
         action = request.POST.get('action')
-        student_id = request.POST.get('student_id')
+        student_ids = request.POST.getlist('student_id')
         
-        if action == 'add' and student_id:
-            student = get_object_or_404(User, id=student_id, role='student')
-            enrollment, created = Enrollment.objects.get_or_create(
-                student=student,
-                section=section,
-                defaults={'status': 'enrolled'}
-            )
-            if created:
-                messages.success(request, f'เพิ่มนักศึกษา {student.get_full_name()} สำเร็จ')
-            else:
-                messages.info(request, 'นักศึกษาคนนี้ลงทะเบียนอยู่แล้ว')
+        if action == 'add' and student_ids:
+            result = enrollment_service.enroll_many(section, student_ids)
+            if result.created or result.updated:
+                messages.success(request, f'เพิ่มนักศึกษา {result.created + result.updated} คนสำเร็จ')
+            if result.unchanged:
+                messages.info(request, f'ลงทะเบียนอยู่แล้ว {result.unchanged} คน')
+            if result.skipped:
+                messages.warning(request, f'ข้าม {result.skipped} รายการ (ไม่พบนักศึกษา)')
         
-        elif action == 'remove' and student_id:
-            enrollment = Enrollment.objects.filter(student_id=student_id, section=section).first()
-            if enrollment:
-                enrollment.delete()
-                messages.success(request, 'ลบนักศึกษาออกจากกลุ่มเรียนสำเร็จ')
+        elif action == 'remove' and student_ids:
+            result = enrollment_service.withdraw_many(section, student_ids, delete=True)
+            if result.removed:
+                messages.success(request, f'ลบนักศึกษา {result.removed} คนออกจากกลุ่มเรียนสำเร็จ')
     
     enrollments = Enrollment.objects.filter(section=section, status='enrolled').select_related('student', 'student__profile')
     all_students = User.objects.filter(role='student').select_related('profile')
@@ -617,125 +569,15 @@ def import_students_excel(request):
                 # Get section
                 section = get_object_or_404(Section, id=section_id, teacher=request.user)
                 
-                # Load Excel file
-                workbook = load_workbook(excel_file, read_only=True)
-                worksheet = workbook.active
-                
-                # Expected columns: รหัสนักศึกษา, ชื่อ, นามสกุล
-                # Try to find header row
-                header_row = None
-                student_id_col = None
-                first_name_col = None
-                last_name_col = None
-                
-                for row_idx, row in enumerate(worksheet.iter_rows(max_row=10, values_only=True), start=1):
-                    row_lower = [str(cell).lower().strip() if cell else '' for cell in row]
-                    if 'รหัส' in ' '.join(row_lower) or 'student' in ' '.join(row_lower):
-                        header_row = row_idx
-                        # Find column indices
-                        for col_idx, cell in enumerate(row, start=1):
-                            cell_str = str(cell).lower().strip() if cell else ''
-                            if 'รหัส' in cell_str or 'student' in cell_str or 'id' in cell_str:
-                                student_id_col = col_idx
-                            elif 'ชื่อ' in cell_str and 'นามสกุล' not in cell_str or 'first' in cell_str:
-                                first_name_col = col_idx
-                            elif 'นามสกุล' in cell_str or 'last' in cell_str or 'surname' in cell_str:
-                                last_name_col = col_idx
-                        break
-                
-                # If no header found, assume first row is header and use first 3 columns
-                if header_row is None:
-                    header_row = 1
-                    student_id_col = 1
-                    first_name_col = 2
-                    last_name_col = 3
-                
-                # Process data rows
-                success_count = 0
-                error_count = 0
-                errors = []
-                
-                for row_idx, row in enumerate(worksheet.iter_rows(min_row=header_row + 1, values_only=True), start=header_row + 1):
-                    # Skip empty rows
-                    if not any(row):
-                        continue
-                    
-                    # Get values
-                    student_id = str(row[student_id_col - 1]).strip() if student_id_col and len(row) >= student_id_col else None
-                    first_name = str(row[first_name_col - 1]).strip() if first_name_col and len(row) >= first_name_col else ''
-                    last_name = str(row[last_name_col - 1]).strip() if last_name_col and len(row) >= last_name_col else ''
-                    
-                    if not student_id or student_id == 'None':
-                        continue
-                    
-                    try:
-                        # Check if UserProfile exists with this student_id
-                        student_profile = UserProfile.objects.filter(student_id=student_id).first()
-                        
-                        if student_profile:
-                            # User already exists, use it
-                            student = student_profile.user
-                            # Update name if provided and user doesn't have name
-                            if not student.first_name and first_name:
-                                student.first_name = first_name
-                            if not student.last_name and last_name:
-                                student.last_name = last_name
-                            student.save()
-                        else:
-                            # Create new user and student profile
-                            # Generate username from student_id
-                            username = f"student_{student_id}"
-                            # Make sure username is unique
-                            base_username = username
-                            counter = 1
-                            while User.objects.filter(username=username).exists():
-                                username = f"{base_username}_{counter}"
-                                counter += 1
-                            
-                            # Create user (name can be empty)
-                            student = User.objects.create_user(
-                                username=username,
-                                email=f"{username}@example.com",  # Temporary email
-                                password='changeme123',  # Default password, user should change
-                                first_name=first_name if first_name else '',
-                                last_name=last_name if last_name else '',
-                                role='student'
-                            )
-                            
-                            # Create student profile
-                            UserProfile.objects.create(
-                                user=student,
-                                student_id=student_id
-                            )
-                        
-                        # Create enrollment with pending status
-                        enrollment, created = Enrollment.objects.get_or_create(
-                            student=student,
-                            section=section,
-                            defaults={'status': 'pending'}
-                        )
-                        
-                        if created:
-                            success_count += 1
-                        else:
-                            # If enrollment exists but is pending, keep it as pending
-                            # If it's already enrolled, skip
-                            if enrollment.status == 'pending':
-                                pass  # Keep as pending until student registers
-                            # Already enrolled, skip
-                            pass
-                            
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f"แถว {row_idx}: {str(e)}")
+                # Batched import (see roster_import.py)
+                result = roster_import.import_roster(excel_file, section, read_names=True)
                 
-                if success_count > 0:
-                    messages.success(request, f'โหลดข้อมูลสำเร็จ {success_count} รายการ')
-                if error_count > 0:
-                    messages.warning(request, f'มีข้อผิดพลาด {error_count} รายการ')
-                if errors:
-                    for error in errors[:10]:  # Show first 10 errors
-                        messages.error(request, error)
+                if result.enrolled > 0:
+                    messages.success(request, f'โหลดข้อมูลสำเร็จ {result.enrolled} รายการ')
+                if result.error_count > 0:
+                    messages.warning(request, f'มีข้อผิดพลาด {result.error_count} รายการ')
+                for error in result.errors[:10]:  # Show first 10 errors
+                    messages.error(request, f'แถว {error.row}: {error.message}')
                 
                 return redirect('academic:import_students_excel')
                 
@@ -948,102 +790,20 @@ def section_list(request):
                         teacher=request.user
                     )
                 
-                # Load Excel file
-                workbook = load_workbook(excel_file, read_only=True)
-                worksheet = workbook.active
-                
-                # Find header row
-                header_row = None
-                student_id_col = None
-                
-                for row_idx, row in enumerate(worksheet.iter_rows(max_row=10, values_only=True), start=1):
-                    row_lower = [str(cell).lower().strip() if cell else '' for cell in row]
-                    if 'รหัส' in ' '.join(row_lower) or 'student' in ' '.join(row_lower):
-                        header_row = row_idx
-                        for col_idx, cell in enumerate(row, start=1):
-                            cell_str = str(cell).lower().strip() if cell else ''
-                            if 'รหัส' in cell_str or 'student' in cell_str or 'id' in cell_str:
-                                student_id_col = col_idx
-                                break
-                        break
-                
-                # If no header found, assume first column is student_id
-                if header_row is None:
-                    header_row = 1
-                    student_id_col = 1
-                
-                # Process data rows
-                success_count = 0
-                error_count = 0
-                errors = []
-                
-                for row_idx, row in enumerate(worksheet.iter_rows(min_row=header_row + 1, values_only=True), start=header_row + 1):
-                    # Skip empty rows
-                    if not any(row):
-                        continue
-                    
-                    # Get student_id
-                    student_id = str(row[student_id_col - 1]).strip() if student_id_col and len(row) >= student_id_col else None
-                    
-                    if not student_id or student_id == 'None':
-                        continue
-                    
-                    try:
-                        # Check if UserProfile exists with this student_id
-                        student_profile = UserProfile.objects.filter(student_id=student_id).first()
-                        
-                        if student_profile:
-                            student = student_profile.user
-                        else:
-                            # Create new user and student profile
-                            username = f"student_{student_id}"
-                            base_username = username
-                            counter = 1
-                            while User.objects.filter(username=username).exists():
-                                username = f"{base_username}_{counter}"
-                                counter += 1
-                            
-                            student = User.objects.create_user(
-                                username=username,
-                                email=f"{username}@example.com",
-                                password='changeme123',
-                                role='student'
-                            )
-                            
-                            UserProfile.objects.create(
-                                user=student,
-                                student_id=student_id
-                            )
-                        
-                        # Create enrollment with pending status
-                        enrollment, created = Enrollment.objects.get_or_create(
-                            student=student,
-                            section=section,
-                            defaults={'status': 'pending'}
-                        )
-                        
-                        if created:
-                            success_count += 1
-                        else:
-                            # If enrollment exists but is pending, keep it as pending
-                            # If it's already enrolled, skip
-                            if enrollment.status == 'pending':
-                                pass  # Keep as pending until student registers
-                            else:
-                                error_count += 1
-                                errors.append(f'รหัสนักศึกษา {student_id} ลงทะเบียนอยู่แล้ว')
-                    
-                    except Exception as e:
-                        error_count += 1
-                        errors.append(f'รหัสนักศึกษา {student_id}: {str(e)}')
+                # Batched import (see roster_import.py)
+                result = roster_import.import_roster(
+                    excel_file,
+                    section,
+                    read_names=False,
+                    report_already_enrolled=True,
+                )
                 
-                if success_count > 0:
-                    messages.success(request, f'บันทึกข้อมูลสำเร็จ {success_count} รายการ')
-                if error_count > 0:
-                    messages.warning(request, f'มีข้อผิดพลาด {error_count} รายการ')
-                if errors:
-                    for error in errors[:10]:  # Show first 10 errors
-                        messages.error(request, error)
+                if result.enrolled > 0:
+                    messages.success(request, f'บันทึกข้อมูลสำเร็จ {result.enrolled} รายการ')
+                if result.error_count > 0:
+                    messages.warning(request, f'มีข้อผิดพลาด {result.error_count} รายการ')
+                for error in result.errors[:10]:  # Show first 10 errors
+                    messages.error(request, f'รหัสนักศึกษา {error.student_id}: {error.message}')
                 
             except Exception as e:
                 messages.error(request, f'เกิดข้อผิดพลาด: {str(e)}')
@@ -1223,7 +983,8 @@ def section_delete(request, section_id):
     
     if request.method == 'POST':
         section_name = str(section)
-        section.delete()
+        with counters.batch():
+            section.delete()
         messages.success(request, f'ลบกลุ่มเรียน {section_name} สำเร็จ')
         return redirect('academic:section_list')
     
@@ -1470,10 +1231,6 @@ def add_students_from_list(request):
                 else:
                     return name, ''
             
-            created_count = 0
-            updated_count = 0
-            skipped_count = 0
-            
             # รายชื่อที่เพิ่มแล้ว (12 คนแรก)
             already_added = [
                 '68342110008-1', '68342110014-9', '68342110021-7', '68342110028-5',
@@ -1481,6 +1238,8 @@ def add_students_from_list(request):
                 '68342110063-5', '68342110070-3', '68342110077-1'
             ]
             
+            accounts = []
+            skipped_count = 0
             for student_data in students_data:
                 student_id = student_data['student_id']
                 
@@ -1488,50 +1247,24 @@ def add_students_from_list(request):
                 if student_id in already_added:
                     skipped_count += 1
                     continue
-                student_id = student_data['student_id']
-                fullname = student_data['fullname']
                 
                 # Parse Thai name
-                first_name, last_name = parse_thai_name(fullname)
+                first_name, last_name = parse_thai_name(student_data['fullname'])
                 
                 # Generate username from student_id (remove hyphen)
                 username = student_id.replace('-', '')
-                
-                # Check if user already exists
-                user, created = User.objects.get_or_create(
+                accounts.append(StudentAccount(
                     username=username,
-                    defaults={
-                        'first_name': first_name,
-                        'last_name': last_name,
-                        'role': 'student',
-                        'is_staff': False,
-                        'email': f'{username}@student.example.com'
-                    }
-                )
-                
-                if created:
-                    user.set_password('changeme123')
-                    user.save()
-                    created_count += 1
-                else:
-                    # Update existing user
-                    user.first_name = first_name
-                    user.last_name = last_name
-                    user.role = 'student'
-                    user.save()
-                    updated_count += 1
-                
-                # Create or update profile
-                profile, _ = UserProfile.objects.get_or_create(
-                    user=user,
-                    defaults={
-                        'student_id': student_id
-                    }
-                )
-                
-                if profile.student_id != student_id:
-                    profile.student_id = student_id
-                    profile.save()
+                    student_id=student_id,
+                    first_name=first_name,
+                    last_name=last_name,
+                    email=f'{username}@student.example.com',
+                ))
+            
+            # Create/update users and profiles in bulk (new accounts get an unusable password + first-login link)
+            result = provision_students(accounts)
+            created_count = result.created
+            updated_count = result.updated
             
             messages.success(
                 request,
@@ -1580,29 +1313,11 @@ def add_students_to_bis3r1(request):
                     {'username': 'std010', 'student_id': '68342110010-0', 'first_name': 'สุภาพ', 'last_name': 'ดีใจ'},
                 ]
                 
-                created_count = 0
-                for student_data in students_data:
-                    student, created = User.objects.get_or_create(
-                        username=student_data['username'],
-                        defaults={
-                            'first_name': student_data['first_name'],
-                            'last_name': student_data['last_name'],
-                            'role': 'student',
-                            'is_staff': False
-                        }
-                    )
-                    if created:
-                        student.set_password('changeme123')
-                        student.save()
-                        
-                        # Create profile
-                        profile, _ = UserProfile.objects.get_or_create(
-                            user=student,
-                            defaults={
-                                'student_id': student_data['student_id']
-                            }
-                        )
-                        created_count += 1
+                # Create sample users and profiles in bulk (new accounts get an unusable password + first-login link)
+                provision_students(
+                    [StudentAccount(**student_data) for student_data in students_data],
+                    update_existing=False,
+                )
             
             # เพิ่มนักเรียนเข้าในกลุ่มเรียน bis3r1
             all_students = User.objects.filter(role='student')
@@ -1610,17 +1325,8 @@ def add_students_to_bis3r1(request):
             available_students = all_students.exclude(id__in=enrolled_students)
             
             # เพิ่มนักเรียน 15 คนแรก (หรือทั้งหมดถ้าน้อยกว่า 15)
-            students_to_add = available_students[:15]
-            added_count = 0
-            
-            for student in students_to_add:
-                enrollment, created = Enrollment.objects.get_or_create(
-                    student=student,
-                    section=section,
-                    defaults={'status': 'enrolled'}
-                )
-                if created:
-                    added_count += 1
+            students_to_add = available_students.values_list('id', flat=True)[:15]
+            added_count = enrollment_service.enroll_many(section, students_to_add).created
             
             messages.success(
                 request,
@@ -1643,7 +1349,10 @@ def section_detail(request, section_id):
     ดูรายละเอียดกลุ่มเรียน - แสดงข้อมูลกลุ่มเรียนและรายชื่อนักเรียน
     รองรับการค้นหาและกรองข้อมูล
     """
-    section = get_object_or_404(Section, id=section_id)
+    section = get_object_or_404(
+        Section.objects.select_related('course', 'semester__academic_year', 'teacher'),
+        id=section_id,
+    )
     
     # ดึงข้อมูลการลงทะเบียนทั้งหมดในกลุ่มเรียนนี้
     enrollments = Enrollment.objects.filter(
@@ -1660,46 +1369,52 @@ def section_detail(request, section_id):
     
     # ค้นหาตามคำค้นหา (ชื่อ, นามสกุล, รหัสนักศึกษา, username)
     if search_query:
-        enrollments = enrollments.filter(
-            Q(student__first_name__icontains=search_query) |
-            Q(student__last_name__icontains=search_query) |
-            Q(student__username__icontains=search_query) |
-            Q(student__profile__student_id__icontains=search_query)
-        )
-    
-    # เรียงลำดับ
-    enrollments = enrollments.order_by('student__first_name', 'student__last_name', 'student__username')
-    
-    # แยกตามสถานะ (สำหรับสถิติ - ใช้ข้อมูลทั้งหมดไม่ใช่แค่ที่กรองแล้ว)
-    all_enrollments = Enrollment.objects.filter(section=section)
-    pending_students = all_enrollments.filter(status='pending')
-    enrolled_students = all_enrollments.filter(status='enrolled')
-    withdrawn_students = all_enrollments.filter(status='withdrawn')
-    completed_students = all_enrollments.filter(status='completed')
+        enrollments = search_users(enrollments, search_query, prefix='student__')
+    
+    # สถิติ: ทั้งกลุ่มเรียนจากตัวนับของ Section, ผลการค้นหา (เฉพาะเมื่อมีการกรอง) จาก GROUP BY query เดียว
+    filtered = enrollments if (search_query or status_filter) else None
+    
+    # เรียงลำดับ + keyset pagination
+    enrollments = paginate_request(
+        request,
+        enrollments,
+        ['student__first_name', 'student__last_name', 'student__username', 'id'],
+    )
+    if wants_json(request):
+        return json_page(enrollments, lambda e: {
+            'id': e.id,
+            'student_id': e.student.profile.student_id if hasattr(e.student, 'profile') else None,
+            'username': e.student.username,
+            'full_name': e.student.get_full_name(),
+            'status': e.status,
+            'status_display': e.get_status_display(),
+            'enrolled_at': e.enrolled_at.isoformat(),
+        })
     
-    # สถิติ
-    total_pending = pending_students.count()
-    total_enrolled = enrolled_students.count()
-    total_withdrawn = withdrawn_students.count()
-    total_completed = completed_students.count()
-    total_students = all_enrollments.count()
+    stats = roster_stats.roster_stats(section, filtered)
+    # รายชื่อในหน้านี้แยกตามสถานะ (แบ่งจากรายการที่ดึงมาแล้ว)
+    by_status = roster_stats.partition(enrollments)
     
     context = {
         'section': section,
         'enrollments': enrollments,
-        'pending_students': pending_students,
-        'enrolled_students': enrolled_students,
-        'withdrawn_students': withdrawn_students,
-        'completed_students': completed_students,
-        'total_pending': total_pending,
-        'total_enrolled': total_enrolled,
-        'total_withdrawn': total_withdrawn,
-        'total_completed': total_completed,
-        'total_students': total_students,
+        'pending_students': by_status['pending'],
+        'enrolled_students': by_status['enrolled'],
+        'withdrawn_students': by_status['withdrawn'],
+        'completed_students': by_status['completed'],
+        'status_counts': stats.counts,
+        'filtered_status_counts': stats.filtered_counts,
+        'total_pending': stats.counts['pending'],
+        'total_enrolled': stats.counts['enrolled'],
+        'total_withdrawn': stats.counts['withdrawn'],
+        'total_completed': stats.counts['completed'],
+        'total_students': stats.total,
         'capacity': section.capacity,
-        'available_slots': section.capacity - total_enrolled,
+        'available_slots': section.capacity - stats.counts['enrolled'],
         'search_query': search_query,
         'status_filter': status_filter,
+        'status_filter_display': roster_stats.STATUS_DISPLAY.get(status_filter, status_filter),
+        'result_count': stats.result_count,
     }
     
     return render(request, 'academic/section_detail.html', context)
@@ -1713,11 +1428,10 @@ def delete_enrollment(request, section_id, enrollment_id):
     section = get_object_or_404(Section, id=section_id)
     enrollment = get_object_or_404(Enrollment, id=enrollment_id, section=section)
     
-    # ตรวจสอบสิทธิ์
-    if not request.user.is_admin():
-        if not (request.user.is_teacher() and section.teacher == request.user):
-            messages.error(request, 'คุณไม่มีสิทธิ์ในการลบข้อมูลนี้')
-            return redirect('academic:section_detail', section_id=section_id)
+    # ตรวจสอบสิทธิ์ (เทียบ section.teacher_id ไม่โหลด section.teacher)
+    if not authz.access(request).can_manage(section):
+        messages.error(request, 'คุณไม่มีสิทธิ์ในการลบข้อมูลนี้')
+        return redirect('academic:section_detail', section_id=section_id)
     
     if request.method == 'POST':
         student_name = enrollment.student.get_full_name() or enrollment.student.username
@@ -1737,10 +1451,9 @@ def batch_delete_enrollments(request, section_id):
     section = get_object_or_404(Section, id=section_id)
     
     # ตรวจสอบสิทธิ์
-    if not request.user.is_admin():
-        if not (request.user.is_teacher() and section.teacher == request.user):
-            messages.error(request, 'คุณไม่มีสิทธิ์ในการลบข้อมูลนี้')
-            return redirect('academic:section_detail', section_id=section_id)
+    if not authz.access(request).can_manage(section):
+        messages.error(request, 'คุณไม่มีสิทธิ์ในการลบข้อมูลนี้')
+        return redirect('academic:section_detail', section_id=section_id)
     
     if request.method == 'POST':
         enrollment_ids = request.POST.getlist('enrollment_ids')
@@ -1762,7 +1475,8 @@ def batch_delete_enrollments(request, section_id):
             return redirect('academic:section_detail', section_id=section_id)
         
         # ลบ enrollments
-        enrollments.delete()
+        with counters.batch():
+            enrollments.delete()
         
         messages.success(request, f'ลบ {count} รายการสำเร็จ')
         return redirect('academic:section_detail', section_id=section_id)
@@ -1840,68 +1554,36 @@ def add_students_to_bis3r2(request):
                 else:
                     return name, ''
             
-            created_users = 0
-            updated_users = 0
-            added_enrollments = 0
-            skipped_enrollments = 0
-            
+            accounts = []
             for student_data in students_data:
                 student_id = student_data['student_id']
-                fullname = student_data['fullname']
                 
                 # Parse Thai name
-                first_name, last_name = parse_thai_name(fullname)
+                first_name, last_name = parse_thai_name(student_data['fullname'])
                 
                 # Generate username from student_id (remove hyphen)
                 username = student_id.replace('-', '')
-                
-                # Check if user already exists
-                user, user_created = User.objects.get_or_create(
+                accounts.append(StudentAccount(
                     username=username,
-                    defaults={
-                        'first_name': first_name,
-                        'last_name': last_name,
-                        'role': 'student',
-                        'is_staff': False,
-                        'email': f'{username}@student.example.com'
-                    }
-                )
-                
-                if user_created:
-                    user.set_password('changeme123')
-                    user.save()
-                    created_users += 1
-                else:
-                    # Update existing user
-                    user.first_name = first_name
-                    user.last_name = last_name
-                    user.role = 'student'
-                    user.save()
-                    updated_users += 1
-                
-                # Create or update profile
-                profile, _ = UserProfile.objects.get_or_create(
-                    user=user,
-                    defaults={
-                        'student_id': student_id
-                    }
-                )
-                
-                if profile.student_id != student_id:
-                    profile.student_id = student_id
-                    profile.save()
-                
-                # Add enrollment to bis3r1
-                enrollment, enrollment_created = Enrollment.objects.get_or_create(
-                    student=user,
-                    section=section,
-                    defaults={'status': 'enrolled'}
-                )
-                
-                if enrollment_created:
-                    added_enrollments += 1
-                else:
-                    skipped_enrollments += 1
+                    student_id=student_id,
+                    first_name=first_name,
+                    last_name=last_name,
+                    email=f'{username}@student.example.com',
+                ))
+            
+            # Create/update users and profiles in bulk (new accounts get an unusable password + first-login link)
+            result = provision_students(accounts)
+            created_users = result.created
+            updated_users = result.updated
+            
+            # Add enrollments to bis3r1 (existing enrollments keep their status)
+            added = enrollment_service.enroll_many(
+                section,
+                [result.users[account.username].id for account in accounts],
+                update_existing=False,
+            )
+            added_enrollments = added.created
+            skipped_enrollments = added.unchanged
             
             messages.success(
                 request,
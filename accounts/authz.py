@@ -0,0 +1,127 @@
+"""
+Authorization ต่อ request (บทบาท และกลุ่มเรียนที่ผู้ใช้สอน/ลงทะเบียน)
+
+- is_admin / is_teacher / is_student / is_teacher_or_admin: predicate สำหรับ @user_passes_test
+  (ใช้ร่วมกันทุก app แทนการประกาศซ้ำใน views แต่ละไฟล์)
+- access(request): Access ของผู้ใช้ที่ cache ไว้บน request - สร้างครั้งเดียวต่อ request
+  - taught_section_ids / enrolled_section_ids: query ครั้งเดียวเมื่อใช้ครั้งแรก (values_list ของ id)
+  - teaches(section) / can_manage(section) / can_view(section): ตรวจจาก section.teacher_id
+    หรือชุด id ข้างบน ไม่โหลด section.teacher
+  - sections(): Section ที่ผู้ใช้เห็นได้ (admin ทั้งหมด, อาจารย์ที่สอน, นักศึกษาที่ลงทะเบียน)
+  - scope(queryset): จำกัด queryset ที่มี FK ไปยัง Section (LeaveRequest, AttendanceSession, ...)
+    ด้วย section_id IN (...) แทน join/subquery กับ Section
+
+id ที่ cache ไว้เป็นของ ณ ตอนที่ query - view ที่สร้าง/ย้ายกลุ่มเรียนใน request เดียวกันเรียก reset()
+"""
+from dataclasses import dataclass, field
+
+
+def is_admin(user):
+    """Check if user is admin"""
+    return user.is_authenticated and user.is_admin()
+
+
+def is_teacher(user):
+    """Check if user is teacher"""
+    return user.is_authenticated and user.is_teacher()
+
+
+def is_student(user):
+    """Check if user is student"""
+    return user.is_authenticated and user.is_student()
+
+
+def is_teacher_or_admin(user):
+    """Check if user is teacher or admin"""
+    return user.is_authenticated and (user.is_teacher() or user.is_admin())
+
+
+@dataclass
+class Access:
+    user: object
+    role: str = None                                # None = ยังไม่ได้ login
+    _taught: frozenset = field(default=None, repr=False)
+    _enrolled: frozenset = field(default=None, repr=False)
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+    @property
+    def is_teacher(self):
+        return self.role == 'teacher'
+
+    @property
+    def is_student(self):
+        return self.role == 'student'
+
+    @property
+    def taught_section_ids(self):
+        """id ของกลุ่มเรียนที่อาจารย์สอน (ว่างสำหรับบทบาทอื่น)"""
+        if self._taught is None:
+            from academic.models import Section
+            self._taught = frozenset(
+                Section.objects.filter(teacher_id=self.user.pk).values_list('id', flat=True)
+            ) if self.is_teacher else frozenset()
+        return self._taught
+
+    @property
+    def enrolled_section_ids(self):
+        """id ของกลุ่มเรียนที่นักศึกษาลงทะเบียน (ว่างสำหรับบทบาทอื่น)"""
+        if self._enrolled is None:
+            from academic.models import Enrollment
+            self._enrolled = frozenset(
+                Enrollment.objects.filter(student_id=self.user.pk).values_list('section_id', flat=True)
+            ) if self.is_student else frozenset()
+        return self._enrolled
+
+    def reset(self):
+        self._taught = self._enrolled = None
+
+    def teaches(self, section):
+        """section: Section หรือ id - ถ้าเป็น Section ใช้ teacher_id ของแถวนั้น (ไม่ query)"""
+        if not self.is_teacher:
+            return False
+        if hasattr(section, 'teacher_id'):
+            return section.teacher_id == self.user.pk
+        return int(section) in self.taught_section_ids
+
+    def attends(self, section):
+        section_id = getattr(section, 'pk', section)
+        return self.is_student and int(section_id) in self.enrolled_section_ids
+
+    def can_manage(self, section):
+        """แก้ไขข้อมูลของกลุ่มเรียนได้ (admin หรืออาจารย์ผู้สอน)"""
+        return self.is_admin or self.teaches(section)
+
+    def can_view(self, section):
+        """ดูรายงานของกลุ่มเรียนได้ (admin, อาจารย์ผู้สอน หรือนักศึกษาที่ลงทะเบียน)"""
+        return self.can_manage(section) or self.attends(section)
+
+    def sections(self, queryset=None):
+        """Section ที่ผู้ใช้เห็นได้"""
+        if queryset is None:
+            from academic.models import Section
+            queryset = Section.objects.all()
+        if self.is_admin:
+            return queryset
+        if self.is_teacher:
+            return queryset.filter(teacher_id=self.user.pk)
+        return queryset.filter(id__in=self.enrolled_section_ids)
+
+    def scope(self, queryset, section_field='section'):
+        """จำกัด queryset ให้เหลือเฉพาะแถวของกลุ่มเรียนที่ผู้ใช้ดูแล (admin ไม่จำกัด)"""
+        if self.is_admin:
+            return queryset
+        ids = self.taught_section_ids if self.is_teacher else self.enrolled_section_ids
+        return queryset.filter(**{f'{section_field}_id__in': ids})
+
+
+def access(request):
+    """Access ของ request.user - cache บน request (สร้างใหม่ถ้า request.user เปลี่ยน เช่นหลัง login/logout)"""
+    user = request.user
+    cached = getattr(request, '_access', None)
+    if cached is None or cached.user is not user:
+        cached = Access(user=user, role=user.role if user.is_authenticated else None)
+        request._access = cached
+    return cached
@@ -0,0 +1,22 @@
+"""
+สร้าง UserProfile ให้ผู้ใช้ที่ยังไม่มี (การอ่าน profile ไม่สร้างให้อีกต่อไป ดู User.get_profile)
+
+    python manage.py backfill_user_profiles
+    python manage.py backfill_user_profiles --dry-run     # นับอย่างเดียว
+"""
+from django.core.management.base import BaseCommand
+
+from accounts.provisioning import BATCH_SIZE, backfill_profiles
+
+
+class Command(BaseCommand):
+    help = 'Create missing UserProfile rows for existing users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Profiles per INSERT')
+        parser.add_argument('--dry-run', action='store_true', help='Only count users without a profile')
+
+    def handle(self, *args, **options):
+        count = backfill_profiles(options['batch_size'], dry_run=options['dry_run'])
+        verb = 'Found' if options['dry_run'] else 'Created profiles for'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {count} user(s) without a profile'))
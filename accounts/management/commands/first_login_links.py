@@ -0,0 +1,49 @@
+"""
+พิมพ์ลิงก์ตั้งรหัสผ่านครั้งแรกของนักศึกษาที่ยังไม่มีรหัสผ่าน (ดู accounts/provisioning.py)
+
+    python manage.py first_login_links --base-url https://checkin.example.ac.th
+    python manage.py first_login_links --section 42 -o links.csv    # เฉพาะกลุ่มเรียน 42
+"""
+import csv
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.management.base import BaseCommand
+
+from accounts import provisioning
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Write one-time first-login links (CSV) for students whose password is not set yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--section', type=int, help='Only students enrolled in this section id')
+        parser.add_argument('--base-url', default='', help='Prefix for the links, e.g. https://checkin.example.ac.th')
+        parser.add_argument('-o', '--output', help='CSV file to write (default: stdout)')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(role='student', is_active=True, password__startswith=UNUSABLE_PASSWORD_PREFIX)
+        if options['section']:
+            users = users.filter(enrollments__section_id=options['section'])
+        users = users.select_related('profile').order_by('username').distinct()
+        base_url = options['base_url'].rstrip('/')
+
+        out = open(options['output'], 'w', newline='', encoding='utf-8-sig') if options['output'] else self.stdout
+        try:
+            writer = csv.writer(out)
+            writer.writerow(['username', 'student_id', 'name', 'url'])
+            count = 0
+            for user in users.iterator(chunk_size=provisioning.BATCH_SIZE):
+                profile = getattr(user, 'profile', None)
+                writer.writerow([
+                    user.username,
+                    profile.student_id if profile else '',
+                    user.get_full_name(),
+                    base_url + provisioning.first_login_path(user),
+                ])
+                count += 1
+        finally:
+            if options['output']:
+                out.close()
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f'Wrote {count} link(s) to {options["output"]}'))
@@ -0,0 +1,48 @@
+"""
+ลบหรือปิดบัญชีผู้ใช้เป็นชุด (ดู accounts/purge.py)
+
+    python manage.py purge_users --ids 12 13 14 --dry-run            # จำนวนแถวที่จะถูกลบ
+    python manage.py purge_users --username-prefix 64 --role student  # นักศึกษารุ่น 64 ทั้งหมด
+    python manage.py purge_users --username-prefix 64 --role student --archive   # ปิดบัญชีแทนการลบ
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import purge
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Delete (or archive) users in chunked set-based transactions, with a dry-run cascade preview'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', type=int, nargs='+', help='User id(s)')
+        parser.add_argument('--username-prefix', help='Users whose username starts with this prefix')
+        parser.add_argument('--role', choices=[role for role, _ in User.ROLE_CHOICES], help='Only users with this role')
+        parser.add_argument('--archive', action='store_true', help='Deactivate instead of deleting (keeps history)')
+        parser.add_argument('--dry-run', action='store_true', help='Report affected row counts without changing data')
+        parser.add_argument('--chunk-size', type=int, default=purge.CHUNK_SIZE, help='Users per transaction')
+
+    def handle(self, *args, **options):
+        if not options['ids'] and not options['username_prefix']:
+            raise CommandError('Give --ids or --username-prefix')
+        users = User.objects.all()
+        if options['ids']:
+            users = users.filter(id__in=options['ids'])
+        if options['username_prefix']:
+            users = users.filter(username__startswith=options['username_prefix'])
+        if options['role']:
+            users = users.filter(role=options['role'])
+        # ไม่แตะ superuser จากคำสั่งนี้
+        user_ids = list(users.filter(is_superuser=False).order_by('id').values_list('id', flat=True))
+
+        service = purge.archive_users if options['archive'] else purge.delete_users
+        result = service(user_ids, dry_run=options['dry_run'], chunk_size=options['chunk_size'])
+
+        for label, n in sorted(result.deleted.items()):
+            self.stdout.write(f'  delete   {label:<40} {n}')
+        for label, n in sorted(result.updated.items()):
+            self.stdout.write(f'  update   {label:<40} {n}')
+        verb = 'Archived' if options['archive'] else 'Deleted'
+        if options['dry_run']:
+            verb = 'Would affect'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {result.users} user(s), {result.total_rows} row(s)'))
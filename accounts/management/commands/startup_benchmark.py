@@ -0,0 +1,72 @@
+"""
+วัดเวลา cold start ของ worker และ import cost ต่อ app (ดู checkin_project/startup.py)
+
+    python manage.py startup_benchmark                              # วัด 3 รอบ ตรวจกับงบใน settings
+    python manage.py startup_benchmark --runs 5 --json
+    python manage.py startup_benchmark --save-baseline var/startup.json
+    python manage.py startup_benchmark --baseline var/startup.json --tolerance 0.2   # fail ถ้าช้ากว่า baseline
+
+exit code ไม่เป็น 0 เมื่อเปิด connection ฐานข้อมูลตอน import, โหลด STARTUP_LAZY_MODULES ตอน start
+หรือเวลาเกิน STARTUP_BUDGET_SECONDS / STARTUP_APP_IMPORT_BUDGET_MS / baseline
+"""
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from checkin_project import startup
+
+
+class Command(BaseCommand):
+    help = 'Measure worker cold-start time and per-app import cost, and fail on budget regressions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Fresh interpreter runs (median is reported)')
+        parser.add_argument('--top', type=int, default=10, help='Show the N most expensive packages')
+        parser.add_argument('--baseline', help='Compare against a report saved with --save-baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown vs baseline (0.25 = 25%%)')
+        parser.add_argument('--save-baseline', help='Write this report to a JSON file')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                baseline = json.loads(Path(options['baseline']).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read baseline {options["baseline"]}: {e}')
+
+        try:
+            report = startup.measure(options['runs'])
+        except RuntimeError as e:
+            raise CommandError(f'Startup probe failed: {e}')
+        problems = startup.violations(report, baseline, options['tolerance'])
+
+        if options['save_baseline']:
+            path = Path(options['save_baseline'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report.as_dict(), indent=2))
+
+        if options['json']:
+            self.stdout.write(json.dumps({**report.as_dict(), 'violations': problems}, indent=2))
+        else:
+            self.print_report(report, options['top'])
+
+        if problems:
+            raise CommandError('Startup budget exceeded:\n  ' + '\n  '.join(problems))
+        if not options['json']:
+            self.stdout.write(self.style.SUCCESS('Startup within budget'))
+
+    def print_report(self, report, top):
+        self.stdout.write(
+            f'cold start {report.cold_start * 1000:.0f}ms (median of {report.runs}) - '
+            f'django.setup {report.setup * 1000:.0f}ms, URLconf {report.urlconf * 1000:.0f}ms'
+        )
+        local = startup.local_packages()
+        self.stdout.write('project apps:')
+        for package in local:
+            self.stdout.write(f'  {package:<24} {report.imports.get(package, 0):8.1f}ms')
+        self.stdout.write(f'top {top} packages:')
+        ranked = sorted(report.imports.items(), key=lambda item: item[1], reverse=True)
+        for package, ms in ranked[:top]:
+            self.stdout.write(f'  {package:<24} {ms:8.1f}ms')
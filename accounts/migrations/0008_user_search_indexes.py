@@ -0,0 +1,73 @@
+# Generated manually
+"""
+Indexes สำหรับ accounts/search.py (PostgreSQL เท่านั้น)
+
+- pg_trgm GIN บน UPPER(col) ให้ตรงกับ SQL ของ icontains/istartswith ของ Django
+  (UPPER("col"::text) LIKE UPPER('%...%'))
+- varchar_pattern_ops บนรหัสนักศึกษา/อาจารย์สำหรับการค้นหาแบบขึ้นต้นด้วย (LIKE '65%')
+
+สร้างแบบ CONCURRENTLY เพื่อไม่ล็อกตารางผู้ใช้ระหว่าง migrate (migration จึงไม่เป็น atomic)
+CREATE EXTENSION ต้องใช้สิทธิ์ที่เพียงพอบนฐานข้อมูล
+"""
+from django.db import migrations
+
+
+TRIGRAM_COLUMNS = [
+    ('accounts_user', 'username'),
+    ('accounts_user', 'email'),
+    ('accounts_user', 'first_name'),
+    ('accounts_user', 'last_name'),
+    ('accounts_userprofile', 'student_id'),
+    ('accounts_userprofile', 'teacher_employee_id'),
+]
+
+PATTERN_COLUMNS = [
+    ('accounts_userprofile', 'student_id'),
+    ('accounts_userprofile', 'teacher_employee_id'),
+]
+
+
+def _trigram_index(table, column):
+    return f'{table}_{column}_trgm'
+
+
+def _pattern_index(table, column):
+    return f'{table}_{column}_like'
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {_trigram_index(table, column)} '
+            f'ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+    for table, column in PATTERN_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {_pattern_index(table, column)} '
+            f'ON {table} ({column} varchar_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {_trigram_index(table, column)}')
+    for table, column in PATTERN_COLUMNS:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {_pattern_index(table, column)}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0007_faculty_alter_userprofile_teacher_faculty_major_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
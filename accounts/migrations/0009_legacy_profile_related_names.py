@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:27
+"""
+- related_name ของโมเดล profile เก่าเปลี่ยนเป็น legacy_* (ไม่ทับ User.student_profile ฯลฯ)
+- สร้าง UserProfile ให้ผู้ใช้ที่ยังไม่มี (การอ่าน profile ไม่สร้างให้อีกต่อไป)
+"""
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_profiles(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    missing = User.objects.filter(profile__isnull=True).values_list('id', flat=True)
+    UserProfile.objects.bulk_create([UserProfile(user_id=user_id) for user_id in missing], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='adminprofile',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='legacy_admin_profile', to=settings.AUTH_USER_MODEL, verbose_name='ผู้ใช้'),
+        ),
+        migrations.AlterField(
+            model_name='studentprofile',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='legacy_student_profile', to=settings.AUTH_USER_MODEL, verbose_name='ผู้ใช้'),
+        ),
+        migrations.AlterField(
+            model_name='teacherprofile',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='legacy_teacher_profile', to=settings.AUTH_USER_MODEL, verbose_name='ผู้ใช้'),
+        ),
+        migrations.RunPython(backfill_profiles, migrations.RunPython.noop),
+    ]
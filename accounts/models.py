@@ -86,30 +86,32 @@ class User(AbstractUser):
     def is_student(self):
         return self.role == 'student'
     
+    def get_profile(self):
+        """
+        UserProfile ของผู้ใช้ หรือ None ถ้ายังไม่มี (อ่านอย่างเดียว ไม่สร้างใหม่)
+        ใช้ cache ของ relation 'profile' - query ครั้งเดียวต่อ instance และไม่ query เลยถ้า select_related('profile')
+        profile ถูกสร้างตอนสร้างผู้ใช้ (signals.py) หรือด้วย `python manage.py backfill_user_profiles`
+        """
+        try:
+            return self.profile
+        except UserProfile.DoesNotExist:
+            return None
+    
     # Profile access methods (backward compatibility)
     @property
     def admin_profile(self):
         """Backward compatibility for admin_profile"""
-        if self.is_admin():
-            profile, _ = UserProfile.objects.get_or_create(user=self)
-            return profile
-        return None
+        return self.get_profile() if self.is_admin() else None
     
     @property
     def teacher_profile(self):
         """Backward compatibility for teacher_profile"""
-        if self.is_teacher():
-            profile, _ = UserProfile.objects.get_or_create(user=self)
-            return profile
-        return None
+        return self.get_profile() if self.is_teacher() else None
     
     @property
     def student_profile(self):
         """Backward compatibility for student_profile"""
-        if self.is_student():
-            profile, _ = UserProfile.objects.get_or_create(user=self)
-            return profile
-        return None
+        return self.get_profile() if self.is_student() else None
 
 
 class UserProfile(models.Model):
@@ -213,12 +215,13 @@ class UserProfile(models.Model):
 
 
 # Backward compatibility models (deprecated - will be removed after migration)
+# related_name ขึ้นต้นด้วย legacy_ เพื่อไม่ให้ทับ User.admin_profile/teacher_profile/student_profile
 class AdminProfile(models.Model):
     """Deprecated - Use UserProfile instead"""
     user = models.OneToOneField(
         User,
         on_delete=models.CASCADE,
-        related_name='admin_profile',
+        related_name='legacy_admin_profile',
         verbose_name='ผู้ใช้'
     )
     department = models.CharField(max_length=100, blank=True, null=True, verbose_name='หน่วยงาน')
@@ -237,7 +240,7 @@ class TeacherProfile(models.Model):
     user = models.OneToOneField(
         User,
         on_delete=models.CASCADE,
-        related_name='teacher_profile',
+        related_name='legacy_teacher_profile',
         verbose_name='ผู้ใช้'
     )
     employee_id = models.CharField(max_length=50, unique=True, blank=True, null=True, verbose_name='รหัสอาจารย์')
@@ -259,7 +262,7 @@ class StudentProfile(models.Model):
     user = models.OneToOneField(
         User,
         on_delete=models.CASCADE,
-        related_name='student_profile',
+        related_name='legacy_student_profile',
         verbose_name='ผู้ใช้'
     )
     student_id = models.CharField(max_length=50, unique=True, verbose_name='รหัสนักศึกษา')
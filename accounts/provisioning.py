@@ -0,0 +1,148 @@
+"""
+Bulk provisioning of student accounts
+
+การสร้างบัญชีทีละคนด้วย create_user/set_password จะรัน PBKDF2 เต็มรอบทุกคน
+ซึ่งเป็นเวลาส่วนใหญ่ของการนำเข้านักศึกษาจำนวนมาก โมดูลนี้สร้างบัญชีเป็นชุดแทน:
+
+- password=None (ค่าเริ่มต้น): unusable password (สุ่มต่อบัญชี ไม่ต้อง hash) - ไม่มี hash ที่อ่อนหรือใช้ร่วมกัน
+  นักศึกษาตั้งรหัสผ่านเองครั้งแรกผ่านลิงก์ first login (first_login_path) ซึ่งใช้ได้ครั้งเดียว:
+  token ผูกกับค่า User.password จึงใช้ไม่ได้อีกเมื่อตั้งรหัสผ่านแล้ว และหมดอายุตาม PASSWORD_RESET_TIMEOUT
+  แจกลิงก์ด้วย `python manage.py first_login_links` (ออกลิงก์ใหม่ได้ทุกเมื่อ)
+  หรือนักศึกษาสมัครเองผ่าน register_view (บัญชีจาก Excel)
+- password='...': hash เต็มรอบทีละบัญชี (ช้า ใช้กับบัญชีจำนวนน้อยเท่านั้น)
+"""
+from dataclasses import dataclass, field
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.db import transaction
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .models import User, UserProfile
+
+
+BATCH_SIZE = 1000
+
+
+def password_hash(password=None):
+    """ค่า User.password สำหรับบัญชีใหม่หนึ่งบัญชี"""
+    # None: unusable password - สุ่มต่อบัญชี ไม่มีค่าใช้จ่ายในการ hash
+    return make_password(password)
+
+
+class FirstLoginTokenGenerator(PasswordResetTokenGenerator):
+    """token ใช้ครั้งเดียวสำหรับตั้งรหัสผ่านครั้งแรกของบัญชีที่ยังไม่มีรหัสผ่าน"""
+    key_salt = 'accounts.provisioning.FirstLoginTokenGenerator'
+
+
+first_login_token = FirstLoginTokenGenerator()
+
+
+def first_login_path(user):
+    """path ของหน้าตั้งรหัสผ่านครั้งแรก (accounts:first_login) ของ user"""
+    uidb64 = urlsafe_base64_encode(force_bytes(user.pk))
+    return reverse('accounts:first_login', args=[uidb64, first_login_token.make_token(user)])
+
+
+@dataclass
+class StudentAccount:
+    """ข้อมูลบัญชีนักศึกษาหนึ่งคนที่จะสร้าง/อัปเดต"""
+    username: str
+    student_id: str
+    first_name: str = ''
+    last_name: str = ''
+    email: str = ''
+
+
+@dataclass
+class ProvisionResult:
+    users: dict = field(default_factory=dict)  # username -> User
+    created: int = 0
+    updated: int = 0
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def provision_students(accounts, password=None, update_existing=True, batch_size=BATCH_SIZE):
+    """
+    สร้างบัญชีนักศึกษาและ UserProfile เป็นชุด (จับคู่ด้วย username)
+    - บัญชีที่ยังไม่มี: bulk_create พร้อม password_hash(password)
+    - บัญชีที่มีอยู่แล้ว: อัปเดตชื่อและ role (ถ้า update_existing) โดยไม่แตะรหัสผ่าน
+    - UserProfile: สร้างถ้ายังไม่มี และแก้ student_id ถ้าไม่ตรง
+    ใช้ query จำนวนคงที่ต่อชุด ไม่ขึ้นกับจำนวนบัญชี
+    """
+    result = ProvisionResult()
+    accounts = list({account.username: account for account in accounts}.values())
+
+    with transaction.atomic():
+        for batch in _batches(accounts, batch_size):
+            existing = User.objects.in_bulk([account.username for account in batch], field_name='username')
+
+            updated = []
+            new_users = []
+            for account in batch:
+                user = existing.get(account.username)
+                if user is None:
+                    new_users.append(User(
+                        username=account.username,
+                        email=account.email,
+                        password=password_hash(password),
+                        first_name=account.first_name,
+                        last_name=account.last_name,
+                        role='student',
+                    ))
+                elif update_existing:
+                    user.first_name = account.first_name
+                    user.last_name = account.last_name
+                    user.role = 'student'
+                    updated.append(user)
+
+            if updated:
+                User.objects.bulk_update(updated, ['first_name', 'last_name', 'role'])
+            users = dict(existing)
+            for user in User.objects.bulk_create(new_users):
+                users[user.username] = user
+            result.created += len(new_users)
+            result.updated += len(updated)
+            result.users.update(users)
+
+            profiles = {
+                profile.user_id: profile
+                for profile in UserProfile.objects.filter(user_id__in=[user.id for user in users.values()])
+            }
+            new_profiles = []
+            changed_profiles = []
+            for account in batch:
+                user = users[account.username]
+                profile = profiles.get(user.id)
+                if profile is None:
+                    new_profiles.append(UserProfile(user=user, student_id=account.student_id))
+                elif profile.student_id != account.student_id:
+                    profile.student_id = account.student_id
+                    changed_profiles.append(profile)
+            if changed_profiles:
+                UserProfile.objects.bulk_update(changed_profiles, ['student_id'])
+            UserProfile.objects.bulk_create(new_profiles)
+
+    return result
+
+
+def backfill_profiles(batch_size=BATCH_SIZE, dry_run=False):
+    """
+    สร้าง UserProfile (ค่าว่าง) ให้ผู้ใช้ที่ยังไม่มี - ผู้ใช้ที่สร้างก่อนมี post_save (signals.py)
+    หรือสร้างด้วย bulk_create โดยไม่สร้าง profile คืนค่าจำนวนผู้ใช้ที่ไม่มี profile
+    """
+    missing = User.objects.filter(profile__isnull=True).order_by('id').values_list('id', flat=True)
+    if dry_run:
+        return missing.count()
+    created = 0
+    with transaction.atomic():
+        for ids in _batches(list(missing), batch_size):
+            UserProfile.objects.bulk_create([UserProfile(user_id=user_id) for user_id in ids])
+            created += len(ids)
+    return created
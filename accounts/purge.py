@@ -0,0 +1,186 @@
+"""
+Bulk deletion / archival of user accounts (เช่น นักศึกษาที่จบการศึกษาทั้งรุ่น)
+
+user.delete() ทีละคนให้ Django เก็บ cascade ใน Python (โหลด Enrollment, AttendanceRecord,
+LeaveRequest, เซสชันที่สร้าง, profile ทีละแถวพร้อมส่ง signal) โมดูลนี้แทนด้วย:
+
+- plan(): อ่าน cascade จาก _meta ของ User ครั้งเดียว (CASCADE -> ลบ, SET_NULL -> UPDATE,
+  many-to-many -> ลบแถวของตารางเชื่อม) เรียงลูกก่อนแม่ แต่ละขั้นเป็น queryset แบบ subquery
+- delete_users(): ลบทีละ chunk ของผู้ใช้ (transaction ละ chunk) ด้วย DELETE/UPDATE แบบ set-based
+  หนึ่ง statement ต่อขั้น แล้วทำผลข้างเคียงที่ signal เคยทำเอง (_side_effects)
+- dry_run=True: นับจำนวนแถวที่จะถูกลบ/แก้ต่อโมเดลโดยไม่เปลี่ยนข้อมูล
+- archive_users(): ไม่ลบ - ปิดบัญชี (is_active=False, unusable password) เก็บประวัติการเข้าเรียนไว้ครบ
+
+ใช้โดย user_delete / batch_delete_users และ `python manage.py purge_users`
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.db import models, transaction
+
+from .models import User
+
+
+CHUNK_SIZE = 500
+
+
+@dataclass
+class Step:
+    action: str          # 'delete' หรือ 'set_null'
+    queryset: object
+    field: str = None    # ฟิลด์ที่ตั้งเป็น NULL (set_null)
+
+    @property
+    def label(self):
+        label = self.queryset.model._meta.label
+        return f'{label}.{self.field}' if self.field else label
+
+
+@dataclass
+class PurgeResult:
+    users: int = 0
+    deleted: Counter = field(default_factory=Counter)     # model label -> จำนวนแถวที่ลบ
+    updated: Counter = field(default_factory=Counter)     # 'label.field' -> จำนวนแถวที่ตั้งเป็น NULL
+    skipped: list = field(default_factory=list)           # id ที่ไม่ได้ดำเนินการ (ไม่พบ/ยกเว้น)
+    dry_run: bool = False
+
+    @property
+    def total_rows(self):
+        return sum(self.deleted.values()) + sum(self.updated.values())
+
+    def rows(self):
+        """[(ชื่อที่แสดง, จำนวน, 'delete'|'set_null')] สำหรับหน้ายืนยัน/ผลลัพธ์"""
+        rows = [(_describe(label), n, 'delete') for label, n in sorted(self.deleted.items())]
+        rows += [(_describe(label), n, 'set_null') for label, n in sorted(self.updated.items())]
+        return rows
+
+
+def _describe(label):
+    app_label, model_name, *field_name = label.split('.')
+    opts = apps.get_model(app_label, model_name)._meta
+    if field_name:
+        return f'{opts.verbose_name_plural} ({opts.get_field(field_name[0]).verbose_name})'
+    return str(opts.verbose_name_plural)
+
+
+def _plan(model, queryset, steps, depth=0):
+    if depth > 8:
+        raise ValueError(f'Cascade from {model._meta.label} is too deep')
+    for rel in model._meta.related_objects:
+        related = rel.related_model
+        if rel.many_to_many:
+            through = rel.through
+            if through._meta.auto_created:
+                steps.append(Step('delete', through._base_manager.filter(
+                    **{f'{rel.field.m2m_reverse_field_name()}__in': queryset},
+                )))
+            continue
+        related_qs = related._base_manager.filter(**{f'{rel.field.name}__in': queryset})
+        if rel.on_delete is models.CASCADE:
+            _plan(related, related_qs, steps, depth + 1)
+        elif rel.on_delete is models.SET_NULL:
+            steps.append(Step('set_null', related_qs, rel.field.name))
+        elif rel.on_delete is not models.DO_NOTHING:
+            raise ValueError(f'Unsupported on_delete for {related._meta.label}.{rel.field.name}')
+    for m2m in model._meta.many_to_many:
+        through = m2m.remote_field.through
+        if through._meta.auto_created:
+            steps.append(Step('delete', through._base_manager.filter(
+                **{f'{m2m.m2m_field_name()}__in': queryset},
+            )))
+    steps.append(Step('delete', queryset))
+    return steps
+
+
+def plan(users):
+    """ขั้นตอนการลบของ queryset ผู้ใช้ (ลูกก่อนแม่)"""
+    return _plan(User, users, [])
+
+
+def _side_effects(users):
+    """
+    สิ่งที่ signal ของ Enrollment/AttendanceSession เคยทำระหว่าง delete() ทีละแถว
+    เรียกก่อนลบ (ต้องอ่านแถวที่จะถูกลบ) ภายใน transaction ของ chunk - cache ถูกล้างหลัง commit
+    """
+    from academic import catalog, counters
+    from academic.models import Enrollment
+    from attendance import roster_cache, summary
+    from attendance.models import AttendanceSession
+
+    enrollments = Enrollment.objects.filter(student__in=users)
+    deltas = counters.grouped(enrollments)
+    section_ids = {section_id for section_id, _ in deltas}
+    sessions = list(AttendanceSession.objects.filter(teacher__in=users).values_list('id', 'section_id'))
+
+    counters.apply(Counter({key: -n for key, n in deltas.items()}))
+    # จำนวนนักศึกษา/อาจารย์ผู้สอนใน catalog เปลี่ยน
+    catalog.invalidate_on_commit()
+    for section_id in section_ids:
+        transaction.on_commit(lambda section_id=section_id: roster_cache.invalidate_section(section_id))
+    for session_id, section_id in sessions:
+        transaction.on_commit(lambda session_id=session_id: roster_cache.invalidate_session(session_id))
+    # เซสชันของอาจารย์ที่ถูกลบพา record ของนักศึกษาคนอื่นไปด้วย - คำนวณ summary ของกลุ่มเรียนใหม่
+    for section_id in {section_id for _, section_id in sessions}:
+        summary.schedule_refresh(section_id)
+
+
+def _chunks(ids, size):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _target_ids(user_ids, exclude_ids=()):
+    requested = {int(user_id) for user_id in user_ids if str(user_id).isdigit()}
+    found = set(User.objects.filter(id__in=requested).exclude(id__in=exclude_ids).values_list('id', flat=True))
+    return sorted(found), sorted(requested - found)
+
+
+def delete_users(user_ids, exclude_ids=(), dry_run=False, chunk_size=CHUNK_SIZE):
+    """
+    ลบผู้ใช้พร้อม cascade ทั้งหมดเป็นชุด (transaction ละ chunk_size ผู้ใช้)
+    dry_run=True: คืนจำนวนแถวที่จะได้รับผลกระทบโดยไม่ลบ
+    """
+    ids, skipped = _target_ids(user_ids, exclude_ids)
+    result = PurgeResult(skipped=skipped, dry_run=dry_run)
+    for chunk in _chunks(ids, chunk_size):
+        users = User.objects.filter(id__in=chunk)
+        steps = plan(users)
+        if dry_run:
+            for step in steps:
+                target = result.deleted if step.action == 'delete' else result.updated
+                target[step.label] += step.queryset.count()
+            result.users += len(chunk)
+            continue
+        with transaction.atomic():
+            _side_effects(users)
+            for step in steps:
+                if step.action == 'delete':
+                    # DELETE ... WHERE ... IN (subquery) ครั้งเดียว ไม่ผ่าน Collector/signal (ดู _side_effects)
+                    result.deleted[step.label] += step.queryset._raw_delete(step.queryset.db)
+                else:
+                    result.updated[step.label] += step.queryset.update(**{step.field: None})
+        result.users += len(chunk)
+    result.deleted = Counter({label: n for label, n in result.deleted.items() if n})
+    result.updated = Counter({label: n for label, n in result.updated.items() if n})
+    return result
+
+
+def archive_users(user_ids, exclude_ids=(), dry_run=False, chunk_size=CHUNK_SIZE):
+    """
+    ปิดบัญชีแทนการลบ: is_active=False และ unusable password (login ไม่ได้, session เดิมใช้ไม่ได้)
+    การลงทะเบียน การเข้าเรียน และใบลายังอยู่ครบ รายงานย้อนหลังจึงยังแสดงผู้ใช้เหล่านี้
+    """
+    ids, skipped = _target_ids(user_ids, exclude_ids)
+    result = PurgeResult(skipped=skipped, dry_run=dry_run)
+    for chunk in _chunks(ids, chunk_size):
+        users = User.objects.filter(id__in=chunk, is_active=True)
+        if dry_run:
+            n = users.count()
+        else:
+            with transaction.atomic():
+                n = users.update(is_active=False, password=make_password(None))
+        result.updated[f'{User._meta.label}.is_active'] += n
+        result.users += n
+    return result
@@ -0,0 +1,114 @@
+"""
+User search (รายชื่อผู้ใช้, รายชื่อนักศึกษาในกลุ่มเรียน และ typeahead)
+
+- รหัสนักศึกษา/รหัสอาจารย์ที่ตรงทั้งหมด: ใช้ unique index ตรง ๆ (คืนผลเดียว)
+- คำค้นแต่ละคำ (แยกด้วยช่องว่าง เช่น "สมชาย ใจดี") ต้องพบ (icontains) ในฟิลด์ใดฟิลด์หนึ่ง
+  แต่ละคำเป็น id IN (<ค้นใน User> UNION <ค้นใน UserProfile>) - แต่ละฝั่งเป็น OR ของคอลัมน์ในตารางเดียว
+  PostgreSQL จึงใช้ GIN index แบบ pg_trgm ของแต่ละตาราง (UPPER(col) gin_trgm_ops, ดู accounts/migrations/0008)
+  แบบ BitmapOr ได้ (OR ข้ามสองตารางผ่าน LEFT JOIN ใช้ index ไม่ได้ ต้อง sequential scan)
+  คำที่สั้นกว่า 3 ตัวอักษร trigram กรองได้ไม่ดี แต่ผลลัพธ์เหมือนเดิม (ยังเป็น icontains)
+- SQLite (ทดสอบ) ใช้ query เดียวกันโดยไม่มี index
+"""
+import re
+import unicodedata
+
+from django.db.models import Q
+
+from .models import User, UserProfile
+
+
+# ฟิลด์ที่ค้นหา แยกตามตาราง
+USER_FIELDS = ('username', 'email', 'first_name', 'last_name')
+PROFILE_FIELDS = ('student_id', 'teacher_employee_id')
+
+ID_FIELDS = PROFILE_FIELDS
+
+MAX_TERMS = 5
+
+# รหัสนักศึกษา/อาจารย์: ตัวเลข (อาจมีขีด) เช่น 6512345, 65-123456
+ID_QUERY_RE = re.compile(r'^\d[\d-]{2,49}$')
+
+
+def normalize(query):
+    """ตัดช่องว่างซ้ำและ normalize Unicode (สระ/วรรณยุกต์ไทยที่พิมพ์ต่างลำดับกัน)"""
+    return ' '.join(unicodedata.normalize('NFC', query or '').split())
+
+
+def is_id_query(query):
+    return bool(ID_QUERY_RE.match(query))
+
+
+def _any_field(fields, lookup, value):
+    condition = Q()
+    for name in fields:
+        condition |= Q(**{f'{name}__{lookup}': value})
+    return condition
+
+
+def matching_user_ids(term):
+    """subquery ของ id ผู้ใช้ที่มี term ในฟิลด์ใดฟิลด์หนึ่ง (UNION ของสองตาราง ไม่ JOIN)"""
+    users = User.objects.filter(_any_field(USER_FIELDS, 'icontains', term)).order_by().values('id')
+    profiles = UserProfile.objects.filter(_any_field(PROFILE_FIELDS, 'icontains', term)).order_by().values('user_id')
+    return users.union(profiles)
+
+
+def _term_filter(term, prefix):
+    return Q(**{f'{prefix}pk__in': matching_user_ids(term)})
+
+
+def search_filter(query, prefix=''):
+    """
+    Q ของคำค้น (ทุกคำต้องพบ) - prefix คือ path ไปยัง User เช่น 'student__'
+    คืนค่า None ถ้าไม่มีคำค้น
+    """
+    terms = normalize(query).split()[:MAX_TERMS]
+    if not terms:
+        return None
+    condition = Q()
+    for term in terms:
+        condition &= _term_filter(term, prefix)
+    return condition
+
+
+def exact_id_filter(query, prefix=''):
+    profiles = UserProfile.objects.filter(_any_field(ID_FIELDS, 'exact', query)).values('user_id')
+    return Q(**{f'{prefix}pk__in': profiles})
+
+
+def search_users(queryset, query, prefix=''):
+    """
+    กรอง queryset (User หรือโมเดลที่ชี้ไปยัง User ผ่าน prefix) ด้วยคำค้น
+    ถ้าคำค้นเป็นรหัสที่ตรงกับรายการใดทั้งหมด จะคืนเฉพาะรายการนั้น
+    """
+    query = normalize(query)
+    if not query:
+        return queryset
+    if is_id_query(query):
+        exact = queryset.filter(exact_id_filter(query, prefix))
+        if exact.exists():
+            return exact
+    return queryset.filter(search_filter(query, prefix))
+
+
+def typeahead(queryset, query, limit=10):
+    """
+    ผลลัพธ์สั้น ๆ สำหรับช่องค้นหาแบบ typeahead (dict ต่อผู้ใช้ ไม่สร้าง model instance)
+    """
+    if not normalize(query):
+        return []
+    rows = search_users(queryset, query).order_by('username').values(
+        'id', 'username', 'first_name', 'last_name', 'email', 'role',
+        'profile__student_id', 'profile__teacher_employee_id',
+    )[:limit]
+    return [
+        {
+            'id': row['id'],
+            'username': row['username'],
+            'full_name': f"{row['first_name']} {row['last_name']}".strip(),
+            'email': row['email'],
+            'role': row['role'],
+            'student_id': row['profile__student_id'],
+            'employee_id': row['profile__teacher_employee_id'],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,17 @@
+"""
+Signal handlers for accounts app
+- สร้าง UserProfile ตอนสร้างผู้ใช้ (การอ่าน profile จึงไม่ต้องเขียน ดู User.get_profile)
+  ผู้ใช้ที่สร้างด้วย bulk_create (provisioning.py) สร้าง profile เอง
+  ผู้ใช้เก่าที่ยังไม่มี profile: `python manage.py backfill_user_profiles`
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import User, UserProfile
+
+
+@receiver(post_save, sender=User)
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # ตั้ง cache ของ relation ด้วย - instance.profile ใช้ได้ทันทีโดยไม่ query
+        instance.profile = UserProfile.objects.create(user=instance)
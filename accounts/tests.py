@@ -1,4 +1,483 @@
-from django.test import TestCase
+"""
+- Startup-time budget: โหลด app และ URLconf ใน process ใหม่โดยไม่แตะฐานข้อมูล
+  และไม่ import dependency หนัก (ดู checkin_project/startup.py)
+- Profile accessors: อ่านอย่างเดียวและ query ครั้งเดียวต่อ instance (User.get_profile)
+- Bulk deletion/archival: จำนวน query คงที่ต่อ chunk ไม่ขึ้นกับจำนวนผู้ใช้ (purge.py)
+- Authorization: บทบาท/กลุ่มเรียนของผู้ใช้ cache บน request (authz.py)
+- Bulk provisioning: บัญชีใหม่ไม่มีรหัสผ่านที่ใช้ได้ ตั้งเองผ่านลิงก์ first-login ใช้ครั้งเดียว (provisioning.py)
+- User search: คำค้นแต่ละคำเป็น UNION ของ query ตารางเดียว (ใช้ trigram index ได้), รหัสตรงทั้งหมด และ typeahead (search.py)
+- Keyset pagination: ไม่ข้าม/ซ้ำแถวเมื่อคีย์เรียงซ้ำกัน และ cursor ที่ถูกแก้กลับไปหน้าแรก (checkin_project/pagination.py)
+"""
+import base64
+import csv
+import datetime
+import io
 
-# Create your tests here.
+from django.db import connection
+from unittest import skipUnless
 
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from checkin_project import pagination, startup
+from . import authz, purge, search
+from .models import User, UserProfile
+from . import provisioning
+from .provisioning import backfill_profiles
+
+
+class StartupTests(SimpleTestCase):
+
+    def test_startup_has_no_side_effects(self):
+        report = startup.measure(runs=1)
+        self.assertEqual(report.connections, [])
+        self.assertEqual(report.lazy_loaded, [])
+        self.assertIn('accounts', report.imports)
+
+    def test_baseline_regression(self):
+        report = startup.StartupReport(runs=1, cold_start=1.0, setup=0.5, urlconf=0.1, imports={'accounts': 30.0})
+        baseline = {'cold_start': 0.5, 'imports': {'accounts': 10.0}}
+        problems = startup.violations(report, baseline, tolerance=0.25)
+        self.assertTrue(any('cold start regressed' in problem for problem in problems))
+        self.assertTrue(any('import of accounts regressed' in problem for problem in problems))
+        self.assertEqual(startup.violations(report, {'cold_start': 1.0, 'imports': {'accounts': 28.0}}), [])
+
+
+class ProfileAccessTests(TestCase):
+    """User.get_profile/student_profile อ่านอย่างเดียว ใช้ cache ของ relation และ select_related('profile') ได้"""
+
+    def test_profile_created_with_user(self):
+        user = User.objects.create_user('s1', password='pw', role='student')
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(user.student_profile)
+        self.assertIsNone(user.teacher_profile)
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+
+    def test_read_only_and_memoized(self):
+        user = User.objects.bulk_create([User(username='s2', password='!', role='student')])[0]
+        user = User.objects.get(id=user.id)
+        with self.assertNumQueries(1):
+            self.assertIsNone(user.student_profile)
+            self.assertIsNone(user.get_profile())
+        self.assertFalse(UserProfile.objects.filter(user=user).exists())
+
+    def test_roster_select_related(self):
+        for i in range(5):
+            User.objects.create_user(f'r{i}', password='pw', role='student')
+        with self.assertNumQueries(1):
+            ids = [user.student_profile.pk for user in User.objects.select_related('profile')]
+        self.assertEqual(len(ids), 5)
+
+    def test_backfill(self):
+        User.objects.bulk_create([User(username=f'b{i}', password='!', role='student') for i in range(3)])
+        self.assertEqual(backfill_profiles(dry_run=True), 3)
+        self.assertEqual(backfill_profiles(batch_size=2), 3)
+        self.assertEqual(backfill_profiles(), 0)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.PBKDF2PasswordHasher'])
+class ProvisioningTests(TestCase):
+
+    def provision(self, n=3):
+        accounts = [provisioning.StudentAccount(username=f'p{i}', student_id=f'p{i}') for i in range(n)]
+        return provisioning.provision_students(accounts).users
+
+    def test_default_is_unusable_password(self):
+        self.provision()
+        hashes = [User.objects.get(username=f'p{i}').password for i in range(3)]
+        self.assertEqual(len(set(hashes)), 3)
+        self.assertFalse(any(User.objects.get(username=f'p{i}').has_usable_password() for i in range(3)))
+
+    def test_explicit_password(self):
+        provisioning.provision_students([provisioning.StudentAccount(username='p9', student_id='p9')], password='s3cret-pass')
+        self.assertTrue(self.client.login(username='p9', password='s3cret-pass'))
+
+    def test_first_login_link_sets_password_once(self):
+        user = self.provision()['p0']
+        url = provisioning.first_login_path(user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        response = self.client.post(url, {'new_password1': 'Xq7-first-login', 'new_password2': 'Xq7-first-login'})
+        self.assertRedirects(response, reverse('attendance:scan_page'), fetch_redirect_response=False)
+        self.assertEqual(int(self.client.session['_auth_user_id']), user.id)
+        self.assertTrue(User.objects.get(id=user.id).check_password('Xq7-first-login'))
+
+        # ใช้ลิงก์ซ้ำไม่ได้ (token ผูกกับ hash เดิม)
+        self.client.logout()
+        response = self.client.post(url, {'new_password1': 'other-pass-99', 'new_password2': 'other-pass-99'})
+        self.assertRedirects(response, reverse('accounts:login'), fetch_redirect_response=False)
+        self.assertTrue(User.objects.get(id=user.id).check_password('Xq7-first-login'))
+
+    def test_first_login_rejects_bad_links(self):
+        user = self.provision()['p0']
+        other = User.objects.create_user('p8', password='pw', role='student')
+        for url in (
+            reverse('accounts:first_login', args=['bad', 'bad-token']),
+            provisioning.first_login_path(user)[:-2] + 'xx/',
+            provisioning.first_login_path(other),   # มีรหัสผ่านแล้ว
+        ):
+            with self.subTest(url=url):
+                self.assertRedirects(self.client.get(url), reverse('accounts:login'), fetch_redirect_response=False)
+
+    def test_first_login_links_command(self):
+        users = self.provision()
+        User.objects.filter(id=users['p2'].id).update(password=provisioning.password_hash('set-already'))
+        out = io.StringIO()
+        call_command('first_login_links', '--base-url', 'https://checkin.test/', stdout=out)
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[0], ['username', 'student_id', 'name', 'url'])
+        self.assertEqual([row[0] for row in rows[1:]], ['p0', 'p1'])
+        self.assertEqual(rows[1][3], 'https://checkin.test' + provisioning.first_login_path(users['p0']))
+
+
+    def test_register_claims_placeholder_enrollments(self):
+        from academic import counters
+        from academic.models import AcademicYear, Course, Enrollment, Section, Semester
+
+        year = AcademicYear.objects.create(year='2568')
+        semester = Semester.objects.create(
+            academic_year=year, semester_number=1, start_date='2025-06-01', end_date='2025-09-30',
+        )
+        course = Course.objects.create(course_code='CS101', course_name='Course', credit=3)
+        sections = [Section.objects.create(course=course, semester=semester, section_number=str(i)) for i in (1, 2)]
+        placeholder = provisioning.provision_students([
+            provisioning.StudentAccount(username='student_6500001', student_id='6500001'),
+        ]).users['student_6500001']
+        for section in sections:
+            Enrollment.objects.create(student=placeholder, section=section, status='pending')
+
+        response = self.client.post(reverse('accounts:register'), {
+            'username': 'somchai', 'email': 'somchai@example.com', 'student_id': '6500001',
+            'password1': 'Xq7-register', 'password2': 'Xq7-register',
+        })
+        self.assertRedirects(response, reverse('accounts:login'), fetch_redirect_response=False)
+        self.assertTrue(self.client.login(username='somchai', password='Xq7-register'))
+        self.assertEqual(
+            set(Enrollment.objects.values_list('student__username', 'status')), {('somchai', 'enrolled')},
+        )
+        self.assertEqual(Enrollment.objects.count(), 2)
+        for section in Section.objects.all():
+            self.assertEqual((section.enrolled_count, section.pending_count), (1, 0))
+        self.assertEqual(counters.reconcile(dry_run=True), [])
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        def student(username, first_name, last_name, student_id):
+            user = User.objects.create_user(username, password='pw', role='student', first_name=first_name, last_name=last_name)
+            UserProfile.objects.filter(user=user).update(student_id=student_id)
+            return user
+
+        cls.somchai = student('somchai', 'สมชาย', 'ใจดี', '6512345')
+        cls.somsri = student('somsri', 'สมศรี', 'ใจงาม', '65123456')
+        cls.mana = student('mana', 'มานะ', 'chaiyo', '6600001')
+        cls.teacher = User.objects.create_user('kru', password='pw', role='teacher', first_name='สมชาย', email='kru@example.com')
+        UserProfile.objects.filter(user=cls.teacher).update(teacher_employee_id='T-001')
+        cls.admin = User.objects.create_user('admin', password='pw', role='admin')
+
+    def usernames(self, query, queryset=None):
+        return sorted(search.search_users(queryset or User.objects.all(), query).values_list('username', flat=True))
+
+    def test_terms_match_across_user_and_profile(self):
+        self.assertEqual(self.usernames('สมชาย'), ['kru', 'somchai'])
+        self.assertEqual(self.usernames('สมชาย 651'), ['somchai'])   # ชื่อใน User + รหัสใน UserProfile
+        self.assertEqual(self.usernames('  ใจ   '), ['somchai', 'somsri'])
+        self.assertEqual(self.usernames('T-00'), ['kru'])
+        self.assertEqual(self.usernames('EXAMPLE'), ['kru'])
+        self.assertEqual(self.usernames('nobody'), [])
+
+    def test_short_terms_match_anywhere(self):
+        # คำสั้นยังเป็น icontains (ไม่เปลี่ยนเป็นขึ้นต้นด้วย)
+        self.assertEqual(self.usernames('ai'), ['mana', 'somchai'])
+        self.assertEqual(self.usernames('ดี'), ['somchai'])
+
+    def test_exact_id(self):
+        self.assertEqual(self.usernames('6512345'), ['somchai'])
+        self.assertEqual(self.usernames('651234'), ['somchai', 'somsri'])
+        enrollments = search.search_users(
+            UserProfile.objects.all(), '65123456', prefix='user__',
+        ).values_list('user__username', flat=True)
+        self.assertEqual(list(enrollments), ['somsri'])
+
+    def test_single_table_subqueries(self):
+        sql = str(User.objects.filter(search.search_filter('สมชาย 651')).query).upper()
+        self.assertNotIn(' JOIN ', sql)
+        self.assertEqual(sql.count(' UNION '), 2)
+
+    @skipUnless(connection.vendor == 'postgresql', 'pg_trgm indexes exist on PostgreSQL only')
+    def test_search_uses_trigram_indexes(self):
+        from attendance.tests import explain, sequential_scans
+        for query in ('สมชาย', 'สมชาย 651', '6512345'):
+            with self.subTest(query=query), CaptureQueriesContext(connection) as ctx:
+                list(search.search_users(User.objects.all(), query))
+            for captured in ctx.captured_queries:
+                plan = explain(captured['sql'])
+                self.assertFalse(sequential_scans(plan), plan)
+
+    def test_typeahead_endpoint(self):
+        url = reverse('accounts:user_search')
+        self.client.force_login(self.admin)
+        results = self.client.get(url, {'q': 'สมชาย'}).json()['results']
+        self.assertEqual([row['username'] for row in results], ['kru', 'somchai'])
+        self.assertEqual(results[1]['student_id'], '6512345')
+        self.assertEqual(results[1]['full_name'], 'สมชาย ใจดี')
+        self.assertEqual(len(self.client.get(url, {'q': 'ใจ', 'limit': 1}).json()['results']), 1)
+        self.assertEqual(self.client.get(url, {'q': ''}).json()['results'], [])
+
+        # อาจารย์ค้นหาได้เฉพาะนักศึกษา
+        self.client.force_login(self.teacher)
+        results = self.client.get(url, {'q': 'สมชาย', 'role': 'teacher'}).json()['results']
+        self.assertEqual([row['username'] for row in results], ['somchai'])
+        self.client.force_login(self.somchai)
+        self.assertEqual(self.client.get(url, {'q': 'สมชาย'}).status_code, 302)
+
+
+class PaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        joined = datetime.datetime(2024, 6, 1, 8, 0, 0, 123456, tzinfo=datetime.timezone.utc)
+        cls.users = User.objects.bulk_create([
+            User(username=f'u{i:02d}', password='!', role='student', last_name='Same', date_joined=joined)
+            for i in range(7)
+        ])
+
+    def walk(self, ordering, per_page=3):
+        ids, cursor = [], None
+        while True:
+            page = pagination.paginate(User.objects.all(), ordering, cursor, per_page)
+            ids += [user.id for user in page]
+            if not page.has_next:
+                return ids
+            cursor = page.next_cursor
+
+    def test_cursor_round_trip(self):
+        values = ['x', 3, datetime.datetime(2024, 1, 1, 0, 0, 0, 5, tzinfo=datetime.timezone.utc).isoformat()]
+        self.assertEqual(pagination.decode_cursor(pagination.encode_cursor(values, 20), 3), (values, 20))
+
+    def test_ties_on_sort_key(self):
+        expected = sorted(user.id for user in self.users)
+        self.assertEqual(self.walk(['last_name']), expected)
+        self.assertEqual(self.walk(['-date_joined']), expected[::-1])
+
+    def test_invalid_cursor(self):
+        def raw(payload):
+            return base64.urlsafe_b64encode(payload.encode()).decode()
+
+        cursors = [
+            'garbage!', '====', raw('not json'), raw('[1, 2]'), raw('{"k": ["a"]}'),
+            raw('{"k": ["a", 1], "o": -1}'), raw('{"k": ["a", "x"]}'), raw('{"k": ["a", 1e400]}'),
+            raw('{"k": ["a", 99999999999999999999999]}'), raw('{"k": ["a\\u0000", 1]}'),
+            raw('{"k": [null, 1]}'), raw('{"k": [{"a": 1}, 1]}'), raw('{"k": ' + '[' * 5000 + ']' * 5000 + '}'),
+            pagination.encode_cursor(['x', 1], 0).upper(),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor[:40]):
+                with self.assertRaises(pagination.InvalidCursor):
+                    pagination.paginate(User.objects.all(), ['username'], cursor)
+
+        admin = User.objects.create_user('admin', password='pw', role='admin')
+        self.client.force_login(admin)
+        for cursor in cursors:
+            with self.subTest(cursor=cursor[:40]):
+                response = self.client.get(reverse('accounts:user_list'), {'cursor': cursor, 'format': 'json'})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['results'][0]['username'], 'admin')
+
+
+class PurgeTests(TestCase):
+    """purge.delete_users/archive_users: cascade แบบ set-based พร้อม dry run และตัวนับที่ถูกต้อง"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from academic.models import AcademicYear, Course, Enrollment, Section, Semester
+        from attendance.models import AttendanceRecord, AttendanceSession, LeaveRequest
+
+        year = AcademicYear.objects.create(year='2564')
+        semester = Semester.objects.create(
+            academic_year=year, semester_number=1, start_date='2021-06-01', end_date='2021-09-30',
+        )
+        cls.teacher = User.objects.create_user('teacher', password='pw', role='teacher')
+        course = Course.objects.create(course_code='CS100', course_name='Course', credit=3)
+        cls.section = Section.objects.create(course=course, semester=semester, section_number='1', teacher=cls.teacher)
+        cls.students = [User.objects.create_user(f'64{i:03d}', password='pw', role='student') for i in range(6)]
+        Enrollment.objects.bulk_create([
+            Enrollment(student=student, section=cls.section, status='enrolled') for student in cls.students
+        ])
+        session = AttendanceSession.objects.create(
+            section=cls.section, teacher=cls.teacher,
+            session_date=datetime.date(2021, 6, 7), session_time=datetime.time(9, 0),
+        )
+        AttendanceRecord.objects.bulk_create([
+            AttendanceRecord(session=session, student=student, status='present') for student in cls.students
+        ])
+        LeaveRequest.objects.create(
+            student=cls.students[0], section=cls.section, leave_date='2021-06-14', reason='-',
+            status='approved', teacher=cls.teacher,
+        )
+        from academic import counters
+        counters.reconcile()
+
+    def test_dry_run_preview(self):
+        ids = [student.id for student in self.students[:4]]
+        # หนึ่ง query หา id + หนึ่ง COUNT ต่อขั้นของ cascade
+        with self.assertNumQueries(1 + len(purge.plan(User.objects.none()))):
+            result = purge.delete_users(ids + [999999], dry_run=True)
+        self.assertEqual(result.users, 4)
+        self.assertEqual(result.skipped, [999999])
+        self.assertEqual(result.deleted['academic.Enrollment'], 4)
+        self.assertEqual(result.deleted['attendance.AttendanceRecord'], 4)
+        self.assertEqual(result.deleted['attendance.LeaveRequest'], 1)
+        self.assertEqual(result.deleted['accounts.UserProfile'], 4)
+        self.assertEqual(User.objects.filter(id__in=ids).count(), 4)
+
+    def test_delete_students(self):
+        from academic import counters
+        from academic.models import Enrollment
+        from attendance.models import AttendanceRecord
+
+        ids = [student.id for student in self.students[:4]]
+        with self.captureOnCommitCallbacks(execute=True):
+            result = purge.delete_users(ids, chunk_size=3)
+        self.assertEqual(result.users, 4)
+        self.assertFalse(User.objects.filter(id__in=ids).exists())
+        self.assertEqual(Enrollment.objects.filter(section=self.section).count(), 2)
+        self.assertEqual(AttendanceRecord.objects.count(), 2)
+        self.assertEqual(counters.reconcile(dry_run=True), [])
+
+    def test_delete_teacher_sets_null_and_cascades_sessions(self):
+        from attendance.models import AttendanceRecord, AttendanceSummary, LeaveRequest
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = purge.delete_users([self.teacher.id])
+        self.section.refresh_from_db()
+        self.assertIsNone(self.section.teacher_id)
+        self.assertIsNone(LeaveRequest.objects.get().teacher_id)
+        self.assertEqual(result.updated['academic.Section.teacher'], 1)
+        self.assertEqual(AttendanceRecord.objects.count(), 0)
+        self.assertFalse(AttendanceSummary.objects.filter(present_count__gt=0).exists())
+
+    def test_query_count_independent_of_users(self):
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as few:
+            purge.delete_users([self.students[0].id])
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as many:
+            purge.delete_users([student.id for student in self.students[1:]])
+        self.assertEqual(len(few), len(many))
+
+    def test_archive_keeps_history(self):
+        from attendance.models import AttendanceRecord
+
+        result = purge.archive_users([student.id for student in self.students])
+        self.assertEqual(result.users, 6)
+        self.assertEqual(AttendanceRecord.objects.count(), 6)
+        self.assertFalse(User.objects.filter(role='student', is_active=True).exists())
+        self.assertFalse(self.client.login(username=self.students[0].username, password='pw'))
+
+    def test_batch_delete_view_previews_then_deletes(self):
+        from django.urls import reverse
+
+        admin = User.objects.create_user('admin', password='pw', role='admin')
+        self.client.force_login(admin)
+        ids = [str(student.id) for student in self.students[:2]] + [str(admin.id)]
+        url = reverse('accounts:batch_delete_users')
+
+        response = self.client.post(url, {'user_ids': ids})
+        self.assertTemplateUsed(response, 'accounts/user_batch_delete.html')
+        self.assertEqual(response.context['preview'].users, 2)
+        self.assertEqual(User.objects.filter(role='student').count(), 6)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'user_ids': ids, 'action': 'delete'})
+        self.assertRedirects(response, reverse('accounts:user_list'), fetch_redirect_response=False)
+        self.assertEqual(User.objects.filter(role='student').count(), 4)
+        self.assertTrue(User.objects.filter(id=admin.id).exists())
+
+
+class AuthzTests(TestCase):
+    """authz.access(request): บทบาทและกลุ่มเรียนของผู้ใช้ query ครั้งเดียวต่อ request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from academic.models import AcademicYear, Course, Enrollment, Section, Semester
+
+        year = AcademicYear.objects.create(year='2565')
+        semester = Semester.objects.create(
+            academic_year=year, semester_number=1,
+            start_date=datetime.date(2022, 6, 1), end_date=datetime.date(2022, 9, 30),
+        )
+        course = Course.objects.create(course_code='CS200', course_name='Course', credit=3)
+        cls.teacher = User.objects.create_user('teacher', password='pw', role='teacher')
+        cls.other_teacher = User.objects.create_user('teacher2', password='pw', role='teacher')
+        cls.student = User.objects.create_user('65001', password='pw', role='student')
+        cls.section = Section.objects.create(course=course, semester=semester, section_number='1', teacher=cls.teacher)
+        cls.other_section = Section.objects.create(
+            course=course, semester=semester, section_number='2', teacher=cls.other_teacher,
+        )
+        cls.enrollment = Enrollment.objects.create(student=cls.student, section=cls.section, status='enrolled')
+
+    def request_for(self, user):
+        from django.test import RequestFactory
+
+        request = RequestFactory().get('/')
+        request.user = user
+        return request
+
+    def test_predicates(self):
+        from django.contrib.auth.models import AnonymousUser
+
+        self.assertFalse(authz.is_teacher_or_admin(AnonymousUser()))
+        self.assertTrue(authz.is_teacher_or_admin(self.teacher))
+        self.assertFalse(authz.is_admin(self.teacher))
+        self.assertTrue(authz.is_student(self.student))
+        self.assertIsNone(authz.access(self.request_for(AnonymousUser())).role)
+
+    def test_access_is_memoized_per_request(self):
+        request = self.request_for(self.teacher)
+        with self.assertNumQueries(1):
+            self.assertIs(authz.access(request), authz.access(request))
+            self.assertTrue(authz.access(request).teaches(self.section.id))
+            self.assertFalse(authz.access(request).teaches(self.other_section.id))
+            self.assertEqual(authz.access(request).taught_section_ids, {self.section.id})
+
+    def test_section_instance_checks_do_not_query(self):
+        access = authz.access(self.request_for(self.teacher))
+        with self.assertNumQueries(0):
+            self.assertTrue(access.can_manage(self.section))
+            self.assertFalse(access.can_manage(self.other_section))
+            self.assertFalse(access.attends(self.section))
+
+    def test_scope(self):
+        from attendance.models import LeaveRequest
+
+        for section in (self.section, self.other_section):
+            LeaveRequest.objects.create(
+                student=self.student, section=section, leave_date=datetime.date(2022, 6, 8), reason='-',
+            )
+        student_access = authz.access(self.request_for(self.student))
+        self.assertEqual(list(student_access.sections()), [self.section])
+        self.assertTrue(student_access.can_view(self.section))
+        self.assertFalse(student_access.can_view(self.other_section))
+        teacher_access = authz.access(self.request_for(self.other_teacher))
+        self.assertEqual(
+            list(teacher_access.scope(LeaveRequest.objects.all()).values_list('section_id', flat=True)),
+            [self.other_section.id],
+        )
+
+    def test_views_reject_other_sections(self):
+        from django.urls import reverse
+
+        from academic.models import Enrollment
+
+        self.client.force_login(self.other_teacher)
+        response = self.client.post(reverse('academic:delete_enrollment', args=[self.section.id, self.enrollment.id]))
+        self.assertRedirects(
+            response, reverse('academic:section_detail', args=[self.section.id]), fetch_redirect_response=False,
+        )
+        self.assertTrue(Enrollment.objects.filter(id=self.enrollment.id).exists())
+
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('attendance:report'), {'section_id': self.other_section.id})
+        self.assertEqual(response.status_code, 404)
@@ -10,11 +10,13 @@ urlpatterns = [
     path('', views.home_view, name='home'),
     path('login/', views.login_view, name='login'),
     path('register/', views.register_view, name='register'),
+    path('first-login/<str:uidb64>/<str:token>/', views.first_login_view, name='first_login'),
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.profile_view, name='profile'),
     path('profile/edit/', views.edit_profile_view, name='edit_profile'),
     # Admin user management
     path('users/', views.user_list, name='user_list'),
+    path('users/search/', views.user_search, name='user_search'),
     path('users/add/', views.user_add, name='user_add'),
     path('users/<int:user_id>/edit/', views.user_edit, name='user_edit'),
     path('users/<int:user_id>/delete/', views.user_delete, name='user_delete'),
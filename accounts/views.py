@@ -6,9 +6,11 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
-from django.db.models import Q
+from django.http import JsonResponse
 from .models import User, UserProfile
-from django.db import connection
+from checkin_project.pagination import json_page, paginate_request, wants_json
+from . import provisioning, purge, search
+from .authz import is_admin, is_teacher_or_admin
 
 
 def home_view(request):
@@ -44,14 +46,7 @@ def login_view(request):
             if user is not None:
                 login(request, user)
                 messages.success(request, f'ยินดีต้อนรับ {user.get_full_name() or user.username}')
-                
-                # Redirect based on role
-                if user.is_admin():
-                    return redirect('academic:course_list')
-                elif user.is_teacher():
-                    return redirect('teacher:dashboard')
-                else:
-                    return redirect('attendance:scan_page')
+                return _redirect_home(user)
             else:
                 messages.error(request, 'ชื่อผู้ใช้หรือรหัสผ่านไม่ถูกต้อง')
         else:
@@ -60,6 +55,40 @@ def login_view(request):
     return render(request, 'accounts/login.html')
 
 
+def _redirect_home(user):
+    """Redirect based on role"""
+    if user.is_admin():
+        return redirect('academic:course_list')
+    elif user.is_teacher():
+        return redirect('teacher:dashboard')
+    return redirect('attendance:scan_page')
+
+
+@require_http_methods(["GET", "POST"])
+def first_login_view(request, uidb64, token):
+    """
+    ตั้งรหัสผ่านครั้งแรกของบัญชีที่สร้างเป็นชุด (ลิงก์จาก manage.py first_login_links, ใช้ได้ครั้งเดียว)
+    """
+    from django.contrib.auth.forms import SetPasswordForm
+    from django.utils.http import urlsafe_base64_decode
+
+    try:
+        user = User.objects.get(pk=urlsafe_base64_decode(uidb64).decode())
+    except (TypeError, ValueError, OverflowError, User.DoesNotExist):
+        user = None
+    if user is None or user.has_usable_password() or not provisioning.first_login_token.check_token(user, token):
+        messages.error(request, 'ลิงก์ไม่ถูกต้อง หมดอายุ หรือถูกใช้ไปแล้ว กรุณาติดต่อผู้ดูแลระบบ')
+        return redirect('accounts:login')
+
+    form = SetPasswordForm(user, request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        form.save()
+        login(request, user)
+        messages.success(request, f'ตั้งรหัสผ่านสำเร็จ ยินดีต้อนรับ {user.get_full_name() or user.username}')
+        return _redirect_home(user)
+    return render(request, 'accounts/first_login.html', {'form': form, 'account': user})
+
+
 @login_required
 def logout_view(request):
     """
@@ -70,6 +99,31 @@ def logout_view(request):
     return redirect('accounts:login')
 
 
+def _enroll_pending(pending_enrollments, student=None):
+    """
+    เปลี่ยนการลงทะเบียนที่รออยู่เป็น enrolled (และย้ายไปที่ student ถ้าระบุ) ด้วย UPDATE เดียว
+    queryset.update() ไม่ส่ง signal - ปรับตัวนับ (counters) ล้าง roster cache และ catalog เอง
+    """
+    from django.db import transaction
+    from attendance import roster_cache
+    from academic import catalog, counters
+
+    changes = {'status': 'enrolled'}
+    if student is not None:
+        changes['student'] = student
+    with transaction.atomic():
+        pending = counters.grouped(pending_enrollments)
+        updated_count = pending_enrollments.update(**changes)
+        deltas = counters.delta()
+        for (section_id, status), n in pending.items():
+            counters.move(deltas, (section_id, status), (section_id, 'enrolled'), n)
+        counters.apply(deltas)
+    for section_id, _ in pending:
+        roster_cache.invalidate_section(section_id)
+    catalog.invalidate_on_commit()
+    return updated_count
+
+
 @require_http_methods(["GET", "POST"])
 def register_view(request):
     """
@@ -143,7 +197,7 @@ def register_view(request):
                         )
                         
                         if pending_enrollments.exists():
-                            updated_count = pending_enrollments.update(status='enrolled')
+                            updated_count = _enroll_pending(pending_enrollments)
                             messages.success(request, f'สมัครสมาชิกสำเร็จ! ระบบได้อัปเดตการลงทะเบียน {updated_count} รายการแล้ว กรุณาเข้าสู่ระบบ')
                         else:
                             messages.success(request, 'สมัครสมาชิกสำเร็จ! กรุณาเข้าสู่ระบบ')
@@ -187,12 +241,11 @@ def register_view(request):
                     role=role
                 )
                 
-                # Create student profile
+                # Student profile (สร้างโดย post_save ดู signals.py)
                 from .models import Faculty, Major
-                profile = UserProfile.objects.create(
-                    user=user,
-                    student_id=student_id,
-                )
+                profile = user.profile
+                profile.student_id = student_id
+                profile.save(update_fields=['student_id', 'updated_at'])
                 
                 # Set major if provided
                 major_id = request.POST.get('major_id')
@@ -214,13 +267,7 @@ def register_view(request):
                 
                 if pending_enrollments.exists():
                     # Update enrollments: change student to new user and status to enrolled
-                    updated_count = 0
-                    for enrollment in pending_enrollments:
-                        enrollment.student = user
-                        enrollment.status = 'enrolled'
-                        enrollment.save()
-                        updated_count += 1
-                    
+                    updated_count = _enroll_pending(pending_enrollments, student=user)
                     messages.success(request, f'สมัครสมาชิกสำเร็จ! ระบบได้อัปเดตการลงทะเบียน {updated_count} รายการแล้ว กรุณาเข้าสู่ระบบ')
                 else:
                     messages.success(request, 'สมัครสมาชิกสำเร็จ! กรุณาเข้าสู่ระบบ')
@@ -275,9 +322,8 @@ def profile_view(request):
         'user': user,
     }
     
-    # Get user profile (unified)
-    profile, _ = UserProfile.objects.get_or_create(user=user)
-    context['profile'] = profile
+    # Get user profile (unified) - อ่านอย่างเดียว ผู้ใช้ที่ยังไม่มี profile แสดงค่าว่าง
+    context['profile'] = user.get_profile() or UserProfile(user=user)
     
     return render(request, 'accounts/profile.html', context)
 
@@ -351,8 +397,8 @@ def edit_profile_view(request):
         messages.success(request, 'แก้ไขโปรไฟล์สำเร็จ')
         return redirect('accounts:profile')
     
-    # Get profile data
-    profile, _ = UserProfile.objects.get_or_create(user=user)
+    # Get profile data (อ่านอย่างเดียว - สร้างเมื่อบันทึก)
+    profile = user.get_profile() or UserProfile(user=user)
     
     # Get faculties and majors for dropdown
     faculties = []
@@ -384,11 +430,6 @@ def edit_profile_view(request):
     return render(request, 'accounts/edit_profile.html', context)
 
 
-def is_admin(user):
-    """Check if user is admin"""
-    return user.is_authenticated and user.is_admin()
-
-
 @login_required
 @user_passes_test(is_admin)
 def user_list(request):
@@ -406,17 +447,20 @@ def user_list(request):
     if role_filter:
         users = users.filter(role=role_filter)
     
-    # Search by username, email, first_name, last_name
-    if search_query:
-        users = users.filter(
-            Q(username__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query)
-        )
+    # Search by username, email, ชื่อ-นามสกุล, รหัสนักศึกษา/อาจารย์ (ดู accounts/search.py)
+    users = search.search_users(users, search_query)
     
-    # Order by username
-    users = users.order_by('username')
+    # Keyset pagination เรียงตาม username (ไม่โหลดผู้ใช้ทั้งตาราง)
+    users = paginate_request(request, users.select_related('profile'), ['username', 'id'])
+    if wants_json(request):
+        return json_page(users, lambda u: {
+            'id': u.id,
+            'username': u.username,
+            'full_name': u.get_full_name(),
+            'email': u.email,
+            'role': u.role,
+            'role_display': u.get_role_display(),
+        })
     
     context = {
         'users': users,
@@ -426,6 +470,26 @@ def user_list(request):
     return render(request, 'accounts/user_list.html', context)
 
 
+@login_required
+@user_passes_test(is_teacher_or_admin)
+def user_search(request):
+    """
+    Typeahead ค้นหาผู้ใช้ (JSON) - ?q=<คำค้น>&role=<role>&limit=<n>
+    อาจารย์ค้นหาได้เฉพาะนักศึกษา
+    """
+    users = User.objects.all()
+    role = request.GET.get('role', '')
+    if not request.user.is_admin():
+        role = 'student'
+    if role:
+        users = users.filter(role=role)
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 20)
+    except ValueError:
+        limit = 10
+    return JsonResponse({'results': search.typeahead(users, request.GET.get('q', ''), limit)})
+
+
 @login_required
 @user_passes_test(is_admin)
 def user_add(request):
@@ -478,8 +542,8 @@ def user_add(request):
                     phone=phone if phone else None
                 )
                 
-                # Create profile (unified)
-                profile = UserProfile.objects.create(user=user)
+                # Profile (unified) สร้างโดย post_save (signals.py)
+                profile = user.profile
                 if role == 'student':
                     profile.student_id = student_id
                     profile.student_major = major
@@ -488,14 +552,11 @@ def user_add(request):
                     
                     # Create enrollment if section is provided
                     if section_id:
-                        from academic.models import Section, Enrollment
+                        from academic.models import Section
+                        from academic.enrollment_service import enroll_many
                         try:
                             section = Section.objects.get(id=section_id)
-                            Enrollment.objects.create(
-                                student=user,
-                                section=section,
-                                status='enrolled'
-                            )
+                            enroll_many(section, [user.id])
                         except Section.DoesNotExist:
                             pass
                 elif role == 'teacher':
@@ -577,7 +638,7 @@ def user_edit(request, user_id):
     """
     แก้ไขผู้ใช้ (Admin only)
     """
-    user = get_object_or_404(User, id=user_id)
+    user = get_object_or_404(User.objects.select_related('profile'), id=user_id)
     
     # Prevent admin from editing themselves (optional safety check)
     # if user == request.user:
@@ -614,17 +675,11 @@ def user_edit(request, user_id):
             # Update enrollment if section is provided
             section_id = request.POST.get('section_id', '')
             if section_id:
-                from academic.models import Section, Enrollment
+                from academic.models import Section
+                from academic.enrollment_service import enroll_many
                 try:
                     section = Section.objects.get(id=section_id)
-                    enrollment, created = Enrollment.objects.get_or_create(
-                        student=user,
-                        section=section,
-                        defaults={'status': 'enrolled'}
-                    )
-                    if not created:
-                        enrollment.status = 'enrolled'
-                        enrollment.save()
+                    enroll_many(section, [user.id])
                 except Section.DoesNotExist:
                     pass
         elif user.role == 'teacher':
@@ -698,8 +753,7 @@ def user_edit(request, user_id):
         'courses': courses,
     }
     
-    profile, _ = UserProfile.objects.get_or_create(user=user)
-    context['profile'] = profile
+    context['profile'] = user.get_profile() or UserProfile(user=user)
     
     return render(request, 'accounts/user_form.html', context)
 
@@ -719,12 +773,14 @@ def user_delete(request, user_id):
     
     if request.method == 'POST':
         username = user.username
-        user.delete()
+        purge.delete_users([user.id])
         messages.success(request, f'ลบผู้ใช้ {username} สำเร็จ')
         return redirect('accounts:user_list')
     
     context = {
         'user': user,
+        # จำนวนข้อมูลที่จะถูกลบไปด้วย (dry run)
+        'preview': purge.delete_users([user.id], dry_run=True),
     }
     return render(request, 'accounts/user_delete.html', context)
 
@@ -742,53 +798,29 @@ def batch_delete_users(request):
             messages.error(request, 'กรุณาเลือกผู้ใช้ที่ต้องการลบ')
             return redirect('accounts:user_list')
         
-        deleted_count = 0
-        failed_count = 0
-        
-        for user_id in user_ids:
-            try:
-                user = User.objects.get(id=user_id)
-                
-                # Prevent admin from deleting themselves
-                if user == request.user:
-                    failed_count += 1
-                    continue
-                
-                username = user.username
-                user.delete()
-                deleted_count += 1
-            except User.DoesNotExist:
-                failed_count += 1
-            except Exception as e:
-                failed_count += 1
+        # ไม่ลบ/ปิดบัญชีของตัวเอง (see purge.py - ลบเป็นชุดแบบ set-based)
+        action = request.POST.get('action')
+        if action == 'delete':
+            result = purge.delete_users(user_ids, exclude_ids=[request.user.id])
+            if result.users:
+                messages.success(request, f'ลบผู้ใช้ {result.users} รายการสำเร็จ')
+        elif action == 'archive':
+            result = purge.archive_users(user_ids, exclude_ids=[request.user.id])
+            if result.users:
+                messages.success(request, f'ปิดบัญชีผู้ใช้ {result.users} รายการสำเร็จ (เก็บประวัติการเข้าเรียนไว้)')
+        else:
+            # หน้ายืนยัน: จำนวนข้อมูลที่จะถูกลบ (dry run)
+            user_ids = [user_id for user_id in user_ids if user_id.isdigit()]
+            context = {
+                'preview': purge.delete_users(user_ids, exclude_ids=[request.user.id], dry_run=True),
+                'user_ids': user_ids,
+                'users': User.objects.filter(id__in=user_ids).exclude(id=request.user.id).order_by('username')[:50],
+            }
+            return render(request, 'accounts/user_batch_delete.html', context)
         
-        if deleted_count > 0:
-            messages.success(request, f'ลบผู้ใช้ {deleted_count} รายการสำเร็จ')
-        if failed_count > 0:
-            messages.warning(request, f'ไม่สามารถลบผู้ใช้ {failed_count} รายการ')
+        if result.skipped:
+            messages.warning(request, f'ไม่สามารถดำเนินการกับผู้ใช้ {len(result.skipped)} รายการ')
         
         return redirect('accounts:user_list')
     
     return redirect('accounts:user_list')
-
-# ใน Python shell นี้ รันสั่งนี้:
-tables = connection.introspection.table_names()
-for table in tables:
-    print(table)
-
-# ดู Users
-from accounts.models import User
-User.objects.all().values('username', 'role', 'email')
-
-# ดู Courses
-from academic.models import Course
-Course.objects.all().values('course_code', 'course_name')
-
-# ดู Sections
-from academic.models import Section
-Section.objects.all().values('section_number', 'course_id', 'teacher_id')
-
-# ดู Enrollments
-from academic.models import Enrollment
-Enrollment.objects.all().values('student_id', 'section_id', 'status')
-
@@ -9,6 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'checkin_project.settings')
 django.setup()
 
 from accounts.models import User, UserProfile
+from accounts.provisioning import password_hash
 
 def parse_thai_name(fullname):
     """Parse Thai name to extract first name and last name"""
@@ -87,7 +88,7 @@ def add_remaining_students():
             )
             
             if created:
-                user.set_password('changeme123')
+                user.password = password_hash()  # ยังไม่มีรหัสผ่าน ตั้งเองผ่านลิงก์ first_login_links
                 user.save()
                 created_count += 1
                 print(f"  [{idx:2d}] ✓ สร้าง: {username} - {first_name} {last_name} ({student_id})")
@@ -124,7 +125,7 @@ def add_remaining_students():
     print(f"  - อัปเดต: {updated_count} คน")
     print(f"  - ข้อผิดพลาด: {error_count} คน")
     print(f"  - รวม: {created_count + updated_count} คน")
-    print(f"\nรหัสผ่านเริ่มต้นสำหรับนักเรียนทั้งหมด: changeme123")
+    print("\nนักเรียนใหม่ยังไม่มีรหัสผ่าน ส่งลิงก์ตั้งรหัสผ่านจาก: python manage.py first_login_links")
     print(f"\nตอนนี้มีนักเรียนทั้งหมด {User.objects.filter(role='student').count()} คนในระบบ!")
 
 if __name__ == '__main__':
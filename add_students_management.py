@@ -5,6 +5,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'checkin_project.settings')
 django.setup()
 
 from accounts.models import User, UserProfile
+from accounts.provisioning import password_hash
 
 def parse_thai_name(fullname):
     if fullname.startswith('นางสาว'):
@@ -65,7 +66,7 @@ for student_data in students_data:
     )
     
     if created:
-        user.set_password('changeme123')
+        user.password = password_hash()  # ยังไม่มีรหัสผ่าน ตั้งเองผ่านลิงก์ first_login_links
         user.save()
         created_count += 1
         print(f"✓ สร้าง: {username} - {first_name} {last_name}")
@@ -9,6 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'checkin_project.settings')
 django.setup()
 
 from accounts.models import User, UserProfile
+from accounts.provisioning import password_hash
 from academic.models import Section, Enrollment, Course
 
 def parse_thai_name(fullname):
@@ -121,7 +122,7 @@ def add_students_to_bis3r1():
             )
             
             if user_created:
-                user.set_password('changeme123')
+                user.password = password_hash()  # ยังไม่มีรหัสผ่าน ตั้งเองผ่านลิงก์ first_login_links
                 user.save()
                 created_users += 1
                 print(f"  [{idx:2d}] ✓ สร้างผู้ใช้: {username} - {first_name} {last_name}")
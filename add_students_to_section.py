@@ -9,6 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'checkin_project.settings')
 django.setup()
 
 from accounts.models import User, UserProfile
+from accounts.provisioning import password_hash
 from academic.models import Section, Enrollment, Course, Semester, AcademicYear
 
 def add_students_to_bis3r1():
@@ -70,11 +71,11 @@ def add_students_to_bis3r1():
                 }
             )
             if created:
-                student.set_password('changeme123')
+                student.password = password_hash()  # ยังไม่มีรหัสผ่าน ตั้งเองผ่านลิงก์ first_login_links
                 student.save()
                 
-                # Create profile
-                profile, _ = UserProfile.objects.get_or_create(
+                # Profile ถูกสร้างตอน save (accounts/signals.py) - ตั้งรหัสนักศึกษา
+                profile, _ = UserProfile.objects.update_or_create(
                     user=student,
                     defaults={
                         'student_id': student_data['student_id']
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import AttendanceSession, AttendanceRecord, LeaveRequest
+from .models import AttendanceSession, AttendanceRecord, AttendanceSummary, LeaveRequest
 
 
 @admin.register(AttendanceSession)
@@ -20,6 +20,15 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
     readonly_fields = ['checked_in_at']
 
 
+@admin.register(AttendanceSummary)
+class AttendanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ['student', 'section', 'present_count', 'late_count', 'absent_count', 'excused_count', 'approved_leave_count', 'last_checked_in_at']
+    list_filter = ['section__semester']
+    search_fields = ['student__username', 'student__first_name', 'student__last_name', 'section__course__course_code']
+    raw_id_fields = ['section', 'student']
+    readonly_fields = ['updated_at']
+
+
 @admin.register(LeaveRequest)
 class LeaveRequestAdmin(admin.ModelAdmin):
     list_display = ['student', 'section', 'leave_type', 'leave_date', 'status', 'teacher', 'created_at']
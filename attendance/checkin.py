@@ -0,0 +1,204 @@
+"""
+Check-in engine for scan_qr (Process 6: บันทึกการเข้าเรียน)
+
+ตรวจสอบ QR token (qr_tokens, ไม่ใช้ DB) แล้วตรวจเซสชันและการลงทะเบียนจาก roster_cache
+แล้วบันทึกด้วย INSERT ... SELECT ... WHERE ... ON CONFLICT DO NOTHING RETURNING
+เพื่อให้การสแกนพร้อมกันหลายร้อยคนไม่ชนกันที่ unique_together(session, student)
+
+roster_cache เป็นเพียงตัวกรองชั้นแรก (อาจยังไม่รู้ว่าเซสชันถูกปิดหรือนักศึกษาถอนใน worker อื่น)
+เงื่อนไข "เซสชันยังเปิด" และ "ยังลงทะเบียนอยู่" ถูกตรวจซ้ำกับฐานข้อมูลใน INSERT เดียวกัน
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from academic.models import Enrollment
+
+from . import ingest, qr_tokens, roster_cache, summary
+from .models import AttendanceRecord, AttendanceSession
+
+
+STATUS_DISPLAY = dict(AttendanceRecord.STATUS_CHOICES)
+
+# Outcomes
+CREATED = 'created'
+DUPLICATE = 'duplicate'
+NOT_FOUND = 'not_found'
+INVALID_QR = 'invalid_qr'
+NOT_ENROLLED = 'not_enrolled'
+
+
+@dataclass
+class CheckInResult:
+    """ผลลัพธ์ของการเช็คชื่อหนึ่งครั้ง"""
+    outcome: str
+    status: str = None
+    record_id: int = None
+    expired: bool = False
+
+    @property
+    def status_display(self):
+        return STATUS_DISPLAY.get(self.status, self.status)
+
+
+def determine_status(session_datetime, now):
+    """
+    กำหนดสถานะตามเวลาที่สแกน
+    - ภายใน 15 นาที = present
+    - หลัง 15 นาทีแต่ไม่เกิน 1 ชั่วโมง = late
+    - หลัง 1 ชั่วโมง = absent
+    """
+    late_threshold = session_datetime + timedelta(minutes=15)
+    absent_threshold = session_datetime + timedelta(hours=1)
+
+    if now > absent_threshold:
+        return 'absent'
+    if now > late_threshold:
+        return 'late'
+    return 'present'
+
+
+def is_qr_expired(qr_expires_at, now):
+    """QR Code หมดอายุ 1 ชั่วโมงหลังสร้าง (เหมือน AttendanceSession.is_expired)"""
+    return not qr_expires_at or now > qr_expires_at
+
+
+def insert_record(session_id, section_id, student_id, status, checked_in_at):
+    """
+    INSERT ... SELECT ... WHERE <เซสชันยังเปิด> AND <ยังลงทะเบียนอยู่> ON CONFLICT DO NOTHING RETURNING id
+    คืนค่า id ของ record ใหม่ หรือ None ถ้ามี record อยู่แล้วหรือไม่ผ่านเงื่อนไข (ดู current_state)
+    (รองรับทั้ง PostgreSQL และ SQLite >= 3.35)
+    """
+    qn = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {qn(AttendanceRecord._meta.db_table)} "
+        f"({qn('session_id')}, {qn('student_id')}, {qn('status')}, {qn('checked_in_at')}) "
+        f"SELECT %s, %s, %s, %s "
+        f"WHERE EXISTS (SELECT 1 FROM {qn(AttendanceSession._meta.db_table)} "
+        f"WHERE {qn('id')} = %s AND {qn('is_active')} = %s) "
+        f"AND EXISTS (SELECT 1 FROM {qn(Enrollment._meta.db_table)} "
+        f"WHERE {qn('section_id')} = %s AND {qn('student_id')} = %s AND {qn('status')} = %s) "
+        f"ON CONFLICT ({qn('session_id')}, {qn('student_id')}) DO NOTHING "
+        f"RETURNING {qn('id')}"
+    )
+    params = [
+        session_id, student_id, status, checked_in_at,
+        session_id, True,
+        section_id, student_id, 'enrolled',
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def attach_proof_image(record_id, proof_image):
+    """บันทึกไฟล์หลักฐานให้ record ที่เพิ่งสร้าง (เฉพาะกรณีส่งไฟล์มาด้วย)"""
+    record = AttendanceRecord(id=record_id)
+    record.proof_image.save(proof_image.name, proof_image, save=False)
+    AttendanceRecord.objects.filter(id=record_id).update(proof_image=record.proof_image.name)
+
+
+def current_state(session_id, section_id, student_id):
+    """
+    สถานะจากฐานข้อมูลใน query เดียว: is_active, enrolled, record_id, record_status
+    คืนค่า None ถ้าไม่พบเซสชัน (ใช้เมื่อ INSERT ไม่สำเร็จ และก่อนตอบรับในโหมด buffered)
+    """
+    records = AttendanceRecord.objects.filter(session_id=OuterRef('id'), student_id=student_id)
+    return AttendanceSession.objects.filter(id=session_id).annotate(
+        enrolled=Exists(Enrollment.objects.filter(section_id=section_id, student_id=student_id, status='enrolled')),
+        record_id=Subquery(records.values('id')[:1]),
+        record_status=Subquery(records.values('status')[:1]),
+    ).values('is_active', 'enrolled', 'record_id', 'record_status').first()
+
+
+def _rejected(current, state):
+    """ผลลัพธ์เมื่อ cache ล้าสมัย (เซสชันถูกปิด/นักศึกษาถอน) - ล้าง cache ของ process นี้ด้วย"""
+    if current is None or not current['is_active']:
+        roster_cache.invalidate_session(state['id'])
+        return CheckInResult(NOT_FOUND)
+    if not current['enrolled']:
+        roster_cache.invalidate_section(state['section_id'])
+        return CheckInResult(NOT_ENROLLED)
+    return None
+
+
+def _conflict_result(state, student_id):
+    """อ่านสถานะจริงหลัง INSERT ไม่สำเร็จ: ผลที่ถูกปฏิเสธ, DUPLICATE ถ้ามี record แล้ว หรือ None ถ้าไม่มี record"""
+    current = current_state(state['id'], state['section_id'], student_id)
+    rejected = _rejected(current, state)
+    if rejected is not None:
+        return rejected
+    if current['record_id'] is not None:
+        return CheckInResult(DUPLICATE, current['record_status'], current['record_id'])
+    return None
+
+
+def check_in(session_id, qr_data, student, proof_image=None, now=None):
+    """
+    เช็คชื่อนักศึกษาหนึ่งคน คืนค่า CheckInResult
+
+    qr_data ต้องเป็น token ที่ยังไม่หมด window (qr_tokens.verify)
+    เซสชันและ roster อ่านจาก roster_cache ดังนั้นการสแกนปกติใช้ DB
+    เพียง INSERT เดียว; SELECT เพิ่มเฉพาะกรณีสแกนซ้ำ (โหมด buffered: SELECT เดียวเพื่อตรวจ record เดิม)
+    ถ้า QR Code หมดอายุแล้ว จะบันทึกเป็น absent (expired=True)
+    ในโหมด buffered ingestion จะไม่มี record_id (ยังไม่ได้เขียนลง DB)
+    """
+    now = now or timezone.now()
+
+    # Token ปลอม/หมด window ถูกปฏิเสธก่อนแตะ cache หรือ DB
+    section_id = qr_tokens.verify(qr_data, session_id, now)
+    if section_id is None:
+        return CheckInResult(INVALID_QR)
+
+    state = roster_cache.get_session(session_id)
+    if state is None:
+        return CheckInResult(NOT_FOUND)
+
+    if state['section_id'] != section_id:
+        return CheckInResult(INVALID_QR)
+
+    if not roster_cache.is_enrolled(state, student.id):
+        return CheckInResult(NOT_ENROLLED)
+
+    expired = is_qr_expired(state['qr_expires_at'], now)
+    # QR code expired - cannot scan, mark as absent
+    status = 'absent' if expired else determine_status(state['session_start'], now)
+
+    if ingest.is_enabled() and not proof_image:
+        # Buffered mode: ตอบรับทันที บันทึกลง DB ภายหลังเป็นชุด (ไฟล์แนบต้องเขียนตรง)
+        # record ที่อยู่ใน DB แล้ว (อาจารย์บันทึกเอง หรือ flush ไปแล้ว) จะถูก ON CONFLICT ทิ้ง
+        # จึงตรวจก่อนตอบรับ (พร้อมสถานะเซสชัน/การลงทะเบียน) - ไม่ให้นักศึกษาเห็นสถานะที่ไม่ตรงกับที่บันทึกไว้
+        current = current_state(state['id'], state['section_id'], student.id)
+        rejected = _rejected(current, state)
+        if rejected is not None:
+            return rejected
+        if current['record_id'] is not None:
+            return CheckInResult(DUPLICATE, current['record_status'], current['record_id'])
+        previous_status = ingest.enqueue(state['id'], student.id, status, now)
+        if previous_status is not None:
+            return CheckInResult(DUPLICATE, previous_status)
+        return CheckInResult(CREATED, status, expired=expired)
+
+    record_id = insert_record(state['id'], state['section_id'], student.id, status, now)
+    if record_id is None:
+        # มี record อยู่แล้ว - คืนค่าสถานะเดิมโดยไม่เขียนซ้ำ
+        result = _conflict_result(state, student.id)
+        if result is not None:
+            return result
+        # record ที่ชนถูกลบไปก่อนอ่าน (เช่นอาจารย์ลบ) - บันทึกใหม่อีกครั้งเดียว
+        record_id = insert_record(state['id'], state['section_id'], student.id, status, now)
+        if record_id is None:
+            # ชนอีกครั้ง (สแกนพร้อมกันจากอีกเครื่อง หรือเซสชันถูกปิด/ถอนระหว่างนั้น) - อ่านสถานะจริงอีกครั้ง
+            # ถ้า record ถูกลบซ้ำอีกก็ไม่ลองต่อ: ถือว่าเช็คชื่อแล้วด้วยสถานะที่พยายามบันทึก
+            return _conflict_result(state, student.id) or CheckInResult(DUPLICATE, status)
+
+    summary.record_created(state['section_id'], student.id, status, now)
+
+    if proof_image:
+        attach_proof_image(record_id, proof_image)
+
+    return CheckInResult(CREATED, status, record_id, expired=expired)
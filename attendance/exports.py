@@ -0,0 +1,320 @@
+"""
+Streaming export ของข้อมูลการเข้าเรียน (CSV / XLSX)
+
+- matrix: ตารางนักศึกษา × เซสชันของแต่ละกลุ่มเรียน พร้อมสรุป (หนึ่ง sheet ต่อกลุ่มเรียน)
+- records: รายละเอียดรายนักศึกษา หนึ่งแถวต่อ (นักศึกษา, เซสชัน)
+- leaves: ประวัติใบลา
+
+แถวสร้างจาก generator ที่อ่าน queryset ด้วย .iterator() ทีละ chunk
+ในหน่วยความจำมีแค่รายการเซสชันและวันลาที่อนุมัติของกลุ่มเรียนที่กำลังเขียน (ขนาดเล็ก)
+
+- CSV: ส่งทีละแถวผ่าน StreamingHttpResponse ทันทีที่สร้าง
+- XLSX: openpyxl write-only เขียนแถวลงไฟล์ชั่วคราวบนดิสก์ (ไม่สร้าง cell object ค้างไว้)
+  แล้วส่งไฟล์ด้วย FileResponse ทีละ block - ไฟล์ xlsx เป็น zip ต้องปิดไฟล์ก่อนจึงส่งได้
+  จึงต้องสร้างทั้งไฟล์ใน request: จำกัดจำนวนกลุ่มเรียนต่อครั้งที่ ATTENDANCE_EXPORT_XLSX_MAX_SECTIONS
+  export ที่ใหญ่กว่านั้นใช้ CSV หรือ `python manage.py export_attendance` (เขียนไฟล์นอก web worker)
+
+นิยามเหมือน stats.py: เซสชันที่ไม่มี record = ขาดเรียน (ตารางแสดง "ลา" ถ้ามีใบลาที่อนุมัติวันนั้น)
+"""
+import csv
+import re
+import tempfile
+from dataclasses import dataclass
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterable
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+from academic.models import Enrollment
+from .models import AttendanceRecord, LeaveRequest
+from .stats import StudentStats, sessions_in_range
+
+
+CHUNK_SIZE = 2000
+
+FORMATS = ('csv', 'xlsx')
+
+KINDS = ('matrix', 'records', 'leaves')
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+RECORD_STATUS = dict(AttendanceRecord.STATUS_CHOICES)
+LEAVE_STATUS = dict(LeaveRequest.STATUS_CHOICES)
+LEAVE_TYPE = dict(LeaveRequest.LEAVE_TYPE_CHOICES)
+ON_LEAVE = 'ลา'
+
+STUDENT_COLUMNS = ['รหัสนักศึกษา', 'ชื่อ-นามสกุล']
+SECTION_COLUMNS = ['รายวิชา', 'กลุ่มเรียน']
+
+
+@dataclass
+class Sheet:
+    title: str
+    rows: Iterable       # generator ของแถว (แถวแรกเป็นหัวตาราง)
+
+
+def xlsx_max_sections():
+    """จำนวนกลุ่มเรียนสูงสุดต่อการ export XLSX ผ่านเว็บ"""
+    return getattr(settings, 'ATTENDANCE_EXPORT_XLSX_MAX_SECTIONS', 10)
+
+
+def section_label(section):
+    return f'{section.course.course_code} กลุ่ม {section.section_number}'
+
+
+def filename(prefix, sections, fmt):
+    if len(sections) == 1:
+        prefix = f'{prefix}_{sections[0].course.course_code}_{sections[0].section_number}'
+    return f'{prefix}_{timezone.localdate():%Y%m%d}.{fmt}'
+
+
+def _full_name(username, first_name, last_name):
+    return f'{first_name or ""} {last_name or ""}'.strip() or username
+
+
+def _local(value):
+    """datetime แบบ naive เวลาท้องถิ่น (xlsx ไม่รองรับ timezone)"""
+    if value is None:
+        return None
+    return timezone.localtime(value).replace(tzinfo=None, microsecond=0)
+
+
+def _sessions(section_id, start_date, end_date):
+    return list(
+        sessions_in_range([section_id], start_date, end_date)
+        .order_by('session_date', 'session_time', 'id')
+        .values('id', 'session_date', 'session_time')
+    )
+
+
+def _leave_dates(section_id, start_date, end_date, student_id=None):
+    """{(student_id, leave_date)} ของใบลาที่อนุมัติแล้ว"""
+    leaves = LeaveRequest.objects.filter(section_id=section_id, status='approved')
+    if start_date:
+        leaves = leaves.filter(leave_date__gte=start_date)
+    if end_date:
+        leaves = leaves.filter(leave_date__lte=end_date)
+    if student_id is not None:
+        leaves = leaves.filter(student_id=student_id)
+    return set(leaves.order_by().values_list('student_id', 'leave_date'))
+
+
+def _students(section_id, student_id=None):
+    enrollments = Enrollment.objects.filter(section_id=section_id, status='enrolled')
+    if student_id is not None:
+        enrollments = enrollments.filter(student_id=student_id)
+    return enrollments.order_by('student_id').values_list(
+        'student_id', 'student__profile__student_id',
+        'student__username', 'student__first_name', 'student__last_name',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _records(session_ids, student_id=None):
+    """groupby ของ (student_id, session_id, status, checked_in_at, notes) เรียงตาม student_id"""
+    records = AttendanceRecord.objects.filter(session_id__in=session_ids)
+    if student_id is not None:
+        records = records.filter(student_id=student_id)
+    rows = records.order_by('student_id').values_list(
+        'student_id', 'session_id', 'status', 'checked_in_at', 'notes',
+    ).iterator(chunk_size=CHUNK_SIZE)
+    return groupby(rows, key=itemgetter(0))
+
+
+def _roster(section_id, sessions, student_id=None):
+    """
+    (student, {session_id: (status, checked_in_at, notes)}) ทีละนักศึกษา
+    merge รายชื่อกับ record ที่เรียงตาม student_id ทั้งคู่ - ถือ record ของนักศึกษาทีละคน
+    """
+    groups = _records([session['id'] for session in sessions], student_id)
+    current = next(groups, None)
+    for student in _students(section_id, student_id):
+        # record ของนักศึกษาที่ไม่ได้อยู่ในรายชื่อ (ถอน/ย้ายกลุ่ม) ข้ามไป
+        while current is not None and current[0] < student[0]:
+            current = next(groups, None)
+        records = {}
+        if current is not None and current[0] == student[0]:
+            records = {row[1]: row[2:] for row in current[1]}
+            current = next(groups, None)
+        yield student, records
+
+
+def _cell(student_id, session, record, leave_dates):
+    if record is not None:
+        return RECORD_STATUS.get(record[0], record[0])
+    if (student_id, session['session_date']) in leave_dates:
+        return ON_LEAVE
+    return RECORD_STATUS['absent']
+
+
+def matrix_rows(section, start_date=None, end_date=None):
+    sessions = _sessions(section.id, start_date, end_date)
+    leave_dates = _leave_dates(section.id, start_date, end_date)
+    yield STUDENT_COLUMNS + [
+        f'{session["session_date"]:%Y-%m-%d} {session["session_time"]:%H:%M}' for session in sessions
+    ] + ['เข้าเรียน', 'มาสาย', 'มีเหตุผล', 'ขาดเรียน', 'อัตราการเข้าเรียน (%)']
+
+    for student, records in _roster(section.id, sessions):
+        statuses = [record[0] for record in records.values()]
+        student_stats = StudentStats(
+            student=student[0],
+            total_sessions=len(sessions),
+            present_count=statuses.count('present'),
+            late_count=statuses.count('late'),
+            excused_count=statuses.count('excused'),
+        )
+        yield [student[1] or '-', _full_name(*student[2:])] + [
+            _cell(student[0], session, records.get(session['id']), leave_dates) for session in sessions
+        ] + [
+            student_stats.present_count,
+            student_stats.late_count,
+            student_stats.excused_count,
+            student_stats.absent_count,
+            round(student_stats.attendance_rate, 1),
+        ]
+
+
+def matrix_sheets(sections, start_date=None, end_date=None):
+    return [Sheet(section_label(section), matrix_rows(section, start_date, end_date)) for section in sections]
+
+
+def sheets(kind, sections, start_date=None, end_date=None, student_id=None):
+    """Sheet ของ export แต่ละชนิด (KINDS)"""
+    if kind == 'matrix':
+        return matrix_sheets(sections, start_date, end_date)
+    if kind == 'records':
+        return [Sheet('รายละเอียด', record_rows(sections, start_date, end_date, student_id))]
+    if kind == 'leaves':
+        return [Sheet('ใบลา', leave_rows(sections, start_date, end_date, student_id))]
+    raise ValueError(f'Unknown export kind: {kind}')
+
+
+def record_rows(sections, start_date=None, end_date=None, student_id=None):
+    yield SECTION_COLUMNS + STUDENT_COLUMNS + ['วันที่', 'เวลา', 'สถานะ', 'เวลาเช็คชื่อ', 'หมายเหตุ']
+    for section in sections:
+        prefix = [section.course.course_code, section.section_number]
+        sessions = _sessions(section.id, start_date, end_date)
+        leave_dates = _leave_dates(section.id, start_date, end_date, student_id)
+        for student, records in _roster(section.id, sessions, student_id):
+            name = [student[1] or '-', _full_name(*student[2:])]
+            for session in sessions:
+                record = records.get(session['id'])
+                yield prefix + name + [
+                    session['session_date'],
+                    session['session_time'].replace(microsecond=0),
+                    _cell(student[0], session, record, leave_dates),
+                    _local(record[1]) if record else None,
+                    record[2] if record else None,
+                ]
+
+
+def leave_rows(sections, start_date=None, end_date=None, student_id=None):
+    yield SECTION_COLUMNS + STUDENT_COLUMNS + [
+        'วันที่ลา', 'ประเภท', 'เหตุผล', 'สถานะ', 'ผู้พิจารณา', 'วันที่พิจารณา', 'วันที่ยื่น',
+    ]
+    labels = {section.id: [section.course.course_code, section.section_number] for section in sections}
+    leaves = LeaveRequest.objects.filter(section_id__in=labels)
+    if start_date:
+        leaves = leaves.filter(leave_date__gte=start_date)
+    if end_date:
+        leaves = leaves.filter(leave_date__lte=end_date)
+    if student_id is not None:
+        leaves = leaves.filter(student_id=student_id)
+    rows = leaves.order_by('section_id', 'leave_date', 'id').values_list(
+        'section_id', 'student__profile__student_id',
+        'student__username', 'student__first_name', 'student__last_name',
+        'leave_date', 'leave_type', 'reason', 'status',
+        'teacher__username', 'teacher__first_name', 'teacher__last_name',
+        'reviewed_at', 'created_at',
+    ).iterator(chunk_size=CHUNK_SIZE)
+    for row in rows:
+        yield labels[row[0]] + [row[1] or '-', _full_name(*row[2:5])] + [
+            row[5],
+            LEAVE_TYPE.get(row[6], row[6]),
+            row[7],
+            LEAVE_STATUS.get(row[8], row[8]),
+            _full_name(*row[9:12]) if row[9] else None,
+            _local(row[12]),
+            _local(row[13]),
+        ]
+
+
+class _Echo:
+    """file-like ของ csv.writer ที่คืนค่าแถวแทนการเขียน"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(sheets):
+    """CSV ทีละแถว - ถ้ามีหลาย sheet เขียนต่อกันโดยมีชื่อ sheet คั่น"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff'  # BOM ให้ Excel อ่านภาษาไทยถูก
+    for i, sheet in enumerate(sheets):
+        if len(sheets) > 1:
+            if i:
+                yield writer.writerow([])
+            yield writer.writerow([sheet.title])
+        for row in sheet.rows:
+            yield writer.writerow(['' if value is None else value for value in row])
+
+
+def csv_response(sheets, name):
+    response = StreamingHttpResponse(csv_lines(sheets), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = content_disposition_header(True, name)
+    return response
+
+
+def _sheet_title(title, used):
+    title = re.sub(r'[\[\]:*?/\\]', '-', title)[:31] or 'Sheet'
+    candidate, n = title, 1
+    while candidate in used:
+        n += 1
+        suffix = f' ({n})'
+        candidate = title[:31 - len(suffix)] + suffix
+    used.add(candidate)
+    return candidate
+
+
+def write_xlsx(sheets, output):
+    """เขียน XLSX แบบ write-only ลง output (path หรือ binary file)"""
+    from openpyxl import Workbook  # import เมื่อใช้ (ไม่โหลดตอน start worker)
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    workbook = Workbook(write_only=True)
+    used = set()
+    for sheet in sheets:
+        worksheet = workbook.create_sheet(_sheet_title(sheet.title, used))
+        for row in sheet.rows:
+            worksheet.append([
+                ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value for value in row
+            ])
+    if not used:
+        workbook.create_sheet('Sheet')
+    workbook.save(output)
+
+
+def xlsx_response(sheets, name):
+    """XLSX เขียนลงไฟล์ชั่วคราวแล้วส่งทีละ block"""
+    output = tempfile.TemporaryFile()
+    write_xlsx(sheets, output)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=name, content_type=XLSX_CONTENT_TYPE)
+
+
+def response(fmt, sheets, name):
+    if fmt == 'xlsx':
+        return xlsx_response(sheets, name)
+    return csv_response(sheets, name)
+
+
+def write(fmt, sheets, path):
+    """เขียน export ลงไฟล์ (management command export_attendance)"""
+    if fmt == 'xlsx':
+        write_xlsx(sheets, path)
+        return
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.writelines(csv_lines(sheets))
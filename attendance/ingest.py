@@ -0,0 +1,378 @@
+"""
+Write-behind buffered ingestion of AttendanceRecord inserts
+
+โหมดเสริม (settings.ATTENDANCE_BUFFERED_INGESTION) สำหรับช่วงที่มีการสแกนพร้อมกันจำนวนมาก:
+scan_qr ตอบรับการเช็คชื่อทันทีจาก roster_cache แล้วเก็บไว้ใน buffer
+ก่อนเขียนลง DB เป็นชุด (ตามจำนวนหรือตามเวลา) ด้วย background thread
+หรือคำสั่ง `python manage.py flush_attendance_journal`
+
+Durability: ทุกการเช็คชื่อที่ตอบรับแล้วจะถูกเขียนลง journal (append-only, fsync)
+ก่อนตอบกลับเสมอ ไฟล์ journal จะถูกลบเมื่อเขียนลง DB สำเร็จแล้วเท่านั้น
+ถ้า process ตายก่อน flush ข้อมูลจะถูก replay จาก journal ในครั้งถัดไป
+process ที่เขียน segment .open ถือ flock บนไฟล์ตลอดเวลา (kernel ปล่อยให้เองเมื่อ process ตาย)
+จึงรู้ได้ว่า segment ถูกทิ้งแม้ process ใหม่จะได้ pid เดิม (เช่น worker เป็น pid 1 ใน container)
+ถ้า flush ล้มเหลว (เช่น DB ล่ม) segment .sealed จะถูก retry ทุกรอบของ flush thread (backoff สูงสุด
+RETRY_MAX_SECONDS) จนเขียนสำเร็จ การ replay ซ้ำไม่ทำให้ข้อมูลซ้ำ เพราะใช้ ON CONFLICT DO NOTHING
+
+การสแกนซ้ำ: ตรวจจาก _accepted ของ process และ claim ใน cache ที่ใช้ร่วมกัน (ATTENDANCE_ROSTER_CACHE_ALIAS)
+ส่วน record ที่อยู่ใน DB แล้ว checkin.py ตรวจก่อนเรียก enqueue()
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows - ใช้ pid ตรวจแทน flock
+    fcntl = None
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import summary
+from .models import AttendanceRecord
+
+
+logger = logging.getLogger(__name__)
+
+OPEN_SUFFIX = '.open'
+SEALED_SUFFIX = '.sealed'
+NEW_SUFFIX = '.new'  # segment ที่กำลังสร้าง (ยังไม่ได้ flock) - replay ไม่อ่าน
+
+# เก็บ (session_id, student_id) ที่ตอบรับแล้วไว้ตรวจการสแกนซ้ำ ไม่เกินเวลานี้
+ACCEPTED_RETENTION_SECONDS = 2 * 60 * 60
+
+# backoff ของการ retry segment ที่ flush ไม่สำเร็จ (เริ่ม RETRY_MIN แล้วเพิ่มเท่าตัว)
+RETRY_MIN_SECONDS = 1
+RETRY_MAX_SECONDS = 60
+
+
+def is_enabled():
+    return getattr(settings, 'ATTENDANCE_BUFFERED_INGESTION', False)
+
+
+def journal_dir():
+    path = Path(getattr(settings, 'ATTENDANCE_INGEST_JOURNAL_DIR', settings.BASE_DIR / 'var' / 'attendance_journal'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _segment_pid(path):
+    """pid ของ process ที่เป็นเจ้าของ segment (ชื่อไฟล์: journal-<pid>-<n>.open)"""
+    try:
+        return int(path.name.split('-')[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _pid_alive(pid):
+    if pid is None:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _segment_in_use(path):
+    """segment .open ยังมี Journal เขียนอยู่หรือไม่ (ตรวจจาก flock ของผู้เขียน ไม่ใช่ pid)"""
+    if fcntl is None:
+        return _pid_alive(_segment_pid(path))
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return True  # ถูก seal หรือ replay ไปแล้ว
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(f, fcntl.LOCK_UN)
+    return False
+
+
+def read_segment(path):
+    """อ่าน entries จากไฟล์ journal (ข้ามบรรทัดท้ายที่เขียนไม่ครบตอน crash)"""
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning('Skipping torn journal line in %s', path)
+                continue
+            entry['checked_in_at'] = parse_datetime(entry['checked_in_at'])
+            entries.append(entry)
+    return entries
+
+
+def write_records(entries):
+    """
+    เขียน entries ลง DB เป็นชุดใน transaction เดียว
+    ใช้ multi-row INSERT ... ON CONFLICT DO NOTHING เพื่อให้ replay ซ้ำได้
+    และคงเวลาเช็คชื่อจริงไว้ (bulk_create จะเขียนทับ checked_in_at ด้วย auto_now_add)
+    คืนค่าจำนวน record ที่เพิ่มใหม่
+    """
+    if not entries:
+        return 0
+    batch_size = getattr(settings, 'ATTENDANCE_INGEST_BATCH_SIZE', 500)
+    qn = connection.ops.quote_name
+    head = (
+        f"INSERT INTO {qn(AttendanceRecord._meta.db_table)} "
+        f"({qn('session_id')}, {qn('student_id')}, {qn('status')}, {qn('checked_in_at')}) VALUES "
+    )
+    tail = (
+        f" ON CONFLICT ({qn('session_id')}, {qn('student_id')}) DO NOTHING"
+        f" RETURNING {qn('session_id')}, {qn('student_id')}"
+    )
+
+    inserted = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(entries), batch_size):
+            batch = entries[start:start + batch_size]
+            params = []
+            for entry in batch:
+                params.extend([entry['session_id'], entry['student_id'], entry['status'], entry['checked_in_at']])
+            cursor.execute(head + ', '.join(['(%s, %s, %s, %s)'] * len(batch)) + tail, params)
+            for session_id, student_id in cursor.fetchall():
+                # AttendanceSummary ถูก refresh ครั้งเดียวต่อกลุ่มเรียนตอน commit
+                summary.schedule_refresh(session_id=session_id, student_id=student_id)
+                inserted += 1
+    return inserted
+
+
+class Journal:
+    """Append-only journal แบ่งเป็น segment ต่อ process"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._counter = 0
+        self._file = None
+        self._path = None
+
+    def _open_segment(self):
+        self._counter += 1
+        self._path = self.directory / f'journal-{os.getpid()}-{int(time.time())}-{self._counter}{OPEN_SUFFIX}'
+        # flock ก่อนเปลี่ยนชื่อเป็น .open - replay ไม่มีทางเห็น segment .open ที่ยังไม่ถูก lock
+        new = self._path.with_suffix(NEW_SUFFIX)
+        self._file = open(new, 'a', encoding='utf-8')
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        os.replace(new, self._path)
+
+    def append(self, entry):
+        if self._file is None:
+            self._open_segment()
+        self._file.write(json.dumps(entry, default=str) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def seal(self):
+        """ปิด segment ปัจจุบันและเปลี่ยนชื่อเป็น .sealed คืนค่า path (หรือ None)"""
+        if self._file is None:
+            return None
+        sealed = self._path.with_suffix(SEALED_SUFFIX)
+        if fcntl is None:
+            self._file.close()
+            os.replace(self._path, sealed)
+        else:
+            # เปลี่ยนชื่อขณะยังถือ flock แล้วจึงปิด
+            os.replace(self._path, sealed)
+            self._file.close()
+        self._file = None
+        self._path = None
+        return sealed
+
+
+class BufferedIngestor:
+    """Buffer ในหน่วยความจำ + journal + background flush thread"""
+
+    def __init__(self, directory, batch_size, flush_interval):
+        self.journal = Journal(directory)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._accepted = {}
+        self._retry_delay = 0
+        self._retry_at = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def enqueue(self, session_id, student_id, status, checked_in_at):
+        """
+        รับการเช็คชื่อเข้า buffer (เขียน journal ก่อนคืนค่า)
+        คืนค่าสถานะเดิมถ้าเคยรับไว้แล้ว (ใน process นี้ หรือ process อื่นผ่าน cache) มิฉะนั้นคืนค่า None
+        """
+        key = (session_id, student_id)
+        claim = f'attendance:accepted:{session_id}:{student_id}'
+        entry = {
+            'session_id': session_id,
+            'student_id': student_id,
+            'status': status,
+            'checked_in_at': checked_in_at.isoformat(),
+        }
+        with self._lock:
+            accepted = self._accepted.get(key)
+            if accepted is not None:
+                return accepted[0]
+            # worker อื่นรับการสแกนนี้ไปแล้ว (ยังไม่ได้เขียนลง DB)
+            cache = _accepted_cache()
+            if not cache.add(claim, status, ACCEPTED_RETENTION_SECONDS):
+                previous = cache.get(claim)
+                if previous is not None:
+                    return previous
+            self.journal.append(entry)
+            self._accepted[key] = (status, time.monotonic())
+            self._buffer.append(dict(entry, checked_in_at=checked_in_at))
+            full = len(self._buffer) >= self.batch_size
+
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+        return None
+
+    def flush(self):
+        """เขียน buffer ลง DB แล้วลบ segment ที่เขียนสำเร็จ คืนค่าจำนวนที่เพิ่มใหม่"""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._buffer = self._buffer, []
+                sealed = self.journal.seal()
+                self._purge_accepted()
+            if not entries:
+                return 0
+            try:
+                inserted = write_records(entries)
+            except Exception:
+                # segment ยังอยู่ในดิสก์ (.sealed) - retry_sealed() เขียนซ้ำในรอบถัดไป
+                logger.exception('Attendance flush failed; %d entries kept in %s', len(entries), sealed)
+                self._backoff()
+                return 0
+            if sealed is not None:
+                sealed.unlink(missing_ok=True)
+            return inserted
+
+    def _backoff(self):
+        self._retry_delay = min(max(self._retry_delay * 2, RETRY_MIN_SECONDS), RETRY_MAX_SECONDS)
+        self._retry_at = time.monotonic() + self._retry_delay
+
+    def retry_sealed(self, force=False):
+        """
+        เขียน segment .sealed ที่ค้างอยู่ (flush ล้มเหลว) ของ process นี้หรือของ process ที่ตายไปแล้ว
+        ข้ามถ้ายังไม่ถึงเวลา backoff (force=True ไม่รอ) คืนค่าจำนวน record ที่เพิ่มใหม่
+        """
+        if not force and time.monotonic() < self._retry_at:
+            return 0
+        inserted = 0
+        with self._flush_lock:
+            for path in sorted(self.journal.directory.glob(f'journal-*{SEALED_SUFFIX}')):
+                pid = _segment_pid(path)
+                if pid != os.getpid() and _pid_alive(pid):
+                    # process อื่นกำลัง flush segment ของตัวเอง
+                    continue
+                try:
+                    inserted += _replay_segment(path)
+                except FileNotFoundError:
+                    continue
+                except Exception:
+                    logger.exception('Attendance journal retry failed for %s', path)
+                    self._backoff()
+                    return inserted
+        self._retry_delay = 0
+        return inserted
+
+    def _purge_accepted(self):
+        cutoff = time.monotonic() - ACCEPTED_RETENTION_SECONDS
+        for key in [k for k, (_, at) in self._accepted.items() if at < cutoff]:
+            del self._accepted[key]
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='attendance-ingest', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        # Replay segment ที่ค้างจาก process ก่อนหน้า (เช่น หลัง restart)
+        replay_pending()
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+            self.retry_sealed()
+
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+
+def get_ingestor():
+    global _ingestor
+    if _ingestor is None:
+        with _ingestor_lock:
+            if _ingestor is None:
+                _ingestor = BufferedIngestor(
+                    journal_dir(),
+                    batch_size=getattr(settings, 'ATTENDANCE_INGEST_BATCH_SIZE', 500),
+                    flush_interval=getattr(settings, 'ATTENDANCE_INGEST_FLUSH_INTERVAL', 2),
+                )
+                atexit.register(_ingestor.flush)
+    return _ingestor
+
+
+def enqueue(session_id, student_id, status, checked_in_at):
+    return get_ingestor().enqueue(session_id, student_id, status, checked_in_at)
+
+
+def _accepted_cache():
+    return caches[getattr(settings, 'ATTENDANCE_ROSTER_CACHE_ALIAS', 'default')]
+
+
+def _replay_segment(path):
+    """เขียน segment ลง DB แล้วลบไฟล์ (FileNotFoundError ถ้าถูก process อื่น replay ไปแล้ว)"""
+    inserted = write_records(read_segment(path))
+    path.unlink(missing_ok=True)
+    return inserted
+
+
+def replay_pending(directory=None):
+    """
+    Replay segment ที่ยังไม่ได้เขียนลง DB:
+    - .sealed ทั้งหมด (flush ล้มเหลวหรือ process ตายระหว่าง flush)
+    - .open ที่ไม่มี Journal ถือ flock อยู่ (process ตายก่อน flush แม้ process ใหม่จะได้ pid เดิม)
+    คืนค่า (จำนวน segment, จำนวน record ที่เพิ่มใหม่)
+    """
+    directory = Path(directory) if directory else journal_dir()
+    segments = 0
+    inserted = 0
+    for path in sorted(directory.glob('journal-*')):
+        if path.suffix == OPEN_SUFFIX and _segment_in_use(path):
+            continue
+        if path.suffix not in (OPEN_SUFFIX, SEALED_SUFFIX):
+            continue
+        try:
+            inserted += _replay_segment(path)
+        except FileNotFoundError:
+            # segment ถูก process อื่น replay ไปแล้ว
+            continue
+        except Exception:
+            logger.exception('Attendance journal replay failed for %s', path)
+            continue
+        segments += 1
+    return segments, inserted
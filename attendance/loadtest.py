@@ -0,0 +1,393 @@
+"""
+Load test ของ scan_qr (จำลองนักศึกษาทั้งวิทยาเขตเช็คชื่อพร้อมกันตอนเริ่มคาบ)
+
+ใช้ผ่าน `python manage.py loadtest_checkin` (ดู help ของคำสั่ง) ขั้นตอน:
+1. seed: สร้าง N กลุ่มเรียน x M นักศึกษา (ข้อมูลทั้งหมดขึ้นต้นด้วย PREFIX, ลบได้ด้วย cleanup)
+2. open_sessions: เปิดเซสชันเช็คชื่อ K เซสชัน (หนึ่งเซสชันต่อกลุ่มเรียน)
+3. build_schedule: กำหนดเวลาสแกนของนักศึกษาแต่ละคนตาม arrival curve
+   - herd: เกือบทุกคนสแกนในช่วงแรกของคาบ (exponential, หนาแน่นที่วินาทีแรก)
+   - trickle: กระจายสม่ำเสมอตลอดช่วงเวลา
+   - mixed: herd + ส่วนที่มาสาย (late_fraction) แบบ trickle
+   และสแกนซ้ำ (กดซ้ำ/เน็ตช้า) ตาม duplicate_rate
+4. run: worker threads ส่ง request ตามเวลาที่กำหนด
+   - in-process (ค่าเริ่มต้น): ผ่าน Django test Client ทั้ง middleware stack, นับ query ต่อ scan ได้ตรง
+   - base_url: HTTP จริงไปยัง server ที่ใช้ฐานข้อมูลเดียวกัน (จำนวน query อ่านจาก Server-Timing
+     ถ้า server เปิด PROFILING_ENABLED)
+5. report: throughput, latency p50/p95/p99, อัตรา error/duplicate, query ต่อ scan
+
+หมายเหตุ: SQLite ล็อกทั้งไฟล์ตอนเขียน จึงจะเห็น error "database is locked" เมื่อ concurrency สูง
+"""
+import json
+import queue
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, connections
+from django.test import Client
+from django.utils import timezone
+
+from academic import counters
+from academic.models import AcademicYear, Semester, Course, Section, Enrollment
+from accounts.models import User
+from accounts.provisioning import StudentAccount, provision_students
+from .models import AttendanceSession
+
+
+PREFIX = 'loadtest'
+ARRIVAL_CURVES = ('herd', 'trickle', 'mixed')
+
+SCAN_URL = '/attendance/scan-qr/'
+DUPLICATE_MESSAGE = 'คุณเช็คชื่อแล้ว'
+SERVER_TIMING_QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+# ---------------------------------------------------------------------------
+# Data
+# ---------------------------------------------------------------------------
+
+def seed(sections, students_per_section):
+    """
+    สร้าง/ใช้ข้อมูลทดสอบที่มีอยู่แล้ว คืนค่า [(section, [student_id, ...]), ...]
+    รันซ้ำได้ (idempotent) - เพิ่มเฉพาะส่วนที่ยังไม่มี
+    """
+    teacher, _ = User.objects.get_or_create(
+        username=f'{PREFIX}_teacher',
+        defaults={'role': 'teacher', 'first_name': 'Load', 'last_name': 'Test'},
+    )
+    year, _ = AcademicYear.objects.get_or_create(year=PREFIX, defaults={'description': 'Load test data'})
+    semester, _ = Semester.objects.get_or_create(
+        academic_year=year,
+        semester_number=1,
+        defaults={'start_date': date.today(), 'end_date': date.today() + timedelta(days=120)},
+    )
+
+    codes = [f'LT{n:04d}' for n in range(sections)]
+    Course.objects.bulk_create(
+        [Course(course_code=code, course_name=f'Load test {code}', credit=3) for code in codes],
+        ignore_conflicts=True,
+    )
+    courses = Course.objects.in_bulk(codes, field_name='course_code')
+    Section.objects.bulk_create(
+        [
+            Section(course=courses[code], semester=semester, section_number='1', teacher=teacher,
+                    capacity=students_per_section)
+            for code in codes
+        ],
+        ignore_conflicts=True,
+    )
+    section_by_course = {
+        section.course_id: section
+        for section in Section.objects.filter(semester=semester, course__in=courses.values(), section_number='1')
+    }
+
+    accounts = [
+        StudentAccount(
+            username=f'{PREFIX}_{n:04d}_{i:04d}',
+            student_id=f'LT{n:04d}{i:04d}',
+            first_name=f'Student {i}',
+            last_name=code,
+        )
+        for n, code in enumerate(codes)
+        for i in range(students_per_section)
+    ]
+    users = provision_students(accounts).users
+
+    roster = []
+    enrollments = []
+    for n, code in enumerate(codes):
+        section = section_by_course[courses[code].id]
+        student_ids = [users[f'{PREFIX}_{n:04d}_{i:04d}'].id for i in range(students_per_section)]
+        enrollments += [Enrollment(student_id=sid, section=section, status='enrolled') for sid in student_ids]
+        roster.append((section, student_ids))
+    Enrollment.objects.bulk_create(enrollments, ignore_conflicts=True, batch_size=1000)
+    # ignore_conflicts ไม่บอกว่าแถวไหนถูกสร้างจริง - นับตัวนับของกลุ่มเรียนใหม่
+    counters.reconcile([section.id for section, _ in roster])
+    return roster
+
+
+def open_sessions(roster, count):
+    """เปิดเซสชันใหม่ count เซสชัน (กลุ่มเรียนแรก ๆ ของ roster) เริ่มคาบตอนนี้"""
+    now = timezone.localtime()
+    opened = []
+    for section, student_ids in roster[:count]:
+        session = AttendanceSession.objects.create(
+            section=section,
+            teacher=section.teacher,
+            session_date=now.date(),
+            session_time=now.time().replace(microsecond=0),
+            duration_minutes=15,
+        )
+        opened.append((session, student_ids))
+    return opened
+
+
+def cleanup():
+    """ลบข้อมูลทดสอบทั้งหมด (cascade: เซสชัน, การเช็คชื่อ, การลงทะเบียน, โปรไฟล์)"""
+    sections = Section.objects.filter(semester__academic_year__year=PREFIX)
+    deleted = Course.objects.filter(course_code__startswith='LT', id__in=sections.values('course_id')).delete()[0]
+    deleted += AcademicYear.objects.filter(year=PREFIX).delete()[0]
+    deleted += User.objects.filter(username__startswith=f'{PREFIX}_').delete()[0]
+    return deleted
+
+
+def login_cookies(student_ids):
+    """session cookie ของนักศึกษาแต่ละคน (ไม่ต้อง hash รหัสผ่าน) {student_id: cookie}"""
+    client = Client()
+    cookies = {}
+    for user in User.objects.filter(id__in=student_ids):
+        client.force_login(user)
+        cookies[user.id] = client.cookies[settings.SESSION_COOKIE_NAME].value
+        client.cookies.clear()
+    return cookies
+
+
+# ---------------------------------------------------------------------------
+# Arrival schedule
+# ---------------------------------------------------------------------------
+
+@dataclass(order=True)
+class Scan:
+    at: float  # วินาทีหลังเริ่ม
+    session_id: int = field(compare=False)
+    student_id: int = field(compare=False)
+    duplicate: bool = field(default=False, compare=False)
+
+
+def _arrival(rng, curve, duration, herd_window, late_fraction):
+    if curve == 'trickle':
+        return rng.uniform(0, duration)
+    if curve == 'mixed' and rng.random() < late_fraction:
+        return rng.uniform(herd_window, max(duration, herd_window))
+    # herd: exponential ที่ 95% มาถึงภายใน herd_window
+    return min(rng.expovariate(3.0 / herd_window), herd_window)
+
+
+def build_schedule(sessions, curve='mixed', duration=60.0, herd_window=10.0, late_fraction=0.2,
+                   duplicate_rate=0.05, seed=0):
+    """รายการ Scan เรียงตามเวลา (นักศึกษาทุกคนของทุกเซสชันสแกนหนึ่งครั้ง + สแกนซ้ำบางส่วน)"""
+    if curve not in ARRIVAL_CURVES:
+        raise ValueError(f'unknown arrival curve: {curve}')
+    rng = random.Random(seed)
+    scans = []
+    for session, student_ids in sessions:
+        for student_id in student_ids:
+            at = _arrival(rng, curve, duration, herd_window, late_fraction)
+            scans.append(Scan(at, session.id, student_id))
+            if rng.random() < duplicate_rate:
+                scans.append(Scan(at + rng.uniform(0.05, 2.0), session.id, student_id, duplicate=True))
+    scans.sort()
+    return scans
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ScanResult:
+    scheduled_at: float
+    started_at: float
+    latency: float
+    status_code: int
+    outcome: str  # 'ok', 'duplicate', 'error'
+    session_id: int = None
+    student_id: int = None
+    queries: int = None
+    error: str = ''
+
+    @property
+    def response_time(self):
+        """latency รวมเวลารอคิว (นับจากเวลาที่ควรถูกส่ง)"""
+        return self.started_at - self.scheduled_at + self.latency
+
+
+def _classify(status_code, body):
+    if status_code == 200:
+        return 'ok', ''
+    try:
+        message = json.loads(body).get('message', '')
+    except (ValueError, AttributeError):
+        message = body[:200] if isinstance(body, str) else ''
+    if status_code == 400 and message.startswith(DUPLICATE_MESSAGE):
+        return 'duplicate', ''
+    return 'error', f'{status_code} {message}'.strip()
+
+
+class InProcessTransport:
+    """ส่ง request ผ่าน Django test Client (หนึ่ง Client ต่อ thread) และนับ query ของ thread นั้น"""
+
+    def __init__(self, host='localhost'):
+        self.host = host
+        self.local = threading.local()
+
+    def _client(self):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client(HTTP_HOST=self.host)
+        return client
+
+    def post(self, cookie, payload):
+        client = self._client()
+        client.cookies[settings.SESSION_COOKIE_NAME] = cookie
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            response = client.post(SCAN_URL, json.dumps(payload), content_type='application/json')
+        return response.status_code, response.content.decode(errors='replace'), queries[0]
+
+    def close(self):
+        connections.close_all()
+
+
+class HttpTransport:
+    """ส่ง HTTP request จริงไปยัง server (เช่น runserver/gunicorn ที่ใช้ฐานข้อมูลเดียวกัน)"""
+
+    def __init__(self, base_url, timeout=30):
+        self.url = base_url.rstrip('/') + SCAN_URL
+        self.timeout = timeout
+
+    def post(self, cookie, payload):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode(),
+            headers={
+                'Content-Type': 'application/json',
+                'Cookie': f'{settings.SESSION_COOKIE_NAME}={cookie}',
+            },
+            method='POST',
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, body, headers = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as exc:
+            status, body, headers = exc.code, exc.read(), exc.headers
+        match = SERVER_TIMING_QUERIES_RE.search(headers.get('Server-Timing', '') or '')
+        return status, body.decode(errors='replace'), int(match.group(1)) if match else None
+
+    def close(self):
+        pass
+
+
+def run(scans, cookies, sessions, transport, concurrency=50):
+    """
+    ส่ง scans ตามเวลาที่กำหนดด้วย worker threads คืนค่า (results, wall_time)
+    ถ้า worker ไม่ว่าง scan จะถูกส่งช้ากว่ากำหนด (นับรวมใน response_time)
+    """
+    session_objects = {session.id: session for session, _ in sessions}
+    jobs = queue.Queue()
+    for scan in scans:
+        jobs.put(scan)
+    results = []
+    results_lock = threading.Lock()
+    started = time.perf_counter()
+
+    def worker():
+        try:
+            while True:
+                try:
+                    scan = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                delay = scan.at - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+                payload = {
+                    'data': session_objects[scan.session_id].get_qr_code_data(),
+                    'session_id': scan.session_id,
+                }
+                sent = time.perf_counter()
+                try:
+                    status, body, queries = transport.post(cookies[scan.student_id], payload)
+                    outcome, error = _classify(status, body)
+                except Exception as exc:  # เครือข่าย/DB ล้มเหลว นับเป็น error
+                    status, queries, outcome, error = 0, None, 'error', f'{type(exc).__name__}: {exc}'
+                result = ScanResult(
+                    scheduled_at=scan.at,
+                    started_at=sent - started,
+                    latency=time.perf_counter() - sent,
+                    status_code=status,
+                    outcome=outcome,
+                    session_id=scan.session_id,
+                    student_id=scan.student_id,
+                    queries=queries,
+                    error=error,
+                )
+                with results_lock:
+                    results.append(result)
+        finally:
+            transport.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def report(results, wall_time):
+    """สรุปผลเป็น dict (เวลาเป็นมิลลิวินาที)"""
+    total = len(results)
+    latencies = sorted(r.latency * 1000 for r in results)
+    response_times = sorted(r.response_time * 1000 for r in results)
+    queries = sorted(r.queries for r in results if r.queries is not None)
+    counts = {'ok': 0, 'duplicate': 0, 'error': 0}
+    errors = {}
+    accepted = {}
+    for r in results:
+        counts[r.outcome] += 1
+        key = (r.session_id, r.student_id)
+        accepted[key] = accepted.get(key, 0) + (r.outcome == 'ok')
+        if r.error:
+            errors[r.error] = errors.get(r.error, 0) + 1
+    return {
+        'scans': total,
+        'wall_time_s': round(wall_time, 2),
+        'throughput_per_s': round(total / wall_time, 1) if wall_time else 0.0,
+        'ok': counts['ok'],
+        'duplicates': counts['duplicate'],
+        'errors': counts['error'],
+        'duplicate_rate': round(counts['duplicate'] / total, 4) if total else 0.0,
+        # นักศึกษาที่เช็คชื่อสำเร็จ / ถูกตอบรับมากกว่าหนึ่งครั้งในเซสชันเดียวกัน (ควรเป็น 0)
+        'students_checked_in': sum(1 for n in accepted.values() if n),
+        'double_accepted': sum(1 for n in accepted.values() if n > 1),
+        'error_rate': round(counts['error'] / total, 4) if total else 0.0,
+        'latency_ms': {
+            'p50': round(_percentile(latencies, 0.50), 1),
+            'p95': round(_percentile(latencies, 0.95), 1),
+            'p99': round(_percentile(latencies, 0.99), 1),
+            'max': round(latencies[-1], 1) if latencies else 0.0,
+        },
+        'response_time_ms': {
+            'p50': round(_percentile(response_times, 0.50), 1),
+            'p95': round(_percentile(response_times, 0.95), 1),
+            'p99': round(_percentile(response_times, 0.99), 1),
+        },
+        'queries_per_scan': {
+            'avg': round(sum(queries) / len(queries), 2) if queries else None,
+            'p95': _percentile(queries, 0.95) if queries else None,
+            'max': queries[-1] if queries else None,
+        },
+        'top_errors': dict(sorted(errors.items(), key=lambda item: item[1], reverse=True)[:5]),
+    }
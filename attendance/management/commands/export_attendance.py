@@ -0,0 +1,60 @@
+"""
+ส่งออกข้อมูลการเข้าเรียนลงไฟล์ (CSV / XLSX) นอก web worker - สำหรับ export ขนาดใหญ่
+เช่นทุกกลุ่มเรียนของภาคเรียน ซึ่งเกิน ATTENDANCE_EXPORT_XLSX_MAX_SECTIONS (ดู attendance/exports.py)
+
+    python manage.py export_attendance matrix --semester 3 -o attendance.xlsx
+    python manage.py export_attendance records --section 12 15 --start-date 2024-06-01 -o detail.csv
+"""
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from academic.models import Section
+from attendance import exports
+
+
+def _date(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Export attendance (matrix, records or leaves) to a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=exports.KINDS)
+        parser.add_argument('--semester', type=int, help='Semester id (all sections)')
+        parser.add_argument('--section', type=int, nargs='+', dest='sections', help='Section id(s)')
+        parser.add_argument('--start-date', type=_date)
+        parser.add_argument('--end-date', type=_date)
+        parser.add_argument('--student', type=int, help='Student user id (records/leaves)')
+        parser.add_argument('-o', '--output', required=True, help='Output file (.csv or .xlsx)')
+
+    def handle(self, *args, **options):
+        fmt = Path(options['output']).suffix.lstrip('.').lower()
+        if fmt not in exports.FORMATS:
+            raise CommandError(f'Output must end with one of: {", ".join(exports.FORMATS)}')
+
+        sections = Section.objects.select_related('course').order_by('course__course_code', 'section_number', 'id')
+        if options['sections']:
+            sections = sections.filter(id__in=options['sections'])
+        elif options['semester']:
+            sections = sections.filter(semester_id=options['semester'])
+        else:
+            raise CommandError('Specify --semester or --section')
+        sections = list(sections)
+        if not sections:
+            raise CommandError('No matching sections')
+
+        student_id = options['student'] if options['kind'] != 'matrix' else None
+        exports.write(
+            fmt,
+            exports.sheets(options['kind'], sections, options['start_date'], options['end_date'], student_id),
+            options['output'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {options["kind"]} for {len(sections)} section(s) to {options["output"]}'
+        ))
@@ -0,0 +1,31 @@
+"""
+Replay/flush journal ของ buffered ingestion ลง DB
+
+    python manage.py flush_attendance_journal            # replay ครั้งเดียว (เช่น หลัง restart)
+    python manage.py flush_attendance_journal --follow   # ทำงานต่อเนื่องเป็น consumer
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from attendance import ingest
+
+
+class Command(BaseCommand):
+    help = 'Write pending buffered attendance check-ins from the journal to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--follow', action='store_true', help='Keep running and replay new segments')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between replays with --follow')
+        parser.add_argument('--dir', help='Journal directory (default: ATTENDANCE_INGEST_JOURNAL_DIR)')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            segments, inserted = ingest.replay_pending(options['dir'])
+            if segments or not options['follow']:
+                self.stdout.write(f'Replayed {segments} segment(s), inserted {inserted} record(s)')
+            if not options['follow']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,108 @@
+"""
+Load test ของ scan_qr - จำลองการเช็คชื่อพร้อมกันทั้งวิทยาเขต (ดู attendance/loadtest.py)
+
+    python manage.py loadtest_checkin --sections 20 --students 60 --sessions 20 --concurrency 50
+    python manage.py loadtest_checkin --arrival herd --herd-window 5            # ทุกคนสแกนพร้อมกันตอนเริ่มคาบ
+    python manage.py loadtest_checkin --base-url http://localhost:8000          # ยิง HTTP ไปยัง server ที่รันอยู่
+    python manage.py loadtest_checkin --cleanup                                 # ลบข้อมูลทดสอบ
+
+สร้างข้อมูลทดสอบ (ชื่อผู้ใช้ขึ้นต้นด้วย loadtest_) ในฐานข้อมูลที่ตั้งค่าไว้ - ใช้กับฐานข้อมูล local เท่านั้น
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance import loadtest
+from attendance.models import AttendanceRecord
+
+
+class Command(BaseCommand):
+    help = 'Simulate a campus-wide QR check-in rush against scan_qr and report latency/throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sections', type=int, default=10, help='Number of sections to seed (N)')
+        parser.add_argument('--students', type=int, default=40, help='Students per section (M)')
+        parser.add_argument('--sessions', type=int, default=None, help='QR sessions to open (K, default N)')
+        parser.add_argument('--concurrency', type=int, default=20, help='Concurrent worker threads')
+        parser.add_argument('--arrival', choices=loadtest.ARRIVAL_CURVES, default='mixed', help='Arrival curve')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds over which scans arrive')
+        parser.add_argument('--herd-window', type=float, default=5.0, help='Seconds in which the class-start herd arrives')
+        parser.add_argument('--late-fraction', type=float, default=0.2, help='Share of late arrivals (mixed)')
+        parser.add_argument('--duplicate-rate', type=float, default=0.05, help='Share of students who scan twice')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the arrival schedule')
+        parser.add_argument('--base-url', help='Send real HTTP requests to this server instead of in-process')
+        parser.add_argument('--host', default='localhost', help='Host header for in-process requests')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        parser.add_argument('--cleanup', action='store_true', help='Delete all load test data and exit')
+        parser.add_argument('--force', action='store_true', help='Allow running with DEBUG=False')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('DEBUG=False - refusing to seed load test data (use --force on a disposable database)')
+
+        if options['cleanup']:
+            deleted = loadtest.cleanup()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} load test object(s)'))
+            return
+
+        sections = options['sections']
+        session_count = min(options['sessions'] or sections, sections)
+        self.stdout.write(f'Seeding {sections} section(s) x {options["students"]} student(s)...')
+        roster = loadtest.seed(sections, options['students'])
+        sessions = loadtest.open_sessions(roster, session_count)
+        student_ids = [sid for _, ids in sessions for sid in ids]
+        cookies = loadtest.login_cookies(student_ids)
+        scans = loadtest.build_schedule(
+            sessions,
+            curve=options['arrival'],
+            duration=options['duration'],
+            herd_window=options['herd_window'],
+            late_fraction=options['late_fraction'],
+            duplicate_rate=options['duplicate_rate'],
+            seed=options['seed'],
+        )
+
+        if options['base_url']:
+            transport = loadtest.HttpTransport(options['base_url'])
+        else:
+            transport = loadtest.InProcessTransport(options['host'])
+        self.stdout.write(
+            f'Firing {len(scans)} scan(s) at {session_count} session(s), '
+            f'{options["arrival"]} arrivals, concurrency {options["concurrency"]}...'
+        )
+        # 4xx ที่คาดไว้ (สแกนซ้ำ) ไม่ต้อง log ทีละบรรทัด - สรุปไว้ในรายงานแล้ว
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            results, wall_time = loadtest.run(scans, cookies, sessions, transport, options['concurrency'])
+        finally:
+            request_logger.setLevel(level)
+
+        result = loadtest.report(results, wall_time)
+        result['records_in_db'] = AttendanceRecord.objects.filter(
+            session_id__in=[session.id for session, _ in sessions],
+        ).count()
+        if options['json']:
+            self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+            return
+        self._print(result)
+
+    def _print(self, result):
+        latency, response_time, queries = result['latency_ms'], result['response_time_ms'], result['queries_per_scan']
+        lines = [
+            f"scans            {result['scans']} in {result['wall_time_s']} s  ({result['throughput_per_s']} scans/s)",
+            f"latency (ms)     p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}",
+            f"incl. queue (ms) p50 {response_time['p50']}  p95 {response_time['p95']}  p99 {response_time['p99']}",
+            f"outcomes         ok {result['ok']}  duplicate {result['duplicates']} ({result['duplicate_rate']:.2%})"
+            f"  error {result['errors']} ({result['error_rate']:.2%})",
+            f"checked in       {result['students_checked_in']} student(s), {result['records_in_db']} record(s) in DB,"
+            f" double-accepted {result['double_accepted']}",
+            f"queries/scan     avg {queries['avg']}  p95 {queries['p95']}  max {queries['max']}",
+        ]
+        for line in lines:
+            self.stdout.write(line)
+        for error, count in result['top_errors'].items():
+            self.stdout.write(self.style.WARNING(f'  {count} x {error}'))
@@ -0,0 +1,20 @@
+"""
+สร้างตาราง AttendanceSummary ใหม่จาก AttendanceRecord และ LeaveRequest
+
+    python manage.py rebuild_attendance_summary                  # ทุกกลุ่มเรียน
+    python manage.py rebuild_attendance_summary --section 12 15  # เฉพาะกลุ่มเรียนที่กำหนด
+"""
+from django.core.management.base import BaseCommand
+
+from attendance import summary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized attendance summary from attendance records and approved leaves'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--section', type=int, nargs='+', dest='sections', help='Section id(s) to rebuild')
+
+    def handle(self, *args, **options):
+        rows = summary.rebuild(options['sections'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} attendance summary row(s)'))
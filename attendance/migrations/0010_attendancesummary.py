@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_summary(apps, schema_editor):
+    """สร้าง summary จากข้อมูลเดิม (เหมือน rebuild_attendance_summary)"""
+    from django.db.models import Count, Max, Q
+
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    AttendanceSummary = apps.get_model('attendance', 'AttendanceSummary')
+    LeaveRequest = apps.get_model('attendance', 'LeaveRequest')
+
+    rows = {}
+    for row in AttendanceRecord.objects.order_by().values('session__section_id', 'student_id').annotate(
+        present_count=Count('id', filter=Q(status='present')),
+        late_count=Count('id', filter=Q(status='late')),
+        absent_count=Count('id', filter=Q(status='absent')),
+        excused_count=Count('id', filter=Q(status='excused')),
+        last_checked_in_at=Max('checked_in_at'),
+    ):
+        rows[(row.pop('session__section_id'), row.pop('student_id'))] = row
+    for row in LeaveRequest.objects.filter(status='approved').order_by().values('section_id', 'student_id').annotate(n=Count('id')):
+        rows.setdefault((row['section_id'], row['student_id']), {})['approved_leave_count'] = row['n']
+
+    AttendanceSummary.objects.bulk_create(
+        [AttendanceSummary(section_id=section_id, student_id=student_id, **values) for (section_id, student_id), values in rows.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0003_alter_enrollment_status'),
+        ('attendance', '0009_alter_leaverequest_leave_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('late_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('excused_count', models.PositiveIntegerField(default=0)),
+                ('approved_leave_count', models.PositiveIntegerField(default=0)),
+                ('last_checked_in_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='academic.section')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('section', 'student')},
+            },
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
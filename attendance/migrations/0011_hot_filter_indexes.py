@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0004_hot_filter_indexes'),
+        ('attendance', '0010_attendancesummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['session', 'status'], name='att_record_session_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student', '-checked_in_at'], name='att_record_student_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancesession',
+            index=models.Index(fields=['section', '-session_datetime'], name='att_session_section_dt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancesession',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['section', '-session_datetime'], name='att_session_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['section', 'status', '-created_at'], name='leave_section_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['section', '-created_at'], name='leave_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['student', '-created_at'], name='leave_student_created_idx'),
+        ),
+    ]
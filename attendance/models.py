@@ -24,6 +24,16 @@ class AttendanceSession(models.Model):
     
     class Meta:
         ordering = ['-session_datetime']
+        indexes = [
+            # เซสชันของกลุ่มเรียน เรียงจากล่าสุด (รายงาน, qr_display, หน้าแจ้งเตือน)
+            models.Index(fields=['section', '-session_datetime'], name='att_session_section_dt_idx'),
+            # เฉพาะเซสชันที่ยังเปิดเช็คชื่อ (partial index - เล็กกว่ามาก)
+            models.Index(
+                fields=['section', '-session_datetime'],
+                name='att_session_active_idx',
+                condition=models.Q(is_active=True),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.section.course.course_name} - {self.session_datetime}"
@@ -43,9 +53,10 @@ class AttendanceSession(models.Model):
         expiry = self.session_datetime + timedelta(minutes=self.duration_minutes)
         return tz.now() > expiry
     
-    def get_qr_code_data(self):
-        """Generate QR code data"""
-        return f"ATTENDANCE:{self.id}:{self.section.id}"
+    def get_qr_code_data(self, window=None):
+        """Generate QR code data (rotating signed token, see qr_tokens)"""
+        from .qr_tokens import issue
+        return issue(self.id, self.section_id, window)
     
     def save(self, *args, **kwargs):
         # Combine date and time into datetime
@@ -79,11 +90,40 @@ class AttendanceRecord(models.Model):
     class Meta:
         unique_together = ['session', 'student']
         ordering = ['-checked_in_at']
+        indexes = [
+            # นับ/กรองตามสถานะภายในเซสชัน
+            models.Index(fields=['session', 'status'], name='att_record_session_status_idx'),
+            # ประวัติการเช็คชื่อของนักศึกษา เรียงจากล่าสุด
+            models.Index(fields=['student', '-checked_in_at'], name='att_record_student_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.session} - {self.get_status_display()}"
 
 
+class AttendanceSummary(models.Model):
+    """
+    สรุปการเข้าเรียนต่อ (กลุ่มเรียน, นักศึกษา) สำหรับหน้ารายงาน
+    ปรับปรุงทีละรายการเมื่อมีการเช็คชื่อ/แก้สถานะ/อนุมัติการลา (ดู summary.py)
+    สร้างใหม่ทั้งหมดได้ด้วย `python manage.py rebuild_attendance_summary`
+    """
+    section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name='attendance_summaries')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_summaries')
+    present_count = models.PositiveIntegerField(default=0)
+    late_count = models.PositiveIntegerField(default=0)
+    absent_count = models.PositiveIntegerField(default=0)
+    excused_count = models.PositiveIntegerField(default=0)
+    approved_leave_count = models.PositiveIntegerField(default=0)
+    last_checked_in_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['section', 'student']
+    
+    def __str__(self):
+        return f"{self.student.username} - {self.section}"
+
+
 class LeaveRequest(models.Model):
     """
     Model for student leave requests
@@ -114,6 +154,18 @@ class LeaveRequest(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # รายการใบลาของกลุ่มเรียน (กรองสถานะ) เรียงจากใหม่ไปเก่า
+            models.Index(fields=['section', 'status', '-created_at'], name='leave_section_status_idx'),
+            # ใบลาที่รออนุมัติ (partial index)
+            models.Index(
+                fields=['section', '-created_at'],
+                name='leave_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+            # ใบลาของนักศึกษา เรียงจากใหม่ไปเก่า
+            models.Index(fields=['student', '-created_at'], name='leave_student_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.get_full_name()} - {self.leave_date} - {self.get_status_display()}"
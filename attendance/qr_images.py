@@ -0,0 +1,55 @@
+"""
+QR Code image rendering with an in-process LRU cache
+
+ภาพ QR ขึ้นกับข้อมูลใน QR และพารามิเตอร์การ render เท่านั้น
+จึง cache ไว้ด้วย key (data, format, box_size, border) และใช้ hash ของ key เป็น ETag
+
+ข้อมูลใน QR เปลี่ยนทุก window ของ qr_tokens (ATTENDANCE_QR_ROTATION_SECONDS) จึงไม่ render ล่วงหน้า
+ตอนสร้างเซสชัน - ภาพของแต่ละ window ถูก render เมื่อมีการขอครั้งแรก แล้วใช้ cache ตลอด window นั้น
+"""
+import hashlib
+from functools import lru_cache
+from io import BytesIO
+
+
+FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+DEFAULT_BOX_SIZE = 10
+DEFAULT_BORDER = 4
+
+
+def digest(data, fmt='png', box_size=DEFAULT_BOX_SIZE, border=DEFAULT_BORDER):
+    """Content address ของภาพ (ใช้เป็น ETag และ query string ของ URL)"""
+    key = f'{data}|{fmt}|{box_size}|{border}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+@lru_cache(maxsize=256)
+def render(data, fmt='png', box_size=DEFAULT_BOX_SIZE, border=DEFAULT_BORDER):
+    """Render QR Code เป็น bytes (PNG หรือ SVG)"""
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported QR image format: {fmt}')
+
+    # import เมื่อ render ครั้งแรก (qrcode โหลด PIL) - ไม่โหลดตอน start worker
+    import qrcode
+    import qrcode.image.svg
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+        image_factory=qrcode.image.svg.SvgPathImage if fmt == 'svg' else None,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    buffer = BytesIO()
+    if fmt == 'svg':
+        qr.make_image().save(buffer)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+    return buffer.getvalue()
@@ -0,0 +1,82 @@
+"""
+Rotating, HMAC-signed QR tokens
+
+รูปแบบ: ATTENDANCE:<session_id>:<section_id>:<window>:<signature>
+- window = เวลา (epoch) // ATTENDANCE_QR_ROTATION_SECONDS  → QR เปลี่ยนทุก N วินาที
+- signature = HMAC-SHA256 (SECRET_KEY) ของ session_id, section_id และ window
+
+scan_qr ตรวจสอบ token ได้โดยไม่ต้องใช้ DB หรือ cache
+token ที่ถ่ายรูปเก็บไว้จะใช้ได้ไม่เกิน (1 + ATTENDANCE_QR_GRACE_WINDOWS) window
+"""
+import time
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+
+PREFIX = 'ATTENDANCE'
+SALT = 'attendance.qr_tokens'
+SIGNATURE_LENGTH = 20
+
+
+def rotation_seconds():
+    return getattr(settings, 'ATTENDANCE_QR_ROTATION_SECONDS', 30)
+
+
+def grace_windows():
+    """จำนวน window ก่อนหน้าที่ยังยอมรับ (เผื่อเวลาสแกนและส่งข้อมูล)"""
+    return getattr(settings, 'ATTENDANCE_QR_GRACE_WINDOWS', 1)
+
+
+def _timestamp(now=None):
+    if now is None:
+        return time.time()
+    return now.timestamp() if hasattr(now, 'timestamp') else now
+
+
+def current_window(now=None):
+    return int(_timestamp(now) // rotation_seconds())
+
+
+def seconds_until_rotation(now=None):
+    """จำนวนวินาทีก่อน QR เปลี่ยนครั้งถัดไป"""
+    period = rotation_seconds()
+    return period - _timestamp(now) % period
+
+
+def signature(session_id, section_id, window):
+    value = f'{session_id}:{section_id}:{window}'
+    return salted_hmac(SALT, value, algorithm='sha256').hexdigest()[:SIGNATURE_LENGTH]
+
+
+def issue(session_id, section_id, window=None):
+    """สร้าง token ของ window ที่กำหนด (ค่าเริ่มต้น = window ปัจจุบัน)"""
+    if window is None:
+        window = current_window()
+    return f'{PREFIX}:{session_id}:{section_id}:{window}:{signature(session_id, section_id, window)}'
+
+
+def verify(token, session_id, now=None):
+    """
+    ตรวจสอบ token ของเซสชัน session_id (ไม่ใช้ DB)
+    คืนค่า section_id ถ้าถูกต้องและยังไม่หมด window มิฉะนั้นคืนค่า None
+    """
+    if not isinstance(token, str):
+        return None
+    parts = token.split(':')
+    if len(parts) != 5 or parts[0] != PREFIX:
+        return None
+    try:
+        token_session_id, section_id, window = int(parts[1]), int(parts[2]), int(parts[3])
+        if token_session_id != int(session_id):
+            return None
+    except (TypeError, ValueError):
+        return None
+
+    window_now = current_window(now)
+    if not window_now - grace_windows() <= window <= window_now:
+        return None
+
+    if not constant_time_compare(parts[4], signature(token_session_id, section_id, window)):
+        return None
+    return section_id
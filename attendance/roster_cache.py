@@ -0,0 +1,223 @@
+"""
+Roster and session cache for QR scan validation
+
+เก็บข้อมูลเซสชัน (section, เวลาเริ่ม, เวลาหมดอายุ QR) และรายชื่อนักศึกษา
+ที่ลงทะเบียนของแต่ละกลุ่มเรียนไว้ในหน่วยความจำ เพื่อให้ scan_qr
+ใช้ฐานข้อมูลเฉพาะตอนบันทึกเท่านั้น
+
+Backend ตั้งค่าได้ที่ settings.ATTENDANCE_ROSTER_CACHE_BACKEND:
+- 'django' : Django cache framework (settings.ATTENDANCE_ROSTER_CACHE_ALIAS) - ค่าเริ่มต้น
+  ใช้ร่วมกันได้ทุก worker เมื่อ CACHES เป็น Redis/Memcached
+- 'local'  : dict ในหน่วยความจำของแต่ละ process (การล้าง cache มีผลเฉพาะ process นั้น - ใช้กับ worker เดียว)
+
+ข้อมูลใน cache ใช้กรองการสแกนเท่านั้น checkin.insert_record ตรวจเซสชันที่ปิดแล้วและ
+นักศึกษาที่ถอนกับฐานข้อมูลอีกครั้งก่อนบันทึก
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from academic.models import Enrollment
+from .models import AttendanceSession
+
+
+# Entry จะถูกเก็บอย่างน้อยเท่านี้ แม้ QR หมดอายุแล้ว (สแกนหลังหมดอายุยังต้องบันทึก absent)
+MIN_TTL_SECONDS = 60
+
+# QR Code หมดอายุ 1 ชั่วโมงหลังสร้าง (เหมือน AttendanceSession.is_expired)
+QR_LIFETIME = timedelta(hours=1)
+
+
+class LocalMemoryBackend:
+    """Cache แบบ dict ในหน่วยความจำ พร้อม TTL"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (now + ttl, value)
+            # ล้าง entry ที่หมดอายุเป็นครั้งคราวไม่ให้ dict โตไม่สิ้นสุด
+            if len(self._data) > 1000:
+                for stale_key in [k for k, (exp, _) in self._data.items() if exp < now]:
+                    del self._data[stale_key]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoCacheBackend:
+    """Cache ผ่าน Django cache framework (ใช้ร่วมกันได้หลาย process ถ้าใช้ Redis/Memcached)"""
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, ttl):
+        self.cache.set(key, value, timeout=ttl)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def clear(self):
+        self.cache.clear()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """สร้าง backend ตาม settings (ครั้งเดียวต่อ process)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = getattr(settings, 'ATTENDANCE_ROSTER_CACHE_BACKEND', 'django')
+                if name == 'django':
+                    alias = getattr(settings, 'ATTENDANCE_ROSTER_CACHE_ALIAS', 'default')
+                    _backend = DjangoCacheBackend(alias)
+                elif name == 'local':
+                    _backend = LocalMemoryBackend()
+                else:
+                    raise ValueError(f'Unknown ATTENDANCE_ROSTER_CACHE_BACKEND: {name}')
+    return _backend
+
+
+def reset_backend():
+    """ล้าง backend (ใช้เมื่อเปลี่ยน settings เช่นใน test)"""
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+def _session_key(session_id):
+    return f'attendance:session:{session_id}'
+
+
+def _roster_key(section_id):
+    return f'attendance:roster:{section_id}'
+
+
+def _ttl_for(qr_expires_at):
+    """TTL ผูกกับเวลาหมดอายุของ QR (is_expired) แต่ไม่น้อยกว่า MIN_TTL_SECONDS"""
+    remaining = (qr_expires_at - timezone.now()).total_seconds() if qr_expires_at else 0
+    return int(max(remaining, MIN_TTL_SECONDS))
+
+
+def session_state(session):
+    """ข้อมูลเซสชันที่ scan_qr ต้องใช้ ในรูป dict ที่ cache ได้"""
+    session_start = session.session_datetime
+    if not session_start:
+        # Fallback: combine date and time if session_datetime is not set
+        session_start = timezone.make_aware(
+            timezone.datetime.combine(session.session_date, session.session_time)
+        )
+    return {
+        'id': session.id,
+        'section_id': session.section_id,
+        'teacher_id': session.teacher_id,
+        'is_active': session.is_active,
+        'session_start': session_start,
+        'qr_expires_at': session.created_at + QR_LIFETIME if session.created_at else None,
+    }
+
+
+def load_roster(section_id):
+    """รายชื่อ student id ที่สถานะ enrolled ในกลุ่มเรียน (frozenset)"""
+    return frozenset(Enrollment.objects.filter(
+        section_id=section_id,
+        status='enrolled',
+    ).values_list('student_id', flat=True))
+
+
+def warm(session):
+    """สร้าง cache ของเซสชันและ roster (เรียกตอน create_qr_session)"""
+    backend = get_backend()
+    state = session_state(session)
+    ttl = _ttl_for(state['qr_expires_at'])
+    backend.set(_session_key(session.id), state, ttl)
+    backend.set(_roster_key(session.section_id), load_roster(session.section_id), ttl)
+    return state
+
+
+def get_session(session_id):
+    """
+    คืนค่าข้อมูลเซสชันที่ active จาก cache (โหลดจาก DB ถ้าไม่มี)
+    คืนค่า None ถ้าไม่พบหรือไม่ active
+    """
+    backend = get_backend()
+    state = backend.get(_session_key(session_id))
+    if state is None:
+        session = AttendanceSession.objects.filter(id=session_id).first()
+        if session is None:
+            return None
+        state = session_state(session)
+        backend.set(_session_key(session_id), state, _ttl_for(state['qr_expires_at']))
+    return state if state['is_active'] else None
+
+
+def get_roster(section_id, ttl=MIN_TTL_SECONDS):
+    """คืนค่า frozenset ของ student id ที่ลงทะเบียน (โหลดจาก DB ถ้าไม่มีใน cache)"""
+    backend = get_backend()
+    roster = backend.get(_roster_key(section_id))
+    if roster is None:
+        roster = load_roster(section_id)
+        backend.set(_roster_key(section_id), roster, ttl)
+    return roster
+
+
+def is_enrolled(state, student_id):
+    """
+    ตรวจสอบการลงทะเบียนจาก roster ใน cache
+    ถ้าไม่พบใน roster จะตรวจซ้ำกับ DB อีกครั้ง (กรณีเพิ่งลงทะเบียนใน process อื่น)
+    - พบ: เพิ่ม id เข้า roster ใน cache (ไม่โหลด roster ทั้งกลุ่มใหม่)
+    - ไม่พบ: ไม่แตะ cache (นักศึกษาที่ไม่ได้ลงทะเบียนสแกนซ้ำ ๆ ไม่ทำให้ roster ถูกล้าง)
+    """
+    section_id = state['section_id']
+    ttl = _ttl_for(state['qr_expires_at'])
+    roster = get_roster(section_id, ttl)
+    if student_id in roster:
+        return True
+
+    if Enrollment.objects.filter(section_id=section_id, student_id=student_id, status='enrolled').exists():
+        get_backend().set(_roster_key(section_id), roster | {student_id}, ttl)
+        return True
+    return False
+
+
+def invalidate_section(section_id):
+    """ล้าง roster ของกลุ่มเรียน (เรียกเมื่อ Enrollment เปลี่ยน)"""
+    get_backend().delete(_roster_key(section_id))
+
+
+def invalidate_session(session_id):
+    """ล้างข้อมูลเซสชัน (เรียกเมื่อ AttendanceSession เปลี่ยนหรือถูกลบ)"""
+    get_backend().delete(_session_key(session_id))
@@ -0,0 +1,40 @@
+"""
+Signal handlers for attendance app
+- ล้าง roster_cache เมื่อข้อมูลการลงทะเบียนหรือเซสชันเปลี่ยน
+- refresh AttendanceSummary เมื่อ record/ใบลาถูกแก้ไขผ่าน ORM (scan_qr ปรับเองใน checkin.py)
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from academic.models import Enrollment
+from . import roster_cache, summary
+from .models import AttendanceRecord, AttendanceSession, LeaveRequest
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_roster_on_enrollment_change(sender, instance, **kwargs):
+    roster_cache.invalidate_section(instance.section_id)
+
+
+@receiver(post_save, sender=AttendanceSession)
+@receiver(post_delete, sender=AttendanceSession)
+def invalidate_session_on_change(sender, instance, **kwargs):
+    roster_cache.invalidate_session(instance.id)
+
+
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+def refresh_summary_on_record_change(sender, instance, **kwargs):
+    summary.schedule_refresh(session_id=instance.session_id, student_id=instance.student_id)
+
+
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+def refresh_summary_on_leave_change(sender, instance, **kwargs):
+    summary.schedule_refresh(instance.section_id, instance.student_id)
+
+
+@receiver(post_delete, sender=AttendanceSession)
+def refresh_summary_on_session_delete(sender, instance, **kwargs):
+    summary.schedule_refresh(instance.section_id)
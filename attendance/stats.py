@@ -0,0 +1,195 @@
+"""
+Attendance statistics engine (Process 8: รายงาน)
+
+คำนวณสถิติการเข้าเรียนรายนักศึกษาและรายกลุ่มเรียนของหลายกลุ่มเรียนพร้อมกัน
+ด้วย grouped aggregate query จำนวนคงที่ ไม่ขึ้นกับจำนวนนักศึกษาหรือกลุ่มเรียน:
+1. จำนวนเซสชันต่อกลุ่มเรียน
+2. จำนวน record แยกตามสถานะ ต่อ (กลุ่มเรียน, นักศึกษา)
+3. รายชื่อนักศึกษาที่ลงทะเบียน (พร้อม User)
+4. จำนวนนักศึกษาที่ลาได้รับอนุมัติต่อกลุ่มเรียน
+
+ถ้าไม่กรองช่วงวันที่ จะอ่านจาก AttendanceSummary (สรุปไว้ล่วงหน้า, ดู summary.py)
+แทนการนับจาก AttendanceRecord ทั้งหมด
+
+นิยาม: มาเรียน = present + late, ขาด = เซสชันที่ไม่ได้มาเรียนและไม่มีเหตุผล (excused)
+"""
+from dataclasses import dataclass, field
+
+from django.db.models import Count, Q
+
+from academic.models import Enrollment
+from .models import AttendanceSession, AttendanceRecord, AttendanceSummary, LeaveRequest
+
+
+@dataclass
+class StudentStats:
+    """สถิติของนักศึกษาหนึ่งคนในกลุ่มเรียนหนึ่ง"""
+    student: object
+    total_sessions: int = 0
+    present_count: int = 0
+    late_count: int = 0
+    excused_count: int = 0
+
+    @property
+    def total_attended(self):
+        return self.present_count + self.late_count
+
+    @property
+    def absent_count(self):
+        return max(self.total_sessions - self.total_attended - self.excused_count, 0)
+
+    @property
+    def attendance_rate(self):
+        return (self.total_attended / self.total_sessions * 100) if self.total_sessions > 0 else 0
+
+
+@dataclass
+class SectionStats:
+    """สถิติของกลุ่มเรียนหนึ่ง พร้อมรายนักศึกษา"""
+    section_id: int
+    total_sessions: int = 0
+    students_on_leave: int = 0
+    students: list = field(default_factory=list)
+
+    @property
+    def total_enrolled(self):
+        return len(self.students)
+
+    @property
+    def students_attended(self):
+        return sum(1 for s in self.students if s.total_attended > 0)
+
+    @property
+    def students_absent(self):
+        return sum(1 for s in self.students if s.total_attended == 0 and s.absent_count > 0)
+
+    @property
+    def summary_stats(self):
+        """ตัวเลขสำหรับกราฟสรุป (report.html / report_summary.html)"""
+        return {
+            'total_enrolled': self.total_enrolled,
+            'students_attended': self.students_attended,
+            'students_absent': self.students_absent,
+            'students_on_leave': self.students_on_leave,
+        }
+
+
+def sessions_in_range(section_ids, start_date=None, end_date=None):
+    """QuerySet ของเซสชันในกลุ่มเรียนและช่วงวันที่ที่กำหนด"""
+    sessions = AttendanceSession.objects.filter(section_id__in=section_ids)
+    if start_date:
+        sessions = sessions.filter(session_date__gte=start_date)
+    if end_date:
+        sessions = sessions.filter(session_date__lte=end_date)
+    return sessions
+
+
+def session_counts(section_ids, start_date=None, end_date=None):
+    """{section_id: จำนวนเซสชัน}"""
+    rows = sessions_in_range(section_ids, start_date, end_date).order_by().values('section_id').annotate(n=Count('id'))
+    return {row['section_id']: row['n'] for row in rows}
+
+
+def status_counts(section_ids, start_date=None, end_date=None, student_ids=None):
+    """{(section_id, student_id): {'present': n, 'late': n, 'excused': n}}"""
+    records = AttendanceRecord.objects.filter(session__section_id__in=section_ids)
+    if start_date:
+        records = records.filter(session__session_date__gte=start_date)
+    if end_date:
+        records = records.filter(session__session_date__lte=end_date)
+    if student_ids is not None:
+        records = records.filter(student_id__in=student_ids)
+
+    rows = records.order_by().values('session__section_id', 'student_id').annotate(
+        present=Count('id', filter=Q(status='present')),
+        late=Count('id', filter=Q(status='late')),
+        excused=Count('id', filter=Q(status='excused')),
+    )
+    return {(row['session__section_id'], row['student_id']): row for row in rows}
+
+
+def leave_counts(section_ids, start_date=None, end_date=None):
+    """{section_id: จำนวนนักศึกษาที่มีใบลาที่อนุมัติแล้ว}"""
+    leaves = LeaveRequest.objects.filter(section_id__in=section_ids, status='approved')
+    if start_date:
+        leaves = leaves.filter(leave_date__gte=start_date)
+    if end_date:
+        leaves = leaves.filter(leave_date__lte=end_date)
+    rows = leaves.order_by().values('section_id').annotate(n=Count('student_id', distinct=True))
+    return {row['section_id']: row['n'] for row in rows}
+
+
+def summary_counts(section_ids, student_ids=None):
+    """
+    เหมือน status_counts + leave_counts แต่อ่านจาก AttendanceSummary (ทุกช่วงเวลา)
+    คืนค่า (counts, leaves)
+    """
+    rows = AttendanceSummary.objects.filter(section_id__in=section_ids)
+    if student_ids is not None:
+        rows = rows.filter(student_id__in=student_ids)
+
+    counts = {}
+    leaves = {}
+    for row in rows.values('section_id', 'student_id', 'present_count', 'late_count', 'excused_count', 'approved_leave_count'):
+        counts[(row['section_id'], row['student_id'])] = {
+            'present': row['present_count'],
+            'late': row['late_count'],
+            'excused': row['excused_count'],
+        }
+        if row['approved_leave_count']:
+            leaves[row['section_id']] = leaves.get(row['section_id'], 0) + 1
+    return counts, leaves
+
+
+def student_stats(section_id, student, start_date=None, end_date=None):
+    """สถิติของนักศึกษาคนเดียวในกลุ่มเรียน (หน้า report ของนักศึกษา)"""
+    if start_date or end_date:
+        counts = status_counts([section_id], start_date, end_date, student_ids=[student.id])
+    else:
+        counts, _ = summary_counts([section_id], student_ids=[student.id])
+    counts = counts.get((section_id, student.id), {})
+    return StudentStats(
+        student=student,
+        total_sessions=session_counts([section_id], start_date, end_date).get(section_id, 0),
+        present_count=counts.get('present', 0),
+        late_count=counts.get('late', 0),
+        excused_count=counts.get('excused', 0),
+    )
+
+
+def section_stats(section_ids, start_date=None, end_date=None):
+    """
+    สถิติของหลายกลุ่มเรียน คืนค่า {section_id: SectionStats}
+    ใช้ query จำนวนคงที่ ไม่ว่าจะมีนักศึกษาหรือกลุ่มเรียนกี่กลุ่ม
+    """
+    section_ids = list(section_ids)
+    sessions = session_counts(section_ids, start_date, end_date)
+    if start_date or end_date:
+        counts = status_counts(section_ids, start_date, end_date)
+        leaves = leave_counts(section_ids, start_date, end_date)
+    else:
+        counts, leaves = summary_counts(section_ids)
+
+    result = {
+        section_id: SectionStats(
+            section_id=section_id,
+            total_sessions=sessions.get(section_id, 0),
+            students_on_leave=leaves.get(section_id, 0),
+        )
+        for section_id in section_ids
+    }
+
+    enrollments = Enrollment.objects.filter(
+        section_id__in=section_ids,
+        status='enrolled',
+    ).select_related('student').order_by('section_id', 'id')
+    for enrollment in enrollments:
+        row = counts.get((enrollment.section_id, enrollment.student_id), {})
+        result[enrollment.section_id].students.append(StudentStats(
+            student=enrollment.student,
+            total_sessions=sessions.get(enrollment.section_id, 0),
+            present_count=row.get('present', 0),
+            late_count=row.get('late', 0),
+            excused_count=row.get('excused', 0),
+        ))
+    return result
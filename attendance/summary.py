@@ -0,0 +1,214 @@
+"""
+Incremental maintenance of AttendanceSummary
+
+- record_created: เช็คชื่อใหม่จาก scan_qr (UPDATE ... SET <status>_count = <status>_count + 1)
+- refresh: คำนวณแถวของ (กลุ่มเรียน, นักศึกษา) ใหม่จาก AttendanceRecord/LeaveRequest
+  ใช้เมื่อสถานะถูกแก้ ใบลาถูกอนุมัติ record ถูกลบ หรือ ingest เขียนเป็นชุด
+- schedule_refresh: เลื่อน refresh ไปทำตอน commit และรวมรายการซ้ำ (ใช้จาก signals)
+- rebuild: สร้างตารางใหม่ทั้งหมด (คำสั่ง rebuild_attendance_summary)
+
+ทุกการเปลี่ยนแปลงส่ง signal summary_changed(section_ids) หลัง commit (teacher/signals.py ใช้ล้าง dashboard)
+- refresh: ส่งทันทีหลัง commit (อาจารย์แก้สถานะ/อนุมัติใบลา, ingest flush - หนึ่งครั้งต่อกลุ่มเรียนต่อ flush)
+- record_created: อยู่บน hot path ของ scan_qr จึงรวมกลุ่มเรียนที่มีการเช็คชื่อไว้ใน process แล้วส่งครั้งเดียว
+  ต่อกลุ่มเรียนทุก ATTENDANCE_SUMMARY_NOTIFY_INTERVAL วินาที (flush_checkins, 0 = ส่งทันที)
+"""
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import AttendanceRecord, AttendanceSession, AttendanceSummary, LeaveRequest
+
+
+COUNTED_STATUSES = ('present', 'late', 'absent', 'excused')
+
+# ส่งหลัง commit: section_ids = กลุ่มเรียนที่ summary เปลี่ยน
+summary_changed = Signal()
+
+
+def _send_changed(section_ids):
+    summary_changed.send(sender=AttendanceSummary, section_ids=frozenset(section_ids))
+
+
+def _notify(section_ids):
+    section_ids = frozenset(section_ids)
+    transaction.on_commit(lambda: _send_changed(section_ids))
+
+
+def notify_interval():
+    return getattr(settings, 'ATTENDANCE_SUMMARY_NOTIFY_INTERVAL', 2)
+
+
+# กลุ่มเรียนที่มีการเช็คชื่อตั้งแต่ flush_checkins ครั้งก่อน (ต่อ process)
+_checkins = set()
+_checkins_lock = threading.Lock()
+_checkins_timer = None
+
+
+def _note_checkin(section_id):
+    global _checkins_timer
+    interval = notify_interval()
+    if interval <= 0:
+        _send_changed([section_id])
+        return
+    with _checkins_lock:
+        _checkins.add(section_id)
+        if _checkins_timer is None:
+            _checkins_timer = threading.Timer(interval, flush_checkins)
+            _checkins_timer.daemon = True
+            _checkins_timer.start()
+
+
+def flush_checkins():
+    """ส่ง summary_changed ครั้งเดียวสำหรับทุกกลุ่มเรียนที่มีการเช็คชื่อ คืนค่าจำนวนกลุ่มเรียน"""
+    global _checkins_timer
+    with _checkins_lock:
+        section_ids = frozenset(_checkins)
+        _checkins.clear()
+        if _checkins_timer is not None:
+            _checkins_timer.cancel()
+            _checkins_timer = None
+    if section_ids:
+        _send_changed(section_ids)
+    return len(section_ids)
+
+
+def record_created(section_id, student_id, status, checked_in_at):
+    """เพิ่มตัวนับของ record ใหม่หนึ่งรายการ (ปกติใช้ UPDATE เดียว)"""
+    if status not in COUNTED_STATUSES:
+        return
+    transaction.on_commit(lambda: _note_checkin(section_id))
+    field = f'{status}_count'
+    updates = {
+        field: F(field) + 1,
+        'last_checked_in_at': Greatest(Coalesce('last_checked_in_at', Value(checked_in_at)), Value(checked_in_at)),
+        'updated_at': timezone.now(),
+    }
+    rows = AttendanceSummary.objects.filter(section_id=section_id, student_id=student_id)
+    if rows.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            AttendanceSummary.objects.create(
+                section_id=section_id,
+                student_id=student_id,
+                last_checked_in_at=checked_in_at,
+                **{field: 1},
+            )
+    except IntegrityError:
+        # อีก request สร้างแถวไปก่อนแล้ว
+        rows.update(**updates)
+
+
+def _aggregate_rows(section_ids, student_ids=None):
+    """คำนวณค่าของแถว summary จากข้อมูลจริง คืนค่า {(section_id, student_id): dict}"""
+    records = AttendanceRecord.objects.filter(session__section_id__in=section_ids)
+    leaves = LeaveRequest.objects.filter(section_id__in=section_ids, status='approved')
+    if student_ids is not None:
+        records = records.filter(student_id__in=student_ids)
+        leaves = leaves.filter(student_id__in=student_ids)
+
+    rows = defaultdict(dict)
+    for row in records.order_by().values('session__section_id', 'student_id').annotate(
+        last_checked_in_at=Max('checked_in_at'),
+        **{f'{status}_count': Count('id', filter=Q(status=status)) for status in COUNTED_STATUSES},
+    ):
+        key = (row.pop('session__section_id'), row.pop('student_id'))
+        rows[key].update(row)
+    for row in leaves.order_by().values('section_id', 'student_id').annotate(n=Count('id')):
+        rows[(row['section_id'], row['student_id'])]['approved_leave_count'] = row['n']
+    return rows
+
+
+def refresh(section_id, student_ids=None):
+    """
+    คำนวณแถว summary ของกลุ่มเรียนใหม่ (ทั้งกลุ่ม หรือเฉพาะ student_ids)
+    ใช้ query จำนวนคงที่: aggregate 2 ครั้ง + upsert + ลบแถวที่ไม่มีข้อมูลแล้ว
+    """
+    if student_ids is not None:
+        student_ids = list(student_ids)
+    _notify([section_id])
+    rows = _aggregate_rows([section_id], student_ids)
+    now = timezone.now()
+    summaries = [
+        AttendanceSummary(section_id=key[0], student_id=key[1], updated_at=now, **values)
+        for key, values in rows.items()
+    ]
+    fields = [f'{status}_count' for status in COUNTED_STATUSES] + ['approved_leave_count', 'last_checked_in_at', 'updated_at']
+
+    with transaction.atomic():
+        stale = AttendanceSummary.objects.filter(section_id=section_id)
+        if student_ids is not None:
+            stale = stale.filter(student_id__in=student_ids)
+        stale.exclude(student_id__in=[key[1] for key in rows]).delete()
+        if summaries:
+            AttendanceSummary.objects.bulk_create(
+                summaries,
+                update_conflicts=True,
+                unique_fields=['section', 'student'],
+                update_fields=fields,
+            )
+    return len(summaries)
+
+
+def rebuild(section_ids=None):
+    """สร้าง summary ใหม่ทั้งหมด (หรือเฉพาะกลุ่มเรียนที่กำหนด) คืนค่าจำนวนแถว"""
+    if section_ids is None:
+        section_ids = set(AttendanceSession.objects.values_list('section_id', flat=True).distinct())
+        section_ids |= set(LeaveRequest.objects.filter(status='approved').values_list('section_id', flat=True).distinct())
+        section_ids |= set(AttendanceSummary.objects.values_list('section_id', flat=True).distinct())
+    return sum(refresh(section_id) for section_id in sorted(section_ids))
+
+
+# Pending refreshes ของ transaction ปัจจุบัน (ต่อ thread)
+_pending = threading.local()
+
+
+def _pending_state():
+    if not hasattr(_pending, 'sections'):
+        _pending.sections = {}
+        _pending.records = set()
+    return _pending
+
+
+def schedule_refresh(section_id=None, student_id=None, session_id=None):
+    """
+    ขอ refresh หลัง commit (รวมรายการซ้ำใน transaction เดียวกันเป็น refresh เดียวต่อกลุ่มเรียน)
+    - section_id อย่างเดียว: ทั้งกลุ่มเรียน
+    - section_id + student_id: นักศึกษาคนเดียว
+    - session_id + student_id: ใช้จาก signal ของ AttendanceRecord (หา section ตอน flush)
+    """
+    state = _pending_state()
+    if section_id is None:
+        state.records.add((session_id, student_id))
+    elif student_id is None:
+        state.sections[section_id] = None
+    elif state.sections.get(section_id, ()) is not None:
+        state.sections.setdefault(section_id, set()).add(student_id)
+    transaction.on_commit(flush_pending)
+
+
+def flush_pending():
+    state = _pending_state()
+    sections, records = state.sections, state.records
+    if not sections and not records:
+        return
+    state.sections, state.records = {}, set()
+
+    if records:
+        session_sections = dict(AttendanceSession.objects.filter(
+            id__in={session_id for session_id, _ in records},
+        ).values_list('id', 'section_id'))
+        for session_id, student_id in records:
+            section_id = session_sections.get(session_id)
+            # เซสชันถูกลบไปแล้ว - signal ของเซสชันจะ refresh ทั้งกลุ่มเรียน
+            if section_id is not None and sections.get(section_id, ()) is not None:
+                sections.setdefault(section_id, set()).add(student_id)
+
+    for section_id, student_ids in sections.items():
+        refresh(section_id, student_ids)
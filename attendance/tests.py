@@ -1,4 +1,814 @@
-from django.test import TestCase
+"""
+Query-plan regression tests และ query budget ของหน้ารายงาน
 
-# Create your tests here.
+เรียก view ที่ถูกใช้บ่อย (scan_qr, attendance_report, student_notifications_view,
+leave_approval_list) กับข้อมูลตัวอย่าง เก็บ SELECT ทุกตัวที่ view ส่งไปยังฐานข้อมูล
+แล้วรัน EXPLAIN - ถ้ามี sequential scan บนตารางใดแสดงว่าขาด index (ดู Meta.indexes)
 
+- PostgreSQL: ปิด enable_seqscan ก่อน EXPLAIN (ข้อมูลทดสอบเล็ก planner จะเลือก seq scan
+  เสมอถ้าไม่ปิด) ถ้ายังเห็น "Seq Scan" แปลว่าไม่มี index ที่ใช้ได้จริง
+- SQLite: EXPLAIN QUERY PLAN ต้องไม่มี "SCAN <table>" ที่ไม่ได้ใช้ index
+"""
+import json
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User, UserProfile
+from academic import counters
+from academic.models import AcademicYear, Semester, Course, Section, Enrollment
+from checkin_project.testing import query_budget
+from .models import AttendanceSession, AttendanceRecord, AttendanceSummary, LeaveRequest
+
+
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)(?:\s+AS\s+\w+)?(?!.*\bUSING\b.*\bINDEX\b)'),
+}
+
+
+def explain(sql):
+    """คืนค่า query plan ของ SQL (ข้อความหลายบรรทัด)"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+        else:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+
+def sequential_scans(plan):
+    pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+    if pattern is None:
+        return []
+    return [
+        match.group(1)
+        for line in plan.splitlines()
+        for match in [pattern.search(line.strip())]
+        if match and match.group(1) != 'CONSTANT'
+    ]
+
+
+class SeededTestCase(TestCase):
+    """ข้อมูลตัวอย่าง: 3 กลุ่มเรียน (อาจารย์คนที่ 2 สอน 2 กลุ่ม) พร้อมเซสชัน การเช็คชื่อ และใบลา"""
+    STUDENTS_PER_SECTION = 30
+    SESSIONS_PER_SECTION = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        year = AcademicYear.objects.create(year='2568')
+        semester = Semester.objects.create(
+            academic_year=year, semester_number=1, start_date='2025-06-01', end_date='2025-09-30',
+        )
+        now = timezone.localtime()
+        cls.teacher = User.objects.create_user('teacher', password='pw', role='teacher')
+        cls.other_teacher = User.objects.create_user('teacher2', password='pw', role='teacher')
+
+        cls.sections = []
+        for i, teacher in enumerate([cls.teacher, cls.other_teacher, cls.other_teacher]):
+            course = Course.objects.create(course_code=f'CS10{i}', course_name=f'Course {i}', credit=3)
+            cls.sections.append(Section.objects.create(
+                course=course, semester=semester, section_number='1', teacher=teacher,
+            ))
+
+        students = User.objects.bulk_create([
+            User(username=f'student{i:03d}', password='!', role='student', first_name=f'S{i}')
+            for i in range(cls.STUDENTS_PER_SECTION * len(cls.sections))
+        ])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=student, student_id=f'68{i:05d}') for i, student in enumerate(students)
+        ])
+        cls.student = students[0]
+        cls.student.set_password('pw')
+        cls.student.save()
+
+        for n, section in enumerate(cls.sections):
+            members = students[n * cls.STUDENTS_PER_SECTION:(n + 1) * cls.STUDENTS_PER_SECTION]
+            if n == 1:
+                members.append(cls.student)
+            Enrollment.objects.bulk_create([
+                Enrollment(student=student, section=section, status='enrolled') for student in members
+            ])
+            sessions = [
+                AttendanceSession.objects.create(
+                    section=section, teacher=section.teacher,
+                    session_date=(now - timedelta(days=7 * k)).date(),
+                    session_time=now.time().replace(second=0, microsecond=0),
+                    is_active=(k == 0),
+                )
+                for k in range(cls.SESSIONS_PER_SECTION)
+            ]
+            AttendanceRecord.objects.bulk_create([
+                AttendanceRecord(session=session, student=student, status='present' if j % 4 else 'late')
+                for session in sessions[1:]
+                for j, student in enumerate(members)
+            ])
+            LeaveRequest.objects.bulk_create([
+                LeaveRequest(
+                    student=student, section=section, leave_date=now.date(), reason='-',
+                    status=['pending', 'approved', 'rejected'][j % 3],
+                )
+                for j, student in enumerate(members[:10])
+            ])
+        counters.reconcile()
+        cls.open_session = AttendanceSession.objects.get(section=cls.sections[0], is_active=True)
+
+
+class QueryPlanTests(SeededTestCase):
+
+    def assertNoSequentialScans(self, queries):
+        checked = 0
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            plan = explain(sql)
+            checked += 1
+            scans = sequential_scans(plan)
+            self.assertFalse(scans, f'sequential scan on {scans}\n{sql}\n{plan}')
+        self.assertGreater(checked, 0)
+
+    def capture(self, user, method, path, data=None):
+        client = Client()
+        client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            if method == 'post':
+                response = client.post(path, json.dumps(data), content_type='application/json')
+            else:
+                response = client.get(path, data)
+        self.assertLess(response.status_code, 400, response.content[:500])
+        return ctx.captured_queries
+
+    def test_scan_qr(self):
+        student = Enrollment.objects.filter(section=self.sections[0]).select_related('student').first().student
+        queries = self.capture(student, 'post', '/attendance/scan-qr/', {
+            'data': self.open_session.get_qr_code_data(),
+            'session_id': self.open_session.id,
+        })
+        self.assertNoSequentialScans(queries)
+
+    def test_attendance_report(self):
+        section_id = self.sections[0].id
+        self.assertNoSequentialScans(self.capture(self.teacher, 'get', '/attendance/report/', {'section_id': section_id}))
+        start = (timezone.localdate() - timedelta(days=14)).isoformat()
+        self.assertNoSequentialScans(self.capture(
+            self.teacher, 'get', '/attendance/report/', {'section_id': section_id, 'start_date': start},
+        ))
+
+    def test_student_notifications(self):
+        self.assertNoSequentialScans(self.capture(self.student, 'get', '/attendance/student/notifications/'))
+
+    def test_leave_approval_list(self):
+        self.assertNoSequentialScans(self.capture(self.teacher, 'get', '/attendance/leave-approval/'))
+        self.assertNoSequentialScans(self.capture(
+            self.teacher, 'get', '/attendance/leave-approval/', {'status': 'pending'},
+        ))
+
+
+class QueryBudgetTests(SeededTestCase):
+    """attendance_report ใช้ query จำนวนคงที่ ไม่ขึ้นกับจำนวนนักศึกษา เซสชัน หรือกลุ่มเรียน"""
+
+    def test_attendance_report(self):
+        client = Client()
+        client.force_login(self.other_teacher)
+        section_id = self.sections[1].id
+        with query_budget(7):
+            self.assertEqual(client.get('/attendance/report/', {'section_id': section_id}).status_code, 200)
+        start = (timezone.localdate() - timedelta(days=14)).isoformat()
+        with query_budget(8):
+            response = client.get('/attendance/report/', {'section_id': section_id, 'start_date': start})
+        self.assertEqual(len(response.context['student_stats']), self.STUDENTS_PER_SECTION + 1)
+
+
+class ExportTests(SeededTestCase):
+    """export แบบ streaming: CSV/XLSX ของตารางการเข้าเรียน รายละเอียดรายนักศึกษา และใบลา"""
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.other_teacher)
+
+    def csv_rows(self, response):
+        import csv
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(content.splitlines()))
+
+    def test_matrix_csv(self):
+        section = self.sections[1]
+        # session/user + กลุ่มเรียน + 4 query ต่อกลุ่มเรียน (เซสชัน วันลา record รายชื่อ)
+        with query_budget(7):
+            response = self.client.get('/attendance/export/matrix.csv', {'section_id': section.id})
+            rows = self.csv_rows(response)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        header, *students = rows
+        self.assertEqual(len(header), 2 + self.SESSIONS_PER_SECTION + 5)
+        self.assertEqual(len(students), self.STUDENTS_PER_SECTION + 1)
+        # เซสชันล่าสุด (เปิดอยู่) ยังไม่มี record = ขาดเรียน
+        self.assertEqual(students[0][2 + self.SESSIONS_PER_SECTION - 1], 'ขาดเรียน')
+        self.assertEqual(students[0][-1], str(round(5 / 6 * 100, 1)))
+
+    def test_matrix_xlsx_one_sheet_per_section(self):
+        from io import BytesIO
+        from openpyxl import load_workbook
+        response = self.client.get('/attendance/export/matrix.xlsx', {'semester_id': self.sections[1].semester_id})
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+        self.assertEqual(workbook.sheetnames, ['CS101 กลุ่ม 1', 'CS102 กลุ่ม 1'])
+        self.assertEqual(len(list(workbook.worksheets[0].rows)), self.STUDENTS_PER_SECTION + 2)
+
+    def test_records_and_leaves_for_student(self):
+        params = {'section_id': self.sections[1].id, 'student_id': self.student.id}
+        rows = self.csv_rows(self.client.get('/attendance/export/records.csv', params))
+        self.assertEqual(len(rows), 1 + self.SESSIONS_PER_SECTION)
+        self.assertEqual({row[2] for row in rows[1:]}, {'6800000'})
+        rows = self.csv_rows(self.client.get('/attendance/export/leaves.csv', {'section_id': self.sections[1].id}))
+        self.assertEqual(len(rows), 1 + 10)
+
+    def test_other_teachers_section_is_rejected(self):
+        response = self.client.get('/attendance/export/matrix.csv', {'section_id': self.sections[0].id})
+        self.assertRedirects(response, '/attendance/report/', fetch_redirect_response=False)
+        self.assertEqual(self.client.get('/attendance/export/matrix.pdf', {'section_id': self.sections[1].id}).status_code, 404)
+
+    def test_invalid_dates_rejected_before_streaming(self):
+        section_id = self.sections[1].id
+        for params in ({'start_date': '2024-13-01'}, {'end_date': 'yesterday'},
+                       {'start_date': '2024-06-02', 'end_date': '2024-06-01'}):
+            with self.subTest(params=params):
+                response = self.client.get('/attendance/export/records.csv', {'section_id': section_id, **params})
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.streaming)
+        response = self.client.get('/attendance/export/records.csv', {'section_id': section_id, 'start_date': 'None'})
+        self.assertEqual(len(self.csv_rows(response)), 1 + self.SESSIONS_PER_SECTION * (self.STUDENTS_PER_SECTION + 1))
+
+    @override_settings(ATTENDANCE_EXPORT_XLSX_MAX_SECTIONS=1)
+    def test_large_xlsx_export_offloaded(self):
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        from openpyxl import load_workbook
+
+        params = {'semester_id': self.sections[1].semester_id}
+        self.assertEqual(self.client.get('/attendance/export/matrix.xlsx', params).status_code, 400)
+        self.assertTrue(self.client.get('/attendance/export/matrix.csv', params).streaming)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'attendance.xlsx')
+            call_command('export_attendance', 'matrix', '--semester', str(self.sections[1].semester_id), '-o', path, stdout=StringIO())
+            self.assertEqual(len(load_workbook(path).sheetnames), 3)
+
+
+class StatsTests(TestCase):
+    """stats.py เทียบกับจำนวนที่นับด้วยมือ ทั้งจาก AttendanceSummary (ทุกช่วงเวลา) และจาก record (กรองวันที่)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from datetime import date, time
+        from . import summary
+
+        year = AcademicYear.objects.create(year='2568')
+        semester = Semester.objects.create(
+            academic_year=year, semester_number=1, start_date='2025-06-01', end_date='2025-09-30',
+        )
+        teacher = User.objects.create_user('teacher', password='pw', role='teacher')
+        course = Course.objects.create(course_code='CS300', course_name='Course', credit=3)
+        cls.section = Section.objects.create(course=course, semester=semester, section_number='1', teacher=teacher)
+        cls.students = [User.objects.create_user(f'student{i}', password='pw', role='student') for i in range(3)]
+        for student in cls.students:
+            Enrollment.objects.create(student=student, section=cls.section, status='enrolled')
+        withdrawn = User.objects.create_user('withdrawn', password='pw', role='student')
+        Enrollment.objects.create(student=withdrawn, section=cls.section, status='withdrawn')
+
+        cls.dates = [date(2025, 7, day) for day in (1, 8, 15, 22)]
+        sessions = [
+            AttendanceSession.objects.create(section=cls.section, teacher=teacher, session_date=day, session_time=time(9))
+            for day in cls.dates
+        ]
+        s0, s1, s2 = cls.students
+        for session, student, status in [
+            (sessions[0], s0, 'present'), (sessions[1], s0, 'late'), (sessions[2], s0, 'present'),
+            (sessions[0], s1, 'excused'), (sessions[1], s1, 'absent'),
+            (sessions[0], withdrawn, 'present'),
+        ]:
+            AttendanceRecord.objects.create(session=session, student=student, status=status)
+        for student, day, status in [(s1, cls.dates[0], 'approved'), (s0, cls.dates[3], 'approved'), (s2, cls.dates[2], 'pending')]:
+            LeaveRequest.objects.create(student=student, section=cls.section, leave_date=day, reason='-', status=status)
+        summary.rebuild()
+
+    def student_rows(self, section_stats):
+        return [
+            (s.student.username, s.total_sessions, s.present_count, s.late_count, s.excused_count,
+             s.total_attended, s.absent_count, s.attendance_rate)
+            for s in section_stats.students
+        ]
+
+    def test_all_time_from_summary(self):
+        from . import stats
+        result = stats.section_stats([self.section.id])[self.section.id]
+        self.assertEqual(self.student_rows(result), [
+            ('student0', 4, 2, 1, 0, 3, 1, 75.0),
+            ('student1', 4, 0, 0, 1, 0, 3, 0),
+            ('student2', 4, 0, 0, 0, 0, 4, 0),
+        ])
+        self.assertEqual(result.summary_stats, {
+            'total_enrolled': 3, 'students_attended': 1, 'students_absent': 2, 'students_on_leave': 2,
+        })
+        one = stats.student_stats(self.section.id, self.students[0])
+        self.assertEqual((one.total_sessions, one.present_count, one.late_count, one.attendance_rate), (4, 2, 1, 75.0))
+
+    def test_date_range_counts_records(self):
+        from . import stats
+        start, end = self.dates[1], self.dates[2]
+        result = stats.section_stats([self.section.id], start, end)[self.section.id]
+        self.assertEqual(self.student_rows(result), [
+            ('student0', 2, 1, 1, 0, 2, 0, 100.0),
+            ('student1', 2, 0, 0, 0, 0, 2, 0),
+            ('student2', 2, 0, 0, 0, 0, 2, 0),
+        ])
+        self.assertEqual(result.summary_stats, {
+            'total_enrolled': 3, 'students_attended': 1, 'students_absent': 2, 'students_on_leave': 0,
+        })
+        on_first_day = stats.section_stats([self.section.id], self.dates[0], self.dates[0])[self.section.id]
+        self.assertEqual(on_first_day.students_on_leave, 1)
+        one = stats.student_stats(self.section.id, self.students[1], end_date=self.dates[0])
+        self.assertEqual((one.total_sessions, one.excused_count, one.absent_count), (1, 1, 0))
+
+    def test_date_range_bypasses_summary(self):
+        from . import stats
+        AttendanceSummary.objects.filter(student=self.students[0]).update(present_count=99)
+
+        all_time = stats.section_stats([self.section.id])[self.section.id]
+        self.assertEqual(all_time.students[0].present_count, 99)   # อ่านจาก summary
+        ranged = stats.section_stats([self.section.id], self.dates[0], self.dates[3])[self.section.id]
+        self.assertEqual(ranged.students[0].present_count, 2)
+        self.assertEqual(stats.student_stats(self.section.id, self.students[0], start_date=self.dates[0]).present_count, 2)
+
+@override_settings(ATTENDANCE_QR_ROTATION_SECONDS=30, ATTENDANCE_QR_GRACE_WINDOWS=1)
+class QRTokenTests(SimpleTestCase):
+    """qr_tokens.verify: window ปัจจุบัน + grace เท่านั้น ลายเซ็นต้องตรงกับเซสชันและกลุ่มเรียน"""
+
+    NOW = 1_700_000_010.0  # window 56666667 (เริ่ม 1_700_000_010 พอดี)
+
+    def token(self, window_offset=0, session_id=7, section_id=3):
+        from . import qr_tokens
+        return qr_tokens.issue(session_id, section_id, qr_tokens.current_window(self.NOW) + window_offset)
+
+    def verify(self, token, session_id=7, now=None):
+        from . import qr_tokens
+        return qr_tokens.verify(token, session_id, now=self.NOW if now is None else now)
+
+    def test_current_and_grace_window(self):
+        self.assertEqual(self.verify(self.token()), 3)
+        self.assertEqual(self.verify(self.token(-1)), 3)
+        # ปลาย window ปัจจุบัน - token ของ window ก่อนหน้ายังใช้ได้
+        self.assertEqual(self.verify(self.token(-1), now=self.NOW + 29.9), 3)
+
+    def test_expired_and_future_windows(self):
+        self.assertIsNone(self.verify(self.token(-2)))
+        self.assertIsNone(self.verify(self.token(-1), now=self.NOW + 30))
+        self.assertIsNone(self.verify(self.token(1)))
+
+    @override_settings(ATTENDANCE_QR_GRACE_WINDOWS=0)
+    def test_no_grace(self):
+        self.assertEqual(self.verify(self.token()), 3)
+        self.assertIsNone(self.verify(self.token(-1)))
+
+    def test_forged_tokens(self):
+        prefix, session_id, section_id, window, sig = self.token().split(':')
+        forged = [
+            f'{prefix}:{session_id}:{section_id}:{window}:{"0" * len(sig)}',
+            f'{prefix}:{session_id}:4:{window}:{sig}',             # เปลี่ยนกลุ่มเรียน
+            f'{prefix}:{session_id}:{section_id}:{int(window) + 1}:{sig}',
+            f'{prefix}:{session_id}:{section_id}:{window}:{sig[:-1]}',
+            f'OTHER:{session_id}:{section_id}:{window}:{sig}',
+            f'{prefix}:{session_id}:{section_id}:{window}',
+            f'{prefix}:{session_id}:{section_id}:{window}:{sig}:extra',
+            f'{prefix}:x:{section_id}:{window}:{sig}',
+            '', None, 12345,
+        ]
+        for token in forged:
+            with self.subTest(token=token):
+                self.assertIsNone(self.verify(token))
+
+    def test_wrong_session(self):
+        self.assertIsNone(self.verify(self.token(session_id=8)))
+        self.assertIsNone(self.verify(self.token(), session_id=8))
+        self.assertEqual(self.verify(self.token(), session_id='7'), 3)
+
+
+class CheckInTestCase(TestCase):
+    """กลุ่มเรียนเดียว นักศึกษา 3 คน และเซสชันที่เปิดเช็คชื่ออยู่ (ใช้กับ check_in / ingest / qr_tokens)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        year = AcademicYear.objects.create(year='2568')
+        semester = Semester.objects.create(
+            academic_year=year, semester_number=1, start_date='2025-06-01', end_date='2025-09-30',
+        )
+        cls.teacher = User.objects.create_user('teacher', password='pw', role='teacher')
+        course = Course.objects.create(course_code='CS200', course_name='Course', credit=3)
+        cls.section = Section.objects.create(course=course, semester=semester, section_number='1', teacher=cls.teacher)
+        cls.students = [User.objects.create_user(f'student{i}', password='pw', role='student') for i in range(3)]
+        for student in cls.students:
+            Enrollment.objects.create(student=student, section=cls.section, status='enrolled')
+        cls.outsider = User.objects.create_user('outsider', password='pw', role='student')
+        now = timezone.localtime()
+        cls.session = AttendanceSession.objects.create(
+            section=cls.section, teacher=cls.teacher,
+            session_date=now.date(), session_time=now.time().replace(second=0, microsecond=0),
+        )
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import roster_cache
+        cache.clear()
+        roster_cache.reset_backend()
+
+
+class IngestTests(CheckInTestCase):
+    """buffered ingestion: journal, replay, retry หลัง flush ล้มเหลว และการสแกนซ้ำข้าม worker"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+        from . import ingest
+
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        settings_override = override_settings(ATTENDANCE_BUFFERED_INGESTION=True, ATTENDANCE_INGEST_JOURNAL_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.ingestor = self.new_ingestor()
+        ingest._ingestor = self.ingestor
+        self.addCleanup(setattr, ingest, '_ingestor', None)
+
+    def new_ingestor(self):
+        from . import ingest
+        ingestor = ingest.BufferedIngestor(self.directory, batch_size=500, flush_interval=60)
+        ingestor._ensure_thread = lambda: None
+        return ingestor
+
+    def entry(self, student, status='present'):
+        return {'session_id': self.session.id, 'student_id': student.id, 'status': status, 'checked_in_at': timezone.now()}
+
+    def segments(self):
+        import os
+        return sorted(os.listdir(self.directory))
+
+    def check_in(self, student):
+        from . import checkin
+        return checkin.check_in(self.session.id, self.session.get_qr_code_data(), student)
+
+    def test_write_records_is_idempotent(self):
+        from . import ingest
+        entries = [self.entry(student) for student in self.students]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(ingest.write_records(entries), 3)
+            self.assertEqual(ingest.write_records(entries), 0)
+        self.assertEqual(AttendanceRecord.objects.filter(session=self.session).count(), 3)
+
+    def test_journal_seal_and_replay(self):
+        from . import ingest
+        journal = ingest.Journal(self.directory)
+        for student in self.students[:2]:
+            journal.append(dict(self.entry(student), checked_in_at=timezone.now().isoformat()))
+        sealed = journal.seal()
+        with open(sealed, 'a', encoding='utf-8') as f:
+            f.write('{"session_id": ')  # บรรทัดที่เขียนไม่ครบตอน crash
+        with self.assertLogs('attendance.ingest', 'WARNING'):
+            self.assertEqual(len(ingest.read_segment(sealed)), 2)
+        with self.assertLogs('attendance.ingest', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(ingest.replay_pending(self.directory), (1, 2))
+        self.assertEqual(self.segments(), [])
+        self.assertEqual(ingest.replay_pending(self.directory), (0, 0))
+
+    def test_orphaned_open_segment_with_current_pid_is_replayed(self):
+        import json
+        import os
+        from . import ingest
+
+        # worker ที่ restart แล้วได้ pid เดิม (เช่น pid 1 ใน container): segment .open ของ process ก่อนไม่มีใครถือ lock
+        orphan = os.path.join(self.directory, f'journal-{os.getpid()}-1-1{ingest.OPEN_SUFFIX}')
+        with open(orphan, 'w', encoding='utf-8') as f:
+            for student in self.students[:2]:
+                f.write(json.dumps(self.entry(student), default=str) + '\n')
+        # segment ที่ Journal ของ process นี้กำลังเขียนอยู่ต้องไม่ถูก replay
+        live = ingest.Journal(self.directory)
+        live.append(dict(self.entry(self.students[2]), checked_in_at=timezone.now().isoformat()))
+        self.addCleanup(live.seal)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(ingest.replay_pending(self.directory), (1, 2))
+        self.assertEqual(len(self.segments()), 1)
+        self.assertEqual(
+            set(AttendanceRecord.objects.values_list('student_id', flat=True)), {s.id for s in self.students[:2]},
+        )
+
+    def test_failed_flush_is_retried(self):
+        from unittest import mock
+        from . import ingest
+
+        self.assertEqual(self.check_in(self.students[0]).outcome, 'created')
+        with self.assertLogs('attendance.ingest', 'ERROR'), \
+                mock.patch.object(ingest, 'write_records', side_effect=RuntimeError('database is down')):
+            self.assertEqual(self.ingestor.flush(), 0)
+        self.assertEqual(len(self.segments()), 1)
+        self.assertFalse(AttendanceRecord.objects.exists())
+        # ยังไม่ถึงเวลา backoff
+        self.assertEqual(self.ingestor.retry_sealed(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.ingestor.retry_sealed(force=True), 1)
+        self.assertEqual(self.segments(), [])
+        self.assertEqual(AttendanceRecord.objects.get().student, self.students[0])
+
+    def test_duplicate_of_database_record(self):
+        AttendanceRecord.objects.create(session=self.session, student=self.students[0], status='excused')
+        result = self.check_in(self.students[0])
+        self.assertEqual((result.outcome, result.status), ('duplicate', 'excused'))
+        self.assertEqual(self.segments(), [])
+
+    def test_duplicate_accepted_by_another_worker(self):
+        from . import ingest
+        self.assertEqual(self.check_in(self.students[0]).outcome, 'created')
+        ingest._ingestor = self.new_ingestor()
+        result = self.check_in(self.students[0])
+        self.assertEqual((result.outcome, result.status), ('duplicate', 'present'))
+
+
+class CheckInTests(CheckInTestCase):
+    """checkin.check_in: บันทึกครั้งเดียวต่อ (เซสชัน, นักศึกษา) และตอบสแกนซ้ำด้วยสถานะเดิม"""
+
+    def check_in(self, student, token=None, now=None):
+        from . import checkin
+        return checkin.check_in(self.session.id, token or self.session.get_qr_code_data(), student, now=now)
+
+    def test_created_then_duplicate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.check_in(self.students[0])
+        self.assertEqual((result.outcome, result.status), ('created', 'present'))
+        duplicate = self.check_in(self.students[0])
+        self.assertEqual((duplicate.outcome, duplicate.status, duplicate.record_id), ('duplicate', 'present', result.record_id))
+        self.assertEqual(AttendanceRecord.objects.filter(student=self.students[0]).count(), 1)
+
+    def test_duplicate_keeps_teacher_marked_status(self):
+        AttendanceRecord.objects.create(session=self.session, student=self.students[1], status='excused')
+        result = self.check_in(self.students[1])
+        self.assertEqual((result.outcome, result.status), ('duplicate', 'excused'))
+
+    def test_conflicting_record_deleted_before_read(self):
+        from unittest import mock
+        from . import checkin
+
+        # INSERT ชนกับ record ที่ถูกลบก่อน current_state() อ่าน - ลองบันทึกใหม่แทนการ error
+        with mock.patch.object(checkin, 'insert_record', side_effect=[None, 42]), \
+                mock.patch.object(checkin, 'summary'):
+            result = self.check_in(self.students[2])
+        self.assertEqual((result.outcome, result.record_id), ('created', 42))
+
+        # INSERT ครั้งที่สองชนกับสแกนพร้อมกันของนักศึกษาคนเดิม - DUPLICATE พร้อม record ที่มีอยู่
+        record = AttendanceRecord.objects.create(session=self.session, student=self.students[1], status='late')
+        with mock.patch.object(checkin, 'insert_record', return_value=None), \
+                mock.patch.object(checkin, 'current_state', side_effect=[
+                    {'is_active': True, 'enrolled': True, 'record_id': None, 'record_status': None},
+                    checkin.current_state(self.session.id, self.section.id, self.students[1].id),
+                ]):
+            result = self.check_in(self.students[1])
+        self.assertEqual((result.outcome, result.status, result.record_id), ('duplicate', 'late', record.id))
+
+        # เซสชันถูกปิดระหว่าง retry - ผลของ _rejected แทน
+        AttendanceSession.objects.filter(id=self.session.id).update(is_active=False)
+        with mock.patch.object(checkin, 'insert_record', return_value=None), \
+                mock.patch.object(checkin, 'current_state', side_effect=[
+                    {'is_active': True, 'enrolled': True, 'record_id': None, 'record_status': None},
+                    checkin.current_state(self.session.id, self.section.id, self.students[2].id),
+                ]):
+            self.assertEqual(self.check_in(self.students[2]).outcome, 'not_found')
+
+    def test_rejected_scans(self):
+        self.assertEqual(self.check_in(self.outsider).outcome, 'not_enrolled')
+        self.assertEqual(self.check_in(self.students[0], token='ATTENDANCE:1:2:3:forged').outcome, 'invalid_qr')
+        AttendanceSession.objects.filter(id=self.session.id).update(is_active=False)
+        from . import roster_cache
+        roster_cache.invalidate_session(self.session.id)
+        self.assertEqual(self.check_in(self.students[0]).outcome, 'not_found')
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_stale_cache_rechecked_against_database(self):
+        from . import roster_cache
+        self.assertIsNotNone(roster_cache.get_session(self.session.id))  # roster/เซสชันอยู่ใน cache แล้ว
+        self.assertIn(self.students[0].id, roster_cache.get_roster(self.section.id))
+        # ถอน/ปิดเซสชันจาก worker อื่น - cache ของ worker นี้ยังไม่รู้
+        Enrollment.objects.filter(student=self.students[0]).update(status='withdrawn')
+        self.assertEqual(self.check_in(self.students[0]).outcome, 'not_enrolled')
+        AttendanceSession.objects.filter(id=self.session.id).update(is_active=False)
+        self.assertEqual(self.check_in(self.students[1]).outcome, 'not_found')
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_roster_miss_does_not_evict(self):
+        from . import roster_cache
+        state = roster_cache.get_session(self.session.id)
+        roster_cache.get_roster(self.section.id)
+        late = User.objects.create_user('late', password='pw', role='student')
+        Enrollment.objects.create(student=late, section=self.section, status='enrolled')
+        with self.assertNumQueries(1):
+            self.assertTrue(roster_cache.is_enrolled(state, late.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(roster_cache.is_enrolled(state, late.id))
+        for _ in range(3):
+            with self.assertNumQueries(1):
+                self.assertFalse(roster_cache.is_enrolled(state, self.outsider.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(roster_cache.is_enrolled(state, self.students[2].id))
+
+
+class QRDisplayTests(CheckInTestCase):
+    """endpoint ของหน้า qr_display: qr_feed (record ใหม่หลัง cursor) และ qr_image (ETag/304)"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.teacher)
+
+    def feed(self, cursor=None, client=None):
+        params = {} if cursor is None else {'cursor': cursor}
+        return (client or self.client).get(f'/attendance/qr-display/{self.session.id}/feed/', params)
+
+    def test_feed_cursor_advances(self):
+        data = self.feed().json()
+        self.assertEqual((data['cursor'], data['records']), (0, []))
+        self.assertEqual(data['total_students'], 3)
+
+        first = AttendanceRecord.objects.create(session=self.session, student=self.students[0], status='present')
+        data = self.feed(0).json()
+        self.assertEqual(data['cursor'], first.id)
+        self.assertEqual([record['id'] for record in data['records']], [first.id])
+        self.assertEqual(data['present_count'], 1)
+
+        self.assertEqual(self.feed(data['cursor']).json()['records'], [])
+        second = AttendanceRecord.objects.create(session=self.session, student=self.students[1], status='late')
+        data = self.feed(data['cursor']).json()
+        self.assertEqual([(record['id'], record['status']) for record in data['records']], [(second.id, 'late')])
+        self.assertEqual(data['cursor'], second.id)
+        # cursor ที่อ่านไม่ได้ = โหลดใหม่ทั้งหมด
+        self.assertEqual(len(self.feed('garbage').json()['records']), 2)
+
+    def test_feed_returns_at_most_200_records(self):
+        students = User.objects.bulk_create([
+            User(username=f'bulk{i:03d}', password='!', role='student') for i in range(205)
+        ])
+        AttendanceRecord.objects.bulk_create([
+            AttendanceRecord(session=self.session, student=student, status='present') for student in students
+        ])
+        ids = list(AttendanceRecord.objects.filter(session=self.session).order_by('id').values_list('id', flat=True))
+
+        data = self.feed(0).json()
+        self.assertEqual([record['id'] for record in data['records']], ids[:200])
+        self.assertEqual(data['cursor'], ids[199])
+        self.assertEqual(data['present_count'], 205)
+        data = self.feed(data['cursor']).json()
+        self.assertEqual([record['id'] for record in data['records']], ids[200:])
+
+    def test_feed_only_for_session_teacher(self):
+        other_teacher = User.objects.create_user('teacher2', password='pw', role='teacher')
+        client = Client()
+        client.force_login(other_teacher)
+        self.assertEqual(self.feed(client=client).status_code, 404)
+        client.force_login(self.students[0])
+        self.assertEqual(self.feed(client=client).status_code, 302)
+        self.assertEqual(self.feed(client=Client()).status_code, 302)
+
+    def test_image_not_modified_until_window_changes(self):
+        from unittest import mock
+        from . import qr_tokens
+
+        url = f'/attendance/qr-image/{self.session.id}.png'
+        window = qr_tokens.current_window()
+        with mock.patch.object(qr_tokens, 'current_window', return_value=window):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'image/png')
+            self.assertEqual(response['Cache-Control'], 'private, no-cache')
+            etag = response['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual((response.status_code, response['ETag'], response.content), (304, etag, b''))
+
+        # token หมุน - ETag ใหม่ และ ETag เดิมไม่ได้ 304 อีก
+        with mock.patch.object(qr_tokens, 'current_window', return_value=window + 1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+            # window เดิมที่ระบุใน URL (ยังอยู่ใน grace) ยังได้ ETag เดิม และ cache ได้
+            response = self.client.get(url, {'w': window}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertIn('immutable', response['Cache-Control'])
+
+    def test_image_only_for_session_teacher(self):
+        client = Client()
+        client.force_login(User.objects.create_user('teacher2', password='pw', role='teacher'))
+        self.assertEqual(client.get(f'/attendance/qr-image/{self.session.id}.png').status_code, 404)
+        self.assertEqual(self.client.get(f'/attendance/qr-image/{self.session.id}.gif').status_code, 404)
+
+@override_settings(ATTENDANCE_SUMMARY_NOTIFY_INTERVAL=0)
+class SummaryTests(CheckInTestCase):
+    """AttendanceSummary ที่ปรับทีละรายการต้องเท่ากับ summary.rebuild() หลังทุกเส้นทางที่เขียนข้อมูล"""
+
+    def rows(self):
+        return sorted(AttendanceSummary.objects.values_list(
+            'student_id', 'present_count', 'late_count', 'absent_count', 'excused_count',
+            'approved_leave_count', 'last_checked_in_at',
+        ))
+
+    def assertMatchesRebuild(self):
+        from . import summary
+        incremental = self.rows()
+        summary.rebuild()
+        self.assertEqual(incremental, self.rows())
+        return incremental
+
+    def scan(self, student):
+        client = Client()
+        client.force_login(student)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(
+                '/attendance/scan-qr/',
+                data=json.dumps({'data': self.session.get_qr_code_data(), 'session_id': self.session.id}),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_scan_mark_status_and_leave_approval(self):
+        self.scan(self.students[0])
+        self.scan(self.students[1])
+        rows = self.assertMatchesRebuild()
+        self.assertEqual([row[1:6] for row in rows], [(1, 0, 0, 0, 0), (1, 0, 0, 0, 0)])
+
+        teacher = Client()
+        teacher.force_login(self.teacher)
+        record = AttendanceRecord.objects.get(session=self.session, student=self.students[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            teacher.post(f'/attendance/mark-status/{self.session.id}/', {'record_id': record.id, 'status': 'late'})
+        rows = self.assertMatchesRebuild()
+        self.assertEqual(rows[1][:3], (self.students[1].id, 0, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            leave = LeaveRequest.objects.create(
+                student=self.students[2], section=self.section, leave_date=timezone.localdate(), reason='-',
+            )
+        self.assertEqual(len(self.assertMatchesRebuild()), 2)   # ใบลาที่ยังไม่อนุมัติไม่นับ
+        with self.captureOnCommitCallbacks(execute=True):
+            teacher.post(f'/attendance/leave-approval/{leave.id}/', {'action': 'approve'})
+        rows = self.assertMatchesRebuild()
+        self.assertEqual(rows[2][:6], (self.students[2].id, 0, 0, 0, 0, 1))
+
+        # สแกนซ้ำไม่เปลี่ยน summary
+        client = Client()
+        client.force_login(self.students[0])
+        client.post(
+            '/attendance/scan-qr/',
+            data=json.dumps({'data': self.session.get_qr_code_data(), 'session_id': self.session.id}),
+            content_type='application/json',
+        )
+        self.assertEqual(self.assertMatchesRebuild(), rows)
+
+
+@override_settings(ATTENDANCE_SUMMARY_NOTIFY_INTERVAL=0)
+class LoadTestSmokeTests(TransactionTestCase):
+    """loadtest_checkin รันครบทุกขั้นกับฐานข้อมูลทดสอบ (worker threads ต้องเห็นข้อมูลที่ commit แล้ว)"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import roster_cache
+        cache.clear()
+        roster_cache.reset_backend()
+
+    def test_loadtest_checkin(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from . import loadtest
+
+        # SQLite ล็อกทั้งฐานข้อมูลตอนเขียน - ใช้ worker เดียว
+        concurrency = '1' if connection.vendor == 'sqlite' else '4'
+        out = StringIO()
+        call_command(
+            'loadtest_checkin', '--sections', '2', '--students', '4', '--concurrency', concurrency,
+            '--duration', '0.2', '--herd-window', '0.1', '--duplicate-rate', '0.5', '--json', '--force',
+            stdout=out,
+        )
+        result = json.loads(out.getvalue()[out.getvalue().index('{'):])
+        self.assertEqual(result['errors'], 0, result['top_errors'])
+        self.assertEqual(result['ok'], 8)
+        self.assertEqual(result['scans'], 8 + result['duplicates'])
+        self.assertEqual((result['students_checked_in'], result['records_in_db'], result['double_accepted']), (8, 8, 0))
+        self.assertIsNotNone(result['queries_per_scan']['max'])
+
+        # seed ซ้ำได้ และ cleanup ลบข้อมูลทดสอบทั้งหมด
+        self.assertEqual([len(ids) for _, ids in loadtest.seed(2, 4)], [4, 4])
+        call_command('loadtest_checkin', '--cleanup', '--force', stdout=StringIO())
+        self.assertFalse(User.objects.filter(username__startswith=f'{loadtest.PREFIX}_').exists())
+        self.assertFalse(AttendanceRecord.objects.exists())
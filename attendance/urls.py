@@ -9,9 +9,12 @@ app_name = 'attendance'
 urlpatterns = [
     path('create-qr/<int:section_id>/', views.create_qr_session, name='create_qr'),
     path('qr-display/<int:session_id>/', views.qr_display, name='qr_display'),
+    path('qr-image/<int:session_id>.<str:fmt>', views.qr_image, name='qr_image'),
+    path('qr-display/<int:session_id>/feed/', views.qr_feed, name='qr_feed'),
     path('scan/', views.scan_page, name='scan_page'),
     path('scan-qr/', views.scan_qr, name='scan_qr'),
     path('scan-success/<int:record_id>/', views.scan_success, name='scan_success'),
+    path('scan-accepted/<int:session_id>/', views.scan_accepted, name='scan_accepted'),
     path('scan-expired/<int:record_id>/', views.scan_expired, name='scan_expired'),
     path('upload-proof/<int:record_id>/', views.upload_proof, name='upload_proof'),
     path('mark-status/<int:session_id>/', views.mark_attendance_status, name='mark_status'),
@@ -20,6 +23,9 @@ urlpatterns = [
     path('notifications/', views.notifications_view, name='notifications'),
     path('leave-approval/', views.leave_approval_list, name='leave_approval_list'),
     path('leave-approval/<int:leave_id>/', views.leave_approval_detail, name='leave_approval_detail'),
+    path('export/matrix.<str:fmt>', views.export_matrix, name='export_matrix'),
+    path('export/records.<str:fmt>', views.export_records, name='export_records'),
+    path('export/leaves.<str:fmt>', views.export_leaves, name='export_leaves'),
     path('report-summary/', views.report_summary, name='report_summary'),
     # Student views
     path('student/notifications/', views.student_notifications_view, name='student_notifications'),
@@ -2,31 +2,24 @@
 Views for attendance app (P5, P6, P7, P8 - Attendance Management)
 """
 import json
-import qrcode
-from io import BytesIO
-import base64
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse, HttpResponseBadRequest
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.db.models import Q, Count, Sum
 from datetime import datetime, timedelta
 from .models import AttendanceSession, AttendanceRecord, LeaveRequest
+from . import checkin, exports, qr_images, qr_tokens, roster_cache, stats
 from academic.models import Section
+from accounts import authz
+from accounts.authz import is_student, is_teacher, is_teacher_or_admin
 from accounts.models import User
-
-
-def is_teacher(user):
-    """Check if user is teacher"""
-    return user.is_authenticated and user.is_teacher()
-
-
-def is_student(user):
-    """Check if user is student"""
-    return user.is_authenticated and user.is_student()
+from checkin_project.pagination import json_page, paginate_request, wants_json
 
 
 @login_required
@@ -63,6 +56,8 @@ def create_qr_session(request, section_id):
                     session_time=session_time,
                     duration_minutes=duration_minutes
                 )
+                # Pre-load session window and roster for scan_qr
+                roster_cache.warm(session)
                 messages.success(request, 'สร้าง QR Code สำเร็จ')
                 return redirect('attendance:qr_display', session_id=session.id)
             except Exception as e:
@@ -82,50 +77,139 @@ def qr_display(request, session_id):
     """
     หน้าแสดง QR Code สำหรับอาจารย์ (แสดงบนโปรเจคเตอร์)
     """
-    session = get_object_or_404(AttendanceSession, id=session_id, teacher=request.user)
+    session = get_object_or_404(AttendanceSession.objects.select_related('section'), id=session_id, teacher=request.user)
     
-    # Generate QR Code
-    qr_data = session.get_qr_code_data()
+    # QR image is served (and cached) by qr_image and rotates every ATTENDANCE_QR_ROTATION_SECONDS
+    window = qr_tokens.current_window()
+    qr_data = session.get_qr_code_data(window)
     qr_data_dict = {
         'session_id': session.id,
-        'section_id': session.section.id,
+        'section_id': session.section_id,
         'data': qr_data
     }
     
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    img_str = base64.b64encode(buffer.getvalue()).decode()
-    
-    # Get attendance statistics
+    # Get attendance statistics (later updates come from qr_feed)
     records = AttendanceRecord.objects.filter(session=session)
-    total_students = session.section.enrolled_count
-    present_count = records.filter(status='present').count()
-    late_count = records.filter(status='late').count()
-    absent_count = total_students - present_count - late_count
+    counters = session_counters(session)
     
     context = {
         'session': session,
-        'qr_image': img_str,
+        'qr_url': qr_image_url(session.id, window),
         'qr_data': qr_data_dict,
-        'total_students': total_students,
-        'present_count': present_count,
-        'late_count': late_count,
-        'absent_count': absent_count,
         'records': records,
+        **counters,
     }
     return render(request, 'attendance/qr_display.html', context)
 
 
+def qr_image_url(session_id, window, fmt='png'):
+    """URL ของภาพ QR ของ window ที่กำหนด (เปลี่ยนทุกครั้งที่ token หมุน)"""
+    return f"{reverse('attendance:qr_image', args=[session_id, fmt])}?w={window}"
+
+
+@login_required
+@user_passes_test(is_teacher)
+def qr_image(request, session_id, fmt):
+    """
+    ภาพ QR Code ของเซสชัน (PNG/SVG) พร้อม ETag และ Cache-Control
+    ภาพถูก cache ใน qr_images ตาม payload และพารามิเตอร์การ render
+    ?w=<window> ระบุ token ที่ต้องการ (ต้องยังไม่หมดอายุ) มิฉะนั้นใช้ window ปัจจุบัน
+    """
+    if fmt not in qr_images.FORMATS:
+        return HttpResponse(status=404)
+    
+    state = roster_cache.get_session(session_id)
+    if state is None or state['teacher_id'] != request.user.id:
+        return HttpResponse(status=404)
+    
+    current = qr_tokens.current_window()
+    try:
+        window = int(request.GET.get('w', ''))
+    except ValueError:
+        window = None
+    pinned = window is not None and current - qr_tokens.grace_windows() <= window <= current
+    if not pinned:
+        window = current
+    
+    data = qr_tokens.issue(state['id'], state['section_id'], window)
+    etag = f'"{qr_images.digest(data, fmt)}"'
+    
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(qr_images.render(data, fmt), content_type=qr_images.FORMATS[fmt])
+    response['ETag'] = etag
+    if pinned:
+        # URL ระบุ window แล้ว - เนื้อหาไม่เปลี่ยน แต่ไม่ต้องเก็บนานกว่าอายุ token
+        max_age = qr_tokens.rotation_seconds() * (qr_tokens.grace_windows() + 1)
+        response['Cache-Control'] = f'private, max-age={max_age}, immutable'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def session_counters(session):
+    """
+    ตัวเลขสรุปของเซสชัน (ทั้งหมด/มา/สาย/ขาด) ด้วย aggregate query เดียว
+    จำนวนนักศึกษาอ่านจากตัวนับ Section.enrolled_count (session ต้อง select_related('section'))
+    """
+    counts = AttendanceRecord.objects.filter(session=session).aggregate(
+        present_count=Count('id', filter=Q(status='present')),
+        late_count=Count('id', filter=Q(status='late')),
+    )
+    total_students = session.section.enrolled_count
+    return {
+        'total_students': total_students,
+        'present_count': counts['present_count'],
+        'late_count': counts['late_count'],
+        'absent_count': max(total_students - counts['present_count'] - counts['late_count'], 0),
+    }
+
+
+@login_required
+@user_passes_test(is_teacher)
+def qr_feed(request, session_id):
+    """
+    JSON feed สำหรับหน้า qr_display (แทนการ reload ทั้งหน้า)
+    ส่งเฉพาะการเช็คชื่อใหม่หลัง cursor (id ของ record ล่าสุดที่หน้าเว็บมีแล้ว) และตัวเลขสรุป
+    รวมถึง URL ของภาพ QR ปัจจุบัน (token หมุนตามเวลา)
+    """
+    session = get_object_or_404(
+        AttendanceSession.objects.select_related('section').only('id', 'teacher_id', 'section__enrolled_count'),
+        id=session_id,
+        teacher=request.user
+    )
+    
+    try:
+        cursor = int(request.GET.get('cursor', 0))
+    except ValueError:
+        cursor = 0
+    
+    new_records = list(AttendanceRecord.objects.filter(
+        session=session,
+        id__gt=cursor
+    ).order_by('id').values(
+        'id', 'status', 'checked_in_at',
+        'student__username', 'student__first_name', 'student__last_name',
+    )[:200])
+    
+    records = [{
+        'id': record['id'],
+        'status': record['status'],
+        'status_display': checkin.STATUS_DISPLAY.get(record['status'], record['status']),
+        'checked_in_at': timezone.localtime(record['checked_in_at']).strftime('%H:%M:%S') if record['checked_in_at'] else '',
+        'student_name': f"{record['student__first_name']} {record['student__last_name']}".strip() or record['student__username'],
+    } for record in new_records]
+    
+    return JsonResponse({
+        'cursor': new_records[-1]['id'] if new_records else cursor,
+        'records': records,
+        'qr_url': qr_image_url(session.id, qr_tokens.current_window()),
+        'qr_rotates_in': round(qr_tokens.seconds_until_rotation(), 1),
+        **session_counters(session),
+    })
+
+
 @login_required
 @user_passes_test(is_student)
 def scan_page(request):
@@ -176,135 +260,70 @@ def scan_qr(request):
         if not qr_data or not session_id:
             return JsonResponse({'success': False, 'message': 'ข้อมูลไม่ครบถ้วน'}, status=400)
         
-        # Find session
-        session = AttendanceSession.objects.filter(
-            id=session_id,
-            is_active=True
-        ).first()
+        # Session validation, enrollment check and idempotent insert (see checkin.py)
+        result = checkin.check_in(session_id, qr_data, request.user, proof_image=proof_image)
         
-        # Verify QR code data
-        if not session:
+        if result.outcome == checkin.NOT_FOUND:
             return JsonResponse({'success': False, 'message': 'QR Code ไม่ถูกต้องหรือหมดอายุ'}, status=404)
         
-        if session.get_qr_code_data() != qr_data:
+        if result.outcome == checkin.INVALID_QR:
             return JsonResponse({'success': False, 'message': 'QR Code ไม่ถูกต้อง'}, status=404)
         
-        # Check if QR code expired (1 hour from creation time)
-        # If expired, reject scanning and mark as absent without creating record
-        is_qr_expired = session.is_expired()
+        if result.outcome == checkin.NOT_ENROLLED:
+            return JsonResponse({'success': False, 'message': 'คุณไม่ได้ลงทะเบียนในกลุ่มเรียนนี้'}, status=403)
         
-        if is_qr_expired:
-            # QR code expired - cannot scan, mark as absent
-            # Check if student is enrolled first
-            from academic.models import Enrollment
-            enrollment = Enrollment.objects.filter(
-                student=request.user,
-                section=session.section,
-                status='enrolled'
-            ).first()
-            
-            if not enrollment:
-                return JsonResponse({'success': False, 'message': 'คุณไม่ได้ลงทะเบียนในกลุ่มเรียนนี้'}, status=403)
-            
-            # Check if already has a record
-            existing_record = AttendanceRecord.objects.filter(
-                session=session,
-                student=request.user
-            ).first()
-            
-            if existing_record:
+        if result.outcome == checkin.DUPLICATE:
+            return JsonResponse({
+                'success': False,
+                'message': f'คุณเช็คชื่อแล้ว (สถานะ: {result.status_display})'
+            }, status=400)
+        
+        if result.record_id is None:
+            # Buffered ingestion: accepted but not yet written to the database
+            accepted_url = reverse('attendance:scan_accepted', args=[session_id])
+            accepted_url = f'{accepted_url}?status={result.status}'
+            if request.content_type != 'application/json':
+                return redirect(accepted_url)
+            if result.expired:
                 return JsonResponse({
                     'success': False,
-                    'message': f'คุณเช็คชื่อแล้ว (สถานะ: {existing_record.get_status_display()})'
+                    'message': 'QR Code หมดเวลา (ถ่ายรูปไว้แล้วสแกนย้อนหลังไม่ได้)',
+                    'status': 'expired',
+                    'record_id': None
                 }, status=400)
-            
-            # Create absent record for expired QR code
-            record = AttendanceRecord.objects.create(
-                session=session,
-                student=request.user,
-                status='absent',
-                proof_image=proof_image
-            )
-            
+            return JsonResponse({
+                'success': True,
+                'message': f'เช็คชื่อสำเร็จ (สถานะ: {result.status_display})',
+                'status': result.status,
+                'record_id': None,
+                'redirect_url': accepted_url
+            })
+        
+        if result.expired:
+            # QR code expired (1 hour from creation) - recorded as absent
             if request.content_type == 'application/json':
                 return JsonResponse({
                     'success': False,
                     'message': 'QR Code หมดเวลา (ถ่ายรูปไว้แล้วสแกนย้อนหลังไม่ได้)',
                     'status': 'expired',
-                    'record_id': record.id
+                    'record_id': result.record_id
                 }, status=400)
             else:
-                return redirect('attendance:scan_expired', record_id=record.id)
-        
-        # Check if student is enrolled in this section
-        from academic.models import Enrollment
-        enrollment = Enrollment.objects.filter(
-            student=request.user,
-            section=session.section,
-            status='enrolled'
-        ).first()
-        
-        if not enrollment:
-            return JsonResponse({'success': False, 'message': 'คุณไม่ได้ลงทะเบียนในกลุ่มเรียนนี้'}, status=403)
-        
-        # Check if already scanned
-        existing_record = AttendanceRecord.objects.filter(
-            session=session,
-            student=request.user
-        ).first()
-        
-        if existing_record:
-            return JsonResponse({
-                'success': False,
-                'message': f'คุณเช็คชื่อแล้ว (สถานะ: {existing_record.get_status_display()})'
-            }, status=400)
-        
-        # Determine status (present, late, or absent) based on session time
-        # Get session datetime
-        if not session.session_datetime:
-            # Fallback: combine date and time if session_datetime is not set
-            session_datetime = timezone.datetime.combine(session.session_date, session.session_time)
-            session_datetime = timezone.make_aware(session_datetime)
-        else:
-            session_datetime = session.session_datetime
-        
-        current_time = timezone.now()
-        late_threshold = session_datetime + timedelta(minutes=15)  # 15 minutes
-        absent_threshold = session_datetime + timedelta(hours=1)  # 1 hour
-        
-        # Determine status based on time (QR code is still valid, check session time)
-        if current_time > absent_threshold:
-            # If scanned after 1 hour from session time, mark as absent
-            status = 'absent'
-        elif current_time > late_threshold:
-            # If scanned after 15 minutes but before 1 hour, mark as late
-            status = 'late'
-        else:
-            # If scanned within 15 minutes, mark as present
-            status = 'present'
-        
-        # Create attendance record
-        record = AttendanceRecord.objects.create(
-            session=session,
-            student=request.user,
-            status=status,
-            proof_image=proof_image
-        )
+                return redirect('attendance:scan_expired', record_id=result.record_id)
         
         # If request is JSON, return JSON response
         if request.content_type == 'application/json':
-            message = f'เช็คชื่อสำเร็จ (สถานะ: {record.get_status_display()})'
+            message = f'เช็คชื่อสำเร็จ (สถานะ: {result.status_display})'
             return JsonResponse({
                 'success': True,
                 'message': message,
-                'status': record.status,
-                'record_id': record.id,
-                'redirect_url': f'/attendance/scan-success/{record.id}/'
+                'status': result.status,
+                'record_id': result.record_id,
+                'redirect_url': f'/attendance/scan-success/{result.record_id}/'
             })
         else:
             # Form submission - redirect to success page
-            from django.shortcuts import redirect
-            return redirect('attendance:scan_success', record_id=record.id)
+            return redirect('attendance:scan_success', record_id=result.record_id)
     
     except json.JSONDecodeError:
         return JsonResponse({'success': False, 'message': 'ข้อมูลไม่ถูกต้อง'}, status=400)
@@ -326,12 +345,9 @@ def scan_expired(request, record_id):
     record = get_object_or_404(AttendanceRecord, id=record_id, student=request.user)
     session = record.session
     
-    # Get student ID
-    student_id = "-"
-    if hasattr(request.user, 'student_profile') and request.user.student_profile:
-        student_id = request.user.student_profile.student_id
-    elif hasattr(request.user, 'student_id'):
-        student_id = request.user.student_id
+    # Get student ID (read-only profile, cached on request.user)
+    profile = request.user.student_profile
+    student_id = profile.student_id if profile and profile.student_id else "-"
     
     context = {
         'record': record,
@@ -350,12 +366,9 @@ def scan_success(request, record_id):
     record = get_object_or_404(AttendanceRecord, id=record_id, student=request.user)
     session = record.session
     
-    # Get student ID
-    student_id = "-"
-    if hasattr(request.user, 'student_profile') and request.user.student_profile:
-        student_id = request.user.student_profile.student_id
-    elif hasattr(request.user, 'student_id'):
-        student_id = request.user.student_id
+    # Get student ID (read-only profile, cached on request.user)
+    profile = request.user.student_profile
+    student_id = profile.student_id if profile and profile.student_id else "-"
     
     # Format check-in time
     check_time = record.checked_in_at
@@ -372,6 +385,38 @@ def scan_success(request, record_id):
     return render(request, 'attendance/scan_success.html', context)
 
 
+@login_required
+@user_passes_test(is_student)
+def scan_accepted(request, session_id):
+    """
+    หน้าแสดงผลการเช็คชื่อที่ระบบรับไว้แล้วแต่ยังไม่ได้บันทึกลง DB (โหมด buffered ingestion)
+    ถ้าบันทึกแล้วจะ redirect ไปหน้า scan_success
+    """
+    record = AttendanceRecord.objects.filter(session_id=session_id, student=request.user).first()
+    if record:
+        return redirect('attendance:scan_success', record_id=record.id)
+    
+    session = get_object_or_404(AttendanceSession.objects.select_related('section__course'), id=session_id)
+    status = request.GET.get('status')
+    if status not in checkin.STATUS_DISPLAY:
+        status = None
+    # Unsaved record for display only
+    record = AttendanceRecord(session=session, student=request.user, status=status)
+    
+    # Get student ID (read-only profile, cached on request.user)
+    profile = request.user.student_profile
+    student_id = profile.student_id if profile and profile.student_id else "-"
+    
+    context = {
+        'record': record,
+        'session': session,
+        'student_id': student_id,
+        'check_time': timezone.now(),
+        'status_display': checkin.STATUS_DISPLAY.get(status, '-'),
+    }
+    return render(request, 'attendance/scan_success.html', context)
+
+
 @login_required
 @user_passes_test(is_student)
 def upload_proof(request, record_id):
@@ -417,7 +462,7 @@ def mark_attendance_status(request, session_id):
         
         return redirect('attendance:mark_status', session_id=session_id)
     
-    records = AttendanceRecord.objects.filter(session=session).select_related('student')
+    records = AttendanceRecord.objects.filter(session=session).select_related('student', 'student__profile')
     context = {
         'session': session,
         'records': records,
@@ -433,16 +478,9 @@ def attendance_report(request):
     """
     context = {}
     
-    if request.user.is_admin():
-        # Admin can see all reports
-        sections = Section.objects.all()
-    elif request.user.is_teacher():
-        # Teacher can see their sections
-        sections = Section.objects.filter(teacher=request.user)
-    else:
-        # Student can see their enrollments
-        from academic.models import Enrollment
-        sections = Section.objects.filter(enrollments__student=request.user).distinct()
+    # Admin เห็นทุกกลุ่มเรียน, อาจารย์เห็นกลุ่มที่สอน, นักศึกษาเห็นกลุ่มที่ลงทะเบียน (see accounts/authz.py)
+    # ชื่อกลุ่มเรียนใน dropdown ใช้ course/semester/academic_year
+    sections = authz.access(request).sections().select_related('course', 'semester__academic_year')
     
     # Get filter parameters
     section_id = request.GET.get('section_id')
@@ -456,81 +494,35 @@ def attendance_report(request):
         end_date = None
     
     if section_id:
-        section = get_object_or_404(Section, id=section_id)
-        sessions = AttendanceSession.objects.filter(section=section)
-        
-        if start_date:
-            sessions = sessions.filter(session_date__gte=start_date)
-        if end_date:
-            sessions = sessions.filter(session_date__lte=end_date)
-        
-        # Calculate statistics
-        total_sessions = sessions.count()
-        records = AttendanceRecord.objects.filter(session__in=sessions)
+        section = get_object_or_404(sections, id=section_id)
+        sessions = stats.sessions_in_range([section.id], start_date, end_date)
         
         if request.user.is_student():
             # Student view: their own attendance
-            records = records.filter(student=request.user)
-            total_attended = records.count()
-            present_count = records.filter(status='present').count()
-            late_count = records.filter(status='late').count()
-            absent_count = total_sessions - total_attended
+            student_stats = stats.student_stats(section.id, request.user, start_date, end_date)
+            records = AttendanceRecord.objects.filter(session__in=sessions, student=request.user).select_related('session')
             
             context.update({
                 'section': section,
-                'total_sessions': total_sessions,
-                'total_attended': total_attended,
-                'present_count': present_count,
-                'late_count': late_count,
-                'absent_count': absent_count,
-                'attendance_rate': (total_attended / total_sessions * 100) if total_sessions > 0 else 0,
+                'total_sessions': student_stats.total_sessions,
+                'total_attended': student_stats.total_attended,
+                'present_count': student_stats.present_count,
+                'late_count': student_stats.late_count,
+                'excused_count': student_stats.excused_count,
+                'absent_count': student_stats.absent_count,
+                'attendance_rate': student_stats.attendance_rate,
                 'records': records.order_by('-session__session_date', '-session__session_time'),
             })
         else:
-            # Admin/Teacher view: all students
-            from academic.models import Enrollment
-            enrolled_students = Enrollment.objects.filter(section=section, status='enrolled').values_list('student_id', flat=True)
-            
-            student_stats = []
-            for student_id in enrolled_students:
-                student = request.user.__class__.objects.get(id=student_id)
-                student_records = records.filter(student=student)
-                student_stats.append({
-                    'student': student,
-                    'total_attended': student_records.count(),
-                    'present_count': student_records.filter(status='present').count(),
-                    'late_count': student_records.filter(status='late').count(),
-                    'absent_count': total_sessions - student_records.count(),
-                    'attendance_rate': (student_records.count() / total_sessions * 100) if total_sessions > 0 else 0,
-                })
-            
-            # Calculate summary statistics for chart
-            total_enrolled = len(enrolled_students)
-            students_attended = len([s for s in student_stats if s['total_attended'] > 0])
-            students_absent = len([s for s in student_stats if s['absent_count'] > 0 and s['total_attended'] == 0])
-            # Count students with leave requests that are approved
-            from .models import LeaveRequest
-            leave_filter = LeaveRequest.objects.filter(
-                section=section,
-                status='approved'
-            )
-            if start_date:
-                leave_filter = leave_filter.filter(leave_date__gte=start_date)
-            if end_date:
-                leave_filter = leave_filter.filter(leave_date__lte=end_date)
-            approved_leaves = leave_filter.values_list('student_id', flat=True).distinct().count()
+            # Admin/Teacher view: all students (grouped aggregates, see stats.py)
+            section_stats = stats.section_stats([section.id], start_date, end_date)[section.id]
             
             context.update({
                 'section': section,
-                'total_sessions': total_sessions,
-                'student_stats': student_stats,
+                'total_sessions': section_stats.total_sessions,
+                'student_stats': section_stats.students,
                 'sessions': sessions.order_by('-session_date', '-session_time'),
-                'summary_stats': {
-                    'total_enrolled': total_enrolled,
-                    'students_attended': students_attended,
-                    'students_absent': students_absent,
-                    'students_on_leave': approved_leaves,
-                }
+                'summary_stats': section_stats.summary_stats,
             })
     
     context.update({
@@ -544,16 +536,16 @@ def attendance_report(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.is_teacher() or u.is_admin())
+@user_passes_test(is_teacher_or_admin)
 def student_attendance_detail(request, section_id, student_id):
     """
     หน้ารายละเอียดการเข้าเรียนของนักศึกษาแต่ละคน
     """
     section = get_object_or_404(Section, id=section_id)
-    student = get_object_or_404(User, id=student_id)
+    student = get_object_or_404(User.objects.select_related('profile'), id=student_id)
     
-    # Check permissions
-    if request.user.is_teacher() and section.teacher != request.user:
+    # Check permissions (เทียบ section.teacher_id ไม่โหลด section.teacher)
+    if not authz.access(request).can_manage(section):
         messages.error(request, 'คุณไม่มีสิทธิ์เข้าถึงหน้านี้')
         return redirect('attendance:report')
     
@@ -591,17 +583,12 @@ def student_attendance_detail(request, section_id, student_id):
         record = records_dict.get(session.id)
         session_records.append((session, record))
     
-    # Calculate statistics
-    total_sessions = all_sessions.count()
-    total_attended = records.count()
-    present_count = records.filter(status='present').count()
-    late_count = records.filter(status='late').count()
-    absent_count = total_sessions - total_attended
+    # Calculate statistics (same definitions as the section report)
+    student_stats = stats.student_stats(section.id, student, start_date, end_date)
     
     # Get student ID
-    student_id_display = "-"
-    if hasattr(student, 'student_profile') and student.student_profile:
-        student_id_display = student.student_profile.student_id
+    profile = student.student_profile
+    student_id_display = profile.student_id if profile and profile.student_id else "-"
     
     context = {
         'section': section,
@@ -610,12 +597,13 @@ def student_attendance_detail(request, section_id, student_id):
         'records': records,
         'session_records': session_records,
         'all_sessions': all_sessions,
-        'total_sessions': total_sessions,
-        'total_attended': total_attended,
-        'present_count': present_count,
-        'late_count': late_count,
-        'absent_count': absent_count,
-        'attendance_rate': (total_attended / total_sessions * 100) if total_sessions > 0 else 0,
+        'total_sessions': student_stats.total_sessions,
+        'total_attended': student_stats.total_attended,
+        'present_count': student_stats.present_count,
+        'late_count': student_stats.late_count,
+        'excused_count': student_stats.excused_count,
+        'absent_count': student_stats.absent_count,
+        'attendance_rate': student_stats.attendance_rate,
         'start_date': start_date,
         'end_date': end_date,
     }
@@ -623,6 +611,95 @@ def student_attendance_detail(request, section_id, student_id):
     return render(request, 'attendance/student_detail.html', context)
 
 
+def _export_date(value):
+    """วันที่จาก query string (YYYY-MM-DD) - raise ValueError ถ้ารูปแบบผิด"""
+    if value in (None, '', 'None'):
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+def _export_params(request, fmt):
+    """
+    พารามิเตอร์ของ export: section_id (ระบุได้หลายค่า) หรือ semester_id, start_date, end_date, student_id
+    คืนค่า (sections, start_date, end_date, student_id) หรือ HttpResponse ถ้าไม่มีสิทธิ์/พารามิเตอร์ไม่ถูกต้อง
+    ตรวจทุกอย่างก่อนเริ่มส่งข้อมูล - error ระหว่าง streaming จะทำให้ไฟล์ขาดกลางทางแทนที่จะได้ 400
+    """
+    if fmt not in exports.FORMATS:
+        raise Http404
+
+    sections = authz.access(request).sections().select_related('course').order_by(
+        'course__course_code', 'section_number', 'id',
+    )
+
+    section_ids = {int(value) for value in request.GET.getlist('section_id') if value.isdigit()}
+    semester_id = request.GET.get('semester_id')
+    if section_ids:
+        sections = list(sections.filter(id__in=section_ids))
+        if len(sections) != len(section_ids):
+            messages.error(request, 'คุณไม่มีสิทธิ์เข้าถึงหน้านี้')
+            return redirect('attendance:report')
+    elif semester_id and semester_id.isdigit():
+        sections = list(sections.filter(semester_id=semester_id))
+    else:
+        raise Http404
+
+    try:
+        start_date = _export_date(request.GET.get('start_date'))
+        end_date = _export_date(request.GET.get('end_date'))
+    except ValueError:
+        return HttpResponseBadRequest('รูปแบบวันที่ไม่ถูกต้อง (YYYY-MM-DD)')
+    if start_date and end_date and start_date > end_date:
+        return HttpResponseBadRequest('วันที่เริ่มต้นต้องไม่อยู่หลังวันที่สิ้นสุด')
+
+    # XLSX ต้องสร้างทั้งไฟล์ก่อนส่ง - export ขนาดใหญ่ใช้ CSV (streaming) หรือ manage.py export_attendance
+    if fmt == 'xlsx' and len(sections) > exports.xlsx_max_sections():
+        return HttpResponseBadRequest(
+            f'ส่งออก Excel ได้ครั้งละไม่เกิน {exports.xlsx_max_sections()} กลุ่มเรียน กรุณาใช้ CSV'
+        )
+
+    student_id = request.GET.get('student_id')
+    student_id = int(student_id) if student_id and student_id.isdigit() else None
+    return sections, start_date, end_date, student_id
+
+
+def _export(request, kind, fmt, prefix):
+    params = _export_params(request, fmt)
+    if isinstance(params, HttpResponse):
+        return params
+    sections, start_date, end_date, student_id = params
+    if kind == 'matrix':
+        student_id = None
+    return exports.response(
+        fmt,
+        exports.sheets(kind, sections, start_date, end_date, student_id),
+        exports.filename(prefix, sections, fmt),
+    )
+
+
+@login_required
+@user_passes_test(is_teacher_or_admin)
+def export_matrix(request, fmt):
+    """ส่งออกตารางการเข้าเรียน (นักศึกษา × เซสชัน) หนึ่ง sheet ต่อกลุ่มเรียน"""
+    return _export(request, 'matrix', fmt, 'attendance')
+
+
+@login_required
+@user_passes_test(is_teacher_or_admin)
+def export_records(request, fmt):
+    """ส่งออกรายละเอียดการเข้าเรียนรายนักศึกษา (หนึ่งแถวต่อนักศึกษาต่อเซสชัน)"""
+    return _export(request, 'records', fmt, 'attendance_detail')
+
+
+@login_required
+@user_passes_test(is_teacher_or_admin)
+def export_leaves(request, fmt):
+    """ส่งออกประวัติใบลา"""
+    return _export(request, 'leaves', fmt, 'leave_history')
+
+
 @login_required
 def report_summary(request):
     """
@@ -630,13 +707,7 @@ def report_summary(request):
     """
     context = {}
     
-    if request.user.is_admin():
-        sections = Section.objects.all()
-    elif request.user.is_teacher():
-        sections = Section.objects.filter(teacher=request.user)
-    else:
-        from academic.models import Enrollment
-        sections = Section.objects.filter(enrollments__student=request.user).distinct()
+    sections = authz.access(request).sections()
     
     # Get filter parameters
     section_id = request.GET.get('section_id')
@@ -650,62 +721,16 @@ def report_summary(request):
         end_date = None
     
     if section_id:
-        section = get_object_or_404(Section, id=section_id)
-        sessions = AttendanceSession.objects.filter(section=section)
-        
-        if start_date:
-            sessions = sessions.filter(session_date__gte=start_date)
-        if end_date:
-            sessions = sessions.filter(session_date__lte=end_date)
-        
-        # Calculate statistics
-        total_sessions = sessions.count()
-        records = AttendanceRecord.objects.filter(session__in=sessions)
+        section = get_object_or_404(sections, id=section_id)
         
         if not request.user.is_student():
-            # Admin/Teacher view: summary statistics
-            from academic.models import Enrollment
-            enrolled_students = Enrollment.objects.filter(section=section, status='enrolled').values_list('student_id', flat=True)
-            
-            # Calculate summary statistics for chart
-            total_enrolled = len(enrolled_students)
-            student_stats = []
-            for student_id in enrolled_students:
-                student = request.user.__class__.objects.get(id=student_id)
-                student_records = records.filter(student=student)
-                student_stats.append({
-                    'student': student,
-                    'total_attended': student_records.count(),
-                    'present_count': student_records.filter(status='present').count(),
-                    'late_count': student_records.filter(status='late').count(),
-                    'absent_count': total_sessions - student_records.count(),
-                    'attendance_rate': (student_records.count() / total_sessions * 100) if total_sessions > 0 else 0,
-                })
-            
-            students_attended = len([s for s in student_stats if s['total_attended'] > 0])
-            students_absent = len([s for s in student_stats if s['absent_count'] > 0 and s['total_attended'] == 0])
-            
-            # Count students with leave requests that are approved
-            from .models import LeaveRequest
-            leave_filter = LeaveRequest.objects.filter(
-                section=section,
-                status='approved'
-            )
-            if start_date:
-                leave_filter = leave_filter.filter(leave_date__gte=start_date)
-            if end_date:
-                leave_filter = leave_filter.filter(leave_date__lte=end_date)
-            approved_leaves = leave_filter.values_list('student_id', flat=True).distinct().count()
+            # Admin/Teacher view: summary statistics (grouped aggregates, see stats.py)
+            section_stats = stats.section_stats([section.id], start_date, end_date)[section.id]
             
             context.update({
                 'section': section,
-                'total_sessions': total_sessions,
-                'summary_stats': {
-                    'total_enrolled': total_enrolled,
-                    'students_attended': students_attended,
-                    'students_absent': students_absent,
-                    'students_on_leave': approved_leaves,
-                }
+                'total_sessions': section_stats.total_sessions,
+                'summary_stats': section_stats.summary_stats,
             })
     
     context.update({
@@ -719,29 +744,32 @@ def report_summary(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.is_teacher() or u.is_admin())
+@user_passes_test(is_teacher_or_admin)
 def notifications_view(request):
     """
     หน้าสำหรับ Teacher/Admin ดูการแจ้งเตือน (ดูได้อย่างเดียว)
     """
     # Get all sections - Admin sees all, Teacher sees only their sections
-    if request.user.is_admin():
-        sections = Section.objects.all()
-        leave_requests = LeaveRequest.objects.all()
-        recent_sessions = AttendanceSession.objects.all()
-    else:
-        sections = Section.objects.filter(teacher=request.user)
-        leave_requests = LeaveRequest.objects.filter(section__in=sections)
-        recent_sessions = AttendanceSession.objects.filter(section__in=sections)
+    access = authz.access(request)
+    sections = access.sections()
+    leave_requests = access.scope(LeaveRequest.objects.all())
+    recent_sessions = access.scope(AttendanceSession.objects.all())
     
-    # Get all leave requests (for viewing only)
-    leave_requests = leave_requests.select_related('student', 'section', 'section__course').order_by('-created_at')
+    # Leave requests (for viewing only) - ทีละหน้า เรียงจากใหม่ไปเก่า
+    leave_requests = paginate_request(
+        request,
+        leave_requests.select_related('student', 'student__profile__student_major', 'section', 'section__course'),
+        ['-created_at', '-id'],
+        per_page=10,
+    )
+    if wants_json(request):
+        return json_page(leave_requests, _leave_request_json)
     
     # Get recent attendance records that might need attention
     from datetime import datetime, timedelta
     recent_sessions = recent_sessions.filter(
         session_datetime__gte=timezone.now() - timedelta(days=7)
-    ).order_by('-session_datetime')
+    ).select_related('section', 'section__course').order_by('-session_datetime')[:10]
     
     context = {
         'leave_requests': leave_requests,
@@ -751,22 +779,34 @@ def notifications_view(request):
     return render(request, 'attendance/notifications.html', context)
 
 
+def _leave_request_json(leave):
+    """LeaveRequest หนึ่งรายการสำหรับ ?format=json ของหน้ารายการใบลา"""
+    profile = getattr(leave.student, 'profile', None)
+    return {
+        'id': leave.id,
+        'student': leave.student.get_full_name() or leave.student.username,
+        'student_id': profile.student_id if profile else None,
+        'course_code': leave.section.course.course_code,
+        'course_name': leave.section.course.course_name,
+        'leave_date': leave.leave_date.isoformat(),
+        'status': leave.status,
+        'status_display': leave.get_status_display(),
+        'created_at': leave.created_at.isoformat(),
+    }
+
+
 @login_required
-@user_passes_test(lambda u: u.is_teacher() or u.is_admin())
+@user_passes_test(is_teacher_or_admin)
 def leave_approval_list(request):
     """
     หน้าสำหรับ Teacher/Admin ดูรายการการแจ้งลาที่รออนุมัติ
     """
     # Get all sections - Admin sees all, Teacher sees only their sections
-    if request.user.is_admin():
-        sections = Section.objects.all()
-        leave_requests = LeaveRequest.objects.all()
-    else:
-        sections = Section.objects.filter(teacher=request.user)
-        leave_requests = LeaveRequest.objects.filter(section__in=sections)
+    access = authz.access(request)
+    sections = access.sections()
+    leave_requests = access.scope(LeaveRequest.objects.all())
     
-    # Get leave requests
-    leave_requests = leave_requests.select_related('student', 'section', 'section__course', 'teacher').order_by('-created_at')
+    leave_requests = leave_requests.select_related('student', 'student__profile__student_major', 'section', 'section__course', 'teacher')
     
     # Filter by status if provided
     status_filter = request.GET.get('status', 'all')
@@ -778,6 +818,11 @@ def leave_approval_list(request):
     if section_filter and request.user.is_admin():
         leave_requests = leave_requests.filter(section_id=section_filter)
     
+    # Keyset pagination เรียงจากใหม่ไปเก่า
+    leave_requests = paginate_request(request, leave_requests, ['-created_at', '-id'])
+    if wants_json(request):
+        return json_page(leave_requests, _leave_request_json)
+    
     context = {
         'leave_requests': leave_requests,
         'status_filter': status_filter,
@@ -788,20 +833,16 @@ def leave_approval_list(request):
 
 
 @login_required
-@user_passes_test(lambda u: u.is_teacher() or u.is_admin())
+@user_passes_test(is_teacher_or_admin)
 def leave_approval_detail(request, leave_id):
     """
     หน้าสำหรับ Teacher ดูรายละเอียดและอนุมัติ/ไม่อนุมัติการลา
     """
     # Admin can approve any leave request, Teacher can only approve their sections
-    if request.user.is_admin():
-        leave_request = get_object_or_404(LeaveRequest, id=leave_id)
-    else:
-        leave_request = get_object_or_404(
-            LeaveRequest, 
-            id=leave_id,
-            section__teacher=request.user
-        )
+    leave_request = get_object_or_404(
+        authz.access(request).scope(LeaveRequest.objects.select_related('student__profile')),
+        id=leave_id,
+    )
     
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -834,8 +875,7 @@ def student_notifications_view(request):
     """
     # Get student's enrolled sections
     from academic.models import Enrollment
-    enrollments = Enrollment.objects.filter(student=request.user, status='enrolled')
-    sections = [e.section for e in enrollments]
+    section_ids = Enrollment.objects.filter(student=request.user, status='enrolled').values('section_id')
     
     # Get leave requests for this student
     leave_requests = LeaveRequest.objects.filter(
@@ -844,10 +884,10 @@ def student_notifications_view(request):
     
     # Get upcoming attendance sessions (next 7 days)
     upcoming_sessions = AttendanceSession.objects.filter(
-        section__in=sections,
+        section_id__in=section_ids,
         session_datetime__gte=timezone.now(),
         session_datetime__lte=timezone.now() + timedelta(days=7)
-    ).order_by('session_datetime')[:10]
+    ).select_related('section', 'section__course').order_by('session_datetime')[:10]
     
     # Get recent attendance records
     try:
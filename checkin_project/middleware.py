@@ -1,10 +1,21 @@
 """
-Custom middleware for adding cache headers and fixing content-type
+Custom middleware for adding cache headers and fixing content-type,
+and per-view profiling (Server-Timing)
 """
+from contextlib import ExitStack
+import json
+import logging
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
 import os
 
+from . import profiling
+
+
+profile_logger = logging.getLogger('checkin_project.profiling')
+
 
 class StaticFilesCacheMiddleware(MiddlewareMixin):
     """
@@ -46,3 +57,41 @@ class StaticFilesCacheMiddleware(MiddlewareMixin):
         
         return response
 
+
+
+class ProfilingMiddleware:
+    """
+    วัดจำนวน query, เวลา DB, เวลา render template และเวลา Python ของแต่ละ view
+    - ส่งเป็น Server-Timing header (ดูได้ใน DevTools > Network > Timing)
+    - log หนึ่งบรรทัดต่อ request เป็น JSON ที่ logger 'checkin_project.profiling'
+    - เก็บสถิติย้อนหลังต่อ URL name (ดูที่ /admin/profiling/)
+    เปิดด้วย PROFILING_ENABLED=True (ปิดเป็นค่าเริ่มต้น)
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        profiling.install_template_timer()
+
+    def __call__(self, request):
+        profile = profiling.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profiling.query_timer))
+                response = self.get_response(request)
+        finally:
+            profiling.stop()
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        profiling.record(view_name, profile)
+        response['Server-Timing'] = profile.server_timing()
+        profile_logger.info(json.dumps({
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **profile.as_dict(),
+        }, ensure_ascii=False))
+        return response
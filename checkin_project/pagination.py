@@ -0,0 +1,234 @@
+"""
+Keyset (seek) pagination สำหรับหน้ารายการขนาดใหญ่
+
+แทน OFFSET/LIMIT (ซึ่งช้าลงตามเลขหน้าและต้อง COUNT ทั้งตาราง) ด้วยการจำค่าคีย์เรียงลำดับ
+ของแถวสุดท้ายไว้ใน cursor แล้วดึงหน้าถัดไปด้วย WHERE (key) > (last key) LIMIT n
+ทุกหน้าจึงใช้เวลาและหน่วยความจำเท่ากัน ไม่ว่าตารางจะใหญ่แค่ไหน
+
+- ordering ต้องเรียงได้แบบคงที่: ถ้าฟิลด์สุดท้ายไม่ใช่ pk จะเติม id ต่อท้ายให้อัตโนมัติ
+  และฟิลด์ใน ordering ต้องไม่เป็น NULL
+- cursor = base64url(JSON) ของค่าคีย์ + ลำดับแถวแรกของหน้า (ใช้แสดงเลขลำดับในตาราง)
+  ค่าใน cursor ถูกตรวจด้วย field ของ model ก่อน query (cursor ที่ถูกแก้จะไม่ทำให้ query error)
+- ?format=json คืนผลแบบ {results, next_cursor} สำหรับ infinite scroll
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.http import JsonResponse
+
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class KeysetPage:
+    """ผลลัพธ์หนึ่งหน้า (iterate ได้เหมือน list)"""
+    object_list: list = field(default_factory=list)
+    per_page: int = DEFAULT_PER_PAGE
+    offset: int = 0  # จำนวนแถวก่อนหน้านี้ (สำหรับเลขลำดับ)
+    next_cursor: str = None
+    next_url: str = None
+    first_url: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.offset > 0
+
+    @property
+    def start_index(self):
+        return self.offset + 1 if self.object_list else 0
+
+    @property
+    def end_index(self):
+        return self.offset + len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def stable_ordering(ordering):
+    """เติม id ต่อท้าย (ทิศทางเดียวกับฟิลด์สุดท้าย) ถ้ายังไม่มีคีย์ที่ไม่ซ้ำ"""
+    ordering = list(ordering)
+    if not ordering:
+        return ['id']
+    if ordering[-1].lstrip('-') not in ('id', 'pk'):
+        ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+    return ordering
+
+
+def _json_default(value):
+    # ใช้ isoformat เต็มความละเอียด (DjangoJSONEncoder ตัด microsecond ซึ่งทำให้ข้ามแถวได้)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values, offset=0):
+    payload = json.dumps({'k': values, 'o': offset}, default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, key_count):
+    """คืนค่า (values, offset) - raise InvalidCursor ถ้า cursor ผิดรูปแบบ"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, offset = payload['k'], int(payload.get('o', 0))
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeDecodeError, RecursionError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != key_count or offset < 0:
+        raise InvalidCursor(cursor)
+    return values, offset
+
+
+def _key_value(obj, path):
+    if isinstance(obj, dict):
+        return obj[path]
+    for attr in path.split('__'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _key_field(model, path):
+    """field ของ model ตาม path (เช่น 'student__last_name') หรือ None ถ้าไม่ใช่ field (เช่น annotation)"""
+    field = None
+    for name in path.split('__'):
+        if field is not None:
+            if not field.is_relation:
+                return None
+            model = field.related_model
+        try:
+            field = model._meta.get_field('id' if name == 'pk' else name)
+        except FieldDoesNotExist:
+            return None
+    return field
+
+
+def clean_values(model, ordering, values):
+    """
+    แปลงค่าจาก cursor เป็นชนิดของ field (to_python + validators เช่นช่วงของ integer)
+    raise ValidationError/ValueError/TypeError ถ้าค่าใช้กับ field ไม่ได้
+    """
+    cleaned = []
+    for key, value in zip(ordering, values):
+        if value is None or isinstance(value, (dict, list)):
+            raise ValidationError('invalid cursor value')
+        if isinstance(value, str) and '\x00' in value:
+            raise ValidationError('invalid cursor value')
+        field = _key_field(model, key.lstrip('-'))
+        if field is not None:
+            value = field.to_python(value)
+            field.run_validators(value)
+        cleaned.append(value)
+    return cleaned
+
+
+def seek_filter(ordering, values):
+    """
+    เงื่อนไข "อยู่หลังแถว values" ตาม ordering (row-value comparison แบบกระจาย OR)
+    (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND id > z)
+    ค่าที่เป็น string (เช่น datetime จาก JSON) จะถูกแปลงโดย field ของ Django เอง
+    """
+    condition = Q()
+    for i, key in enumerate(ordering):
+        name = key.lstrip('-')
+        lookup = 'lt' if key.startswith('-') else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[i]})
+        for prev_key, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev_key.lstrip('-'): prev_value})
+        condition |= step
+    return condition
+
+
+def paginate(queryset, ordering, cursor=None, per_page=DEFAULT_PER_PAGE):
+    """
+    ดึงหนึ่งหน้าจาก queryset เรียงตาม ordering (เริ่มหลัง cursor ถ้ามี)
+    ใช้ query เดียว (LIMIT per_page + 1 เพื่อรู้ว่ามีหน้าถัดไปหรือไม่) ไม่มี COUNT
+    """
+    ordering = stable_ordering(ordering)
+    queryset = queryset.order_by(*ordering)
+    offset = 0
+    if cursor:
+        values, offset = decode_cursor(cursor, len(ordering))
+        try:
+            values = clean_values(queryset.model, ordering, values)
+            queryset = queryset.filter(seek_filter(ordering, values))
+        except (ValidationError, ValueError, TypeError, OverflowError):
+            raise InvalidCursor(cursor)
+
+    rows = list(queryset[:per_page + 1])
+    page = KeysetPage(object_list=rows[:per_page], per_page=per_page, offset=offset)
+    if len(rows) > per_page:
+        last = page.object_list[-1]
+        page.next_cursor = encode_cursor(
+            [_key_value(last, key.lstrip('-')) for key in ordering],
+            offset + per_page,
+        )
+    return page
+
+
+def _per_page(request, default):
+    try:
+        per_page = int(request.GET.get('per_page', default))
+    except (TypeError, ValueError):
+        return default
+    return min(max(per_page, 1), MAX_PER_PAGE)
+
+
+def _page_url(request, cursor):
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    params.pop('format', None)
+    if cursor:
+        params['cursor'] = cursor
+    query = params.urlencode()
+    return f'{request.path}?{query}' if query else request.path
+
+
+def paginate_request(request, queryset, ordering, per_page=DEFAULT_PER_PAGE):
+    """
+    paginate จาก ?cursor= และ ?per_page= ของ request
+    cursor ที่ผิดรูปแบบ (เช่นแก้ URL เอง) จะกลับไปหน้าแรก
+    ลิงก์หน้าถัดไป/หน้าแรกคงตัวกรองอื่นใน query string ไว้
+    """
+    per_page = _per_page(request, per_page)
+    try:
+        page = paginate(queryset, ordering, request.GET.get('cursor'), per_page)
+    except InvalidCursor:
+        page = paginate(queryset, ordering, None, per_page)
+    if page.has_next:
+        page.next_url = _page_url(request, page.next_cursor)
+    page.first_url = _page_url(request, None)
+    return page
+
+
+def wants_json(request):
+    return request.GET.get('format') == 'json'
+
+
+def json_page(page, serialize):
+    """JSON ของหนึ่งหน้าสำหรับ infinite scroll (serialize: object -> dict)"""
+    return JsonResponse({
+        'results': [serialize(obj) for obj in page],
+        'next_cursor': page.next_cursor,
+        'has_next': page.has_next,
+    })
@@ -0,0 +1,203 @@
+"""
+Per-view profiling (ใช้โดย checkin_project.middleware.ProfilingMiddleware)
+
+วัดต่อ request:
+- queries / db: จำนวน query และเวลารวมใน DB (connection.execute_wrapper ใช้ได้แม้ DEBUG=False)
+- template: เวลา render template (ไม่รวมเวลา DB ที่เกิดระหว่าง render)
+- python: เวลาที่เหลือ (total - db - template)
+
+ผลลัพธ์ถูกส่งเป็น Server-Timing header, log แบบ JSON (logger 'checkin_project.profiling')
+และเก็บย้อนหลัง PROFILING_HISTORY_SIZE request ต่อ URL name (ต่อ process) ไว้ดูที่ stats_view
+"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse
+
+from accounts.authz import is_admin
+
+
+HISTOGRAM_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+@dataclass
+class RequestProfile:
+    started: float
+    queries: int = 0
+    db_time: float = 0.0
+    template_time: float = 0.0
+    template_db_time: float = 0.0
+    template_depth: int = 0
+    total_time: float = 0.0
+
+    @property
+    def template_only_time(self):
+        return max(self.template_time - self.template_db_time, 0.0)
+
+    @property
+    def python_time(self):
+        return max(self.total_time - self.db_time - self.template_only_time, 0.0)
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+
+    def as_dict(self):
+        """ค่าเป็นมิลลิวินาที"""
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'template_ms': round(self.template_only_time * 1000, 2),
+            'python_ms': round(self.python_time * 1000, 2),
+            'total_ms': round(self.total_time * 1000, 2),
+        }
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_only_time * 1000:.1f}',
+            f'app;dur={self.python_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+
+_local = threading.local()
+
+
+def current():
+    """RequestProfile ของ request ที่กำลังทำงานใน thread นี้ (หรือ None)"""
+    return getattr(_local, 'profile', None)
+
+
+def start():
+    _local.profile = RequestProfile(started=time.perf_counter())
+    return _local.profile
+
+
+def stop():
+    profile = current()
+    _local.profile = None
+    if profile is not None:
+        profile.finish()
+    return profile
+
+
+def query_timer(execute, sql, params, many, context):
+    """connection.execute_wrapper - นับ query และเวลา DB ของ request ปัจจุบัน"""
+    profile = current()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        profile.queries += 1
+        profile.db_time += elapsed
+        if profile.template_depth:
+            profile.template_db_time += elapsed
+
+
+def install_template_timer():
+    """
+    ครอบ Template.render ของ Django template backend เพื่อจับเวลา render
+    (render() / TemplateResponse ผ่านเมธอดนี้เสมอ, include ภายในไม่ถูกนับซ้ำ)
+    """
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'profiled', False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        profile = current()
+        if profile is None:
+            return original(self, context, request)
+        started = time.perf_counter()
+        profile.template_depth += 1
+        try:
+            return original(self, context, request)
+        finally:
+            profile.template_depth -= 1
+            profile.template_time += time.perf_counter() - started
+
+    render.profiled = True
+    Template.render = render
+
+
+# Rolling history ต่อ URL name: deque ของ (total_ms, queries, db_ms)
+_history = {}
+_history_lock = threading.Lock()
+
+
+def history_size():
+    return getattr(settings, 'PROFILING_HISTORY_SIZE', 500)
+
+
+def record(view_name, profile):
+    sample = (profile.total_time * 1000, profile.queries, profile.db_time * 1000)
+    with _history_lock:
+        samples = _history.get(view_name)
+        if samples is None:
+            samples = _history[view_name] = deque(maxlen=history_size())
+        samples.append(sample)
+
+
+def reset():
+    with _history_lock:
+        _history.clear()
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def summarize(samples):
+    totals = sorted(sample[0] for sample in samples)
+    queries = [sample[1] for sample in samples]
+    histogram = {}
+    for bucket in HISTOGRAM_BUCKETS_MS:
+        histogram[f'<={bucket}ms'] = 0
+    histogram[f'>{HISTOGRAM_BUCKETS_MS[-1]}ms'] = 0
+    for total in totals:
+        label = next((f'<={b}ms' for b in HISTOGRAM_BUCKETS_MS if total <= b), f'>{HISTOGRAM_BUCKETS_MS[-1]}ms')
+        histogram[label] += 1
+    return {
+        'count': len(totals),
+        'p50_ms': round(_percentile(totals, 0.50), 2),
+        'p90_ms': round(_percentile(totals, 0.90), 2),
+        'p99_ms': round(_percentile(totals, 0.99), 2),
+        'max_ms': round(totals[-1], 2),
+        'avg_queries': round(sum(queries) / len(queries), 1),
+        'max_queries': max(queries),
+        'avg_db_ms': round(sum(sample[2] for sample in samples) / len(samples), 2),
+        'histogram': histogram,
+    }
+
+
+def snapshot():
+    """{view_name: สรุปสถิติ} เรียงตาม p90 จากช้าไปเร็ว"""
+    with _history_lock:
+        items = [(name, list(samples)) for name, samples in _history.items() if samples]
+    stats = {name: summarize(samples) for name, samples in items}
+    return dict(sorted(stats.items(), key=lambda item: item[1]['p90_ms'], reverse=True))
+
+
+@login_required
+@user_passes_test(is_admin)
+def stats_view(request):
+    """
+    สถิติเวลาตอบสนองต่อ view (Admin only) - ข้อมูลของ worker process ที่ตอบ request นี้
+    ?reset=1 ล้างข้อมูลหลังอ่าน
+    """
+    data = {
+        'enabled': getattr(settings, 'PROFILING_ENABLED', False),
+        'history_size': history_size(),
+        'views': snapshot(),
+    }
+    if request.GET.get('reset'):
+        reset()
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
@@ -60,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'checkin_project.middleware.StaticFilesCacheMiddleware',  # Custom middleware for cache headers
+    'checkin_project.middleware.ProfilingMiddleware',  # Server-Timing / per-view stats (PROFILING_ENABLED)
 ]
 
 ROOT_URLCONF = 'checkin_project.urls'
@@ -173,3 +174,63 @@ CSRF_COOKIE_AGE = 60 * 60 * 24 * 365  # 1 year
 # แต่เราสามารถใช้ middleware เพื่อเพิ่ม headers ได้
 STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
 
+
+# Attendance roster cache (scan_qr)
+# 'django' = ใช้ CACHES (ตั้ง CACHES เป็น Redis/Memcached เมื่อมีหลาย worker),
+# 'local' = หน่วยความจำของแต่ละ process (ใช้ได้เฉพาะ worker เดียว - การล้าง cache ไม่ข้าม process)
+ATTENDANCE_ROSTER_CACHE_BACKEND = config('ATTENDANCE_ROSTER_CACHE_BACKEND', default='django')
+ATTENDANCE_ROSTER_CACHE_ALIAS = config('ATTENDANCE_ROSTER_CACHE_ALIAS', default='default')
+
+# Write-behind buffered ingestion ของ AttendanceRecord (ปิดเป็นค่าเริ่มต้น)
+# เมื่อเปิด scan_qr จะตอบรับทันทีและเขียนลง DB เป็นชุด โดยมี journal บนดิสก์กันข้อมูลหาย
+ATTENDANCE_BUFFERED_INGESTION = config('ATTENDANCE_BUFFERED_INGESTION', default=False, cast=bool)
+ATTENDANCE_INGEST_BATCH_SIZE = config('ATTENDANCE_INGEST_BATCH_SIZE', default=500, cast=int)
+ATTENDANCE_INGEST_FLUSH_INTERVAL = config('ATTENDANCE_INGEST_FLUSH_INTERVAL', default=2, cast=float)
+ATTENDANCE_INGEST_JOURNAL_DIR = config('ATTENDANCE_INGEST_JOURNAL_DIR', default=str(BASE_DIR / 'var' / 'attendance_journal'))
+
+# การเช็คชื่อแจ้ง summary_changed (ล้าง teacher dashboard) รวมครั้งเดียวต่อกลุ่มเรียนทุก N วินาที (0 = ทันที)
+ATTENDANCE_SUMMARY_NOTIFY_INTERVAL = config('ATTENDANCE_SUMMARY_NOTIFY_INTERVAL', default=2, cast=float)
+
+# QR token หมุนทุก N วินาที (HMAC ด้วย SECRET_KEY) และยอมรับ token ของ window ก่อนหน้าได้อีก GRACE window
+ATTENDANCE_QR_ROTATION_SECONDS = config('ATTENDANCE_QR_ROTATION_SECONDS', default=30, cast=int)
+ATTENDANCE_QR_GRACE_WINDOWS = config('ATTENDANCE_QR_GRACE_WINDOWS', default=1, cast=int)
+
+# Export XLSX ผ่านเว็บสร้างทั้งไฟล์ใน request - จำกัดจำนวนกลุ่มเรียนต่อครั้ง (CSV ไม่จำกัด เพราะ streaming)
+# export ที่ใหญ่กว่านี้ใช้ python manage.py export_attendance
+ATTENDANCE_EXPORT_XLSX_MAX_SECTIONS = config('ATTENDANCE_EXPORT_XLSX_MAX_SECTIONS', default=10, cast=int)
+
+# Course catalog snapshot (academic.catalog, หน้า course_list) - cache แยกตามภาคเรียน
+# ล้างเมื่อรายวิชา/กลุ่มเรียน/การลงทะเบียนเปลี่ยน TIMEOUT เป็นขอบเขตสูงสุดเมื่อ cache แยกตาม process
+ACADEMIC_CATALOG_CACHE_ALIAS = config('ACADEMIC_CATALOG_CACHE_ALIAS', default='default')
+ACADEMIC_CATALOG_CACHE_TIMEOUT = config('ACADEMIC_CATALOG_CACHE_TIMEOUT', default=300, cast=int)
+
+# Teacher dashboard snapshot (teacher.dashboard) - cache ต่ออาจารย์ หมดอายุเมื่อมีการเช็คชื่อ
+# การลงทะเบียน เซสชัน หรือใบลาเปลี่ยน TIMEOUT เป็นขอบเขตสูงสุดเมื่อ cache แยกตาม process
+TEACHER_DASHBOARD_CACHE_ALIAS = config('TEACHER_DASHBOARD_CACHE_ALIAS', default='default')
+TEACHER_DASHBOARD_CACHE_TIMEOUT = config('TEACHER_DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)
+
+# Per-view profiling (checkin_project.middleware.ProfilingMiddleware)
+# เพิ่ม Server-Timing header, log JSON ต่อ request และสถิติย้อนหลังที่ /admin/profiling/
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_HISTORY_SIZE = config('PROFILING_HISTORY_SIZE', default=500, cast=int)
+
+# Startup-time budget (python manage.py startup_benchmark, ดู checkin_project/startup.py)
+# ตอน start ห้ามเปิด connection ฐานข้อมูล และห้าม import STARTUP_LAZY_MODULES (ให้ import ในฟังก์ชันที่ใช้)
+STARTUP_BUDGET_SECONDS = config('STARTUP_BUDGET_SECONDS', default=3.0, cast=float)
+STARTUP_APP_IMPORT_BUDGET_MS = config('STARTUP_APP_IMPORT_BUDGET_MS', default=150, cast=float)
+STARTUP_LAZY_MODULES = ('openpyxl', 'qrcode', 'PIL')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'checkin_project.profiling': {
+            'handlers': ['console'],
+            'level': config('PROFILING_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,166 @@
+"""
+Startup-time budget (ใช้โดย `python manage.py startup_benchmark`)
+
+วัด cold start ของ worker ใน process ใหม่ (python -X importtime) ทีละรอบ:
+- cold_start: เวลาตั้งแต่เริ่ม interpreter จนโหลด URLconf เสร็จ (เหมือน gunicorn worker ก่อนรับ request แรก)
+- setup / urlconf: เวลา django.setup() (apps + models) และการโหลด URLconf (views)
+- import cost ต่อ package: ผลรวม self time ของทุก module ใน package จาก -X importtime
+
+และตรวจว่าตอน start:
+- ไม่มีการเปิด connection ฐานข้อมูล (ห้าม query/introspection ตอน import)
+- ไม่ได้โหลด dependency หนักที่ควร import เมื่อใช้ (STARTUP_LAZY_MODULES เช่น openpyxl, qrcode, PIL)
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+
+from django.apps import apps
+from django.conf import settings
+
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+done = time.perf_counter()
+from django.db import connections
+print(json.dumps({
+    'setup': setup - start,
+    'urlconf': done - setup,
+    'connections': [c.alias for c in connections.all(initialized_only=True) if c.connection is not None],
+    'modules': sorted({name.split('.')[0] for name in sys.modules}),
+}))
+"""
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+\d+\s+\|\s+(\S.*)$')
+
+
+@dataclass
+class StartupReport:
+    runs: int
+    cold_start: float                                      # วินาที (median)
+    setup: float
+    urlconf: float
+    imports: dict = field(default_factory=dict)            # package -> ms (median ของ self time)
+    connections: list = field(default_factory=list)        # connection ที่ถูกเปิดตอน start
+    lazy_loaded: list = field(default_factory=list)        # STARTUP_LAZY_MODULES ที่ถูกโหลดตอน start
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def local_packages():
+    """package ของโปรเจกต์ (app ที่อยู่ใต้ BASE_DIR และ package ของ settings/URLconf)"""
+    base = str(settings.BASE_DIR)
+    packages = {
+        config.name.split('.')[0]
+        for config in apps.get_app_configs()
+        if str(config.path).startswith(base)
+    }
+    packages.add(settings.SETTINGS_MODULE.split('.')[0])
+    packages.add(settings.ROOT_URLCONF.split('.')[0])
+    return sorted(packages)
+
+
+def lazy_modules():
+    return tuple(getattr(settings, 'STARTUP_LAZY_MODULES', ('openpyxl', 'qrcode', 'PIL')))
+
+
+def _import_costs(stderr):
+    """{top-level package: ms} จากผลของ -X importtime"""
+    costs = defaultdict(float)
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            costs[match.group(2).strip().split('.')[0]] += int(match.group(1)) / 1000
+    return costs
+
+
+def probe():
+    """cold start หนึ่งรอบใน process ใหม่ คืนค่า (wall seconds, probe result, import costs)"""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+    env.setdefault('PYTHONPATH', os.pathsep.join(sys.path))
+    # นับเวลารวม interpreter start - ใช้ perf_counter ของ process แม่
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=str(settings.BASE_DIR), env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'probe failed')
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return wall, result, _import_costs(completed.stderr)
+
+
+def measure(runs=3):
+    """รัน probe() runs รอบแล้วใช้ค่า median (รอบแรกอาจช้ากว่าเพราะ .pyc/disk cache)"""
+    walls, setups, urlconfs = [], [], []
+    costs = defaultdict(list)
+    connections, loaded = set(), set()
+    lazy = lazy_modules()
+    for _ in range(max(runs, 1)):
+        wall, result, imports = probe()
+        walls.append(wall)
+        setups.append(result['setup'])
+        urlconfs.append(result['urlconf'])
+        for package, ms in imports.items():
+            costs[package].append(ms)
+        connections.update(result['connections'])
+        loaded.update(name for name in lazy if name in result['modules'])
+    return StartupReport(
+        runs=len(walls),
+        cold_start=statistics.median(walls),
+        setup=statistics.median(setups),
+        urlconf=statistics.median(urlconfs),
+        imports={package: round(statistics.median(values), 1) for package, values in costs.items()},
+        connections=sorted(connections),
+        lazy_loaded=sorted(loaded),
+    )
+
+
+def violations(report, baseline=None, tolerance=0.25):
+    """
+    รายการข้อความที่เกินงบ (ว่าง = ผ่าน)
+    baseline: StartupReport.as_dict() ที่บันทึกไว้ - เกิน baseline * (1 + tolerance) ถือว่า regression
+    """
+    problems = []
+    if report.connections:
+        problems.append(f'database connection opened at import time: {", ".join(report.connections)}')
+    if report.lazy_loaded:
+        problems.append(f'heavy modules imported at startup: {", ".join(report.lazy_loaded)}')
+
+    budget = getattr(settings, 'STARTUP_BUDGET_SECONDS', 3.0)
+    if report.cold_start > budget:
+        problems.append(f'cold start {report.cold_start:.2f}s exceeds budget {budget:.2f}s')
+
+    app_budget = getattr(settings, 'STARTUP_APP_IMPORT_BUDGET_MS', 150)
+    for package in local_packages():
+        ms = report.imports.get(package, 0)
+        if ms > app_budget:
+            problems.append(f'import of {package} takes {ms:.1f}ms (budget {app_budget}ms)')
+
+    if baseline:
+        limit = baseline['cold_start'] * (1 + tolerance)
+        if report.cold_start > limit:
+            problems.append(
+                f'cold start regressed: {report.cold_start:.2f}s vs baseline {baseline["cold_start"]:.2f}s '
+                f'(+{tolerance:.0%} allowed)'
+            )
+        for package in local_packages():
+            before = baseline.get('imports', {}).get(package)
+            ms = report.imports.get(package, 0)
+            # ไม่นับการเปลี่ยนแปลงเล็กน้อย (noise ของ timer) ต่ำกว่า 5ms
+            if before is not None and ms > max(before * (1 + tolerance), before + 5):
+                problems.append(f'import of {package} regressed: {ms:.1f}ms vs baseline {before:.1f}ms')
+    return problems
@@ -0,0 +1,43 @@
+"""
+Test helpers
+
+query_budget: กำหนดจำนวน query สูงสุดของโค้ดที่ทดสอบ (จับ N+1 ก่อนขึ้น production)
+
+    @query_budget(8)
+    def test_course_list(self):
+        self.client.get('/academic/courses/')
+
+    with query_budget(3):
+        ...
+"""
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class query_budget(ContextDecorator):
+    """Decorator/context manager - fail ถ้ามี query เกิน max_queries"""
+
+    def __init__(self, max_queries, using=DEFAULT_DB_ALIAS):
+        self.max_queries = max_queries
+        self.using = using
+        self.context = None
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        return self.context.__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        executed = len(self.context)
+        if executed > self.max_queries:
+            queries = '\n'.join(
+                f'{i}. {query["sql"]}' for i, query in enumerate(self.context.captured_queries, start=1)
+            )
+            raise AssertionError(
+                f'{executed} queries executed, budget is {self.max_queries}\n{queries}'
+            )
+        return False
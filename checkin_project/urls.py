@@ -5,8 +5,10 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from . import profiling
 
 urlpatterns = [
+    path('admin/profiling/', profiling.stats_view, name='profiling_stats'),
     path('admin/', admin.site.urls),
     path('', include('accounts.urls')),
     path('academic/', include('academic.urls')),
@@ -5,3 +5,6 @@ class TeacherConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'teacher'
 
+    def ready(self):
+        from . import signals  # noqa: F401
+
@@ -0,0 +1,232 @@
+"""
+Teacher dashboard snapshot (dashboard_view)
+
+สถิติต่อกลุ่มเรียนของอาจารย์: จำนวนนักศึกษา, จำนวนเซสชันที่สอนแล้ว, อัตราการเข้าเรียนเฉลี่ย,
+เซสชันของวันนี้ และจำนวนใบลาที่รอพิจารณา สร้างด้วย query คงที่ 6 ตัวไม่ขึ้นกับจำนวนกลุ่มเรียน
+แล้วเก็บใน cache แยกตามอาจารย์ (dict ธรรมดา ไม่ pickle model เหมือน academic.catalog)
+
+Invalidation แบบ event-driven ด้วยเลข version ใน cache (ไม่แตะฐานข้อมูล):
+- version ต่อกลุ่มเรียน: invalidate_sections() - เรียกเมื่อตัวนับการลงทะเบียนเปลี่ยน (academic.counters.apply)
+  และจาก signals.py (เซสชัน ใบลา กลุ่มเรียน รายวิชา และ attendance.summary.summary_changed ซึ่งรวมการเช็คชื่อ
+  เป็นครั้งเดียวต่อกลุ่มเรียน - ใช้ bump_sections() เพราะส่งหลัง commit อยู่แล้ว)
+- version ต่ออาจารย์: invalidate_teacher() - เมื่อมีกลุ่มเรียนถูกมอบหมายให้อาจารย์
+snapshot เก็บ version ที่อ่านไว้ก่อนสร้าง - ถ้า version ใดเปลี่ยน snapshot นั้นหมดอายุ
+
+กัน stampede: เมื่อ snapshot หมดอายุ มี request เดียวที่สร้างใหม่ (lock ด้วย cache.add)
+request อื่นของอาจารย์คนเดียวกันใช้ snapshot เดิมไปก่อน
+`python manage.py warm_teacher_dashboards` สร้าง snapshot ของทุกคนล่วงหน้า (เช่นก่อนเริ่มคาบเช้า)
+
+ตั้งค่า cache ที่ settings.TEACHER_DASHBOARD_CACHE_ALIAS / TEACHER_DASHBOARD_CACHE_TIMEOUT
+(cache แบบ locmem แยกตาม process - ถ้ามีหลาย worker ควรใช้ Redis/Memcached)
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Sum
+from django.utils import timezone
+
+
+LOCK_SECONDS = 30
+
+
+def _cache():
+    return caches[getattr(settings, 'TEACHER_DASHBOARD_CACHE_ALIAS', 'default')]
+
+
+def _key(teacher_id):
+    return f'teacher:dashboard:{teacher_id}'
+
+
+def _lock_key(teacher_id):
+    return f'teacher:dashboard:{teacher_id}:lock'
+
+
+def _teacher_version_key(teacher_id):
+    return f'teacher:dashboard:version:teacher:{teacher_id}'
+
+
+def _section_version_key(section_id):
+    return f'teacher:dashboard:version:section:{section_id}'
+
+
+def _new_version():
+    # เริ่มจากเวลาปัจจุบัน - ถ้า version key ถูก evict จะไม่ตรงกับ version ที่ snapshot เก่าเก็บไว้
+    return time.time_ns()
+
+
+def _bump(keys):
+    cache = _cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def _versions(cache, keys):
+    """version ปัจจุบันของ keys (สร้างใหม่ถ้ายังไม่มี)"""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = _new_version()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+            versions[key] = version
+    return versions
+
+
+def _section_keys(section_ids):
+    return [_section_version_key(section_id) for section_id in set(section_ids) if section_id is not None]
+
+
+def invalidate_sections(section_ids):
+    """ทำให้ snapshot ของอาจารย์ที่สอนกลุ่มเรียนเหล่านี้หมดอายุ (หลัง transaction commit)"""
+    keys = _section_keys(section_ids)
+    if keys:
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def bump_sections(section_ids):
+    """เหมือน invalidate_sections แต่ทันที (ผู้เรียกอยู่หลัง commit แล้ว - ไม่แตะ connection ของฐานข้อมูล)"""
+    _bump(_section_keys(section_ids))
+
+
+def invalidate_teacher(teacher_id):
+    """ทำให้ snapshot ของอาจารย์หมดอายุ (เช่นได้รับมอบหมายกลุ่มเรียนใหม่)"""
+    if teacher_id is not None:
+        transaction.on_commit(lambda: _bump([_teacher_version_key(teacher_id)]))
+
+
+def build(teacher_id, today=None):
+    """
+    รายการ dict ต่อกลุ่มเรียน: id, section_number, course (course_code, course_name), semester,
+    enrolled_count, sessions_held, last_session_at, attendance_rate (None ถ้ายังไม่มีเซสชัน),
+    today_session (id, session_datetime, expires_at หรือ None), pending_leaves
+    """
+    from academic.models import Enrollment, Section
+    from attendance.models import AttendanceSession, AttendanceSummary, LeaveRequest
+    from attendance.roster_cache import QR_LIFETIME
+
+    today = today or timezone.localdate()
+    sections = list(
+        Section.objects.filter(teacher_id=teacher_id)
+        .order_by('course__course_code', 'section_number', 'id')
+        .values(
+            'id', 'section_number', 'enrolled_count',
+            'course__course_code', 'course__course_name',
+            'semester__semester_number', 'semester__academic_year__year',
+        )
+    )
+    section_ids = [section['id'] for section in sections]
+
+    held = {
+        row['section_id']: row
+        for row in AttendanceSession.objects.filter(section_id__in=section_ids)
+        .order_by().values('section_id').annotate(n=Count('id'), last=Max('session_datetime'))
+    }
+    # เซสชันล่าสุดของวันนี้ที่ยังเปิดอยู่ต่อกลุ่มเรียน (หมดเวลาหรือไม่ ตัดสินตอนแสดงผล)
+    today_sessions = {}
+    for session in (
+        AttendanceSession.objects.filter(section_id__in=section_ids, session_date=today, is_active=True)
+        .order_by('section_id', '-session_datetime', '-id')
+        .values('id', 'section_id', 'session_datetime', 'created_at')
+    ):
+        today_sessions.setdefault(session['section_id'], {
+            'id': session['id'],
+            'session_datetime': session['session_datetime'],
+            'expires_at': session['created_at'] + QR_LIFETIME if session['created_at'] else None,
+        })
+    # มาเรียน (present + late) ของนักศึกษาที่ยังลงทะเบียนอยู่ จาก AttendanceSummary (นิยามเดียวกับ stats.py)
+    attended = dict(
+        AttendanceSummary.objects.filter(section_id__in=section_ids)
+        .filter(Exists(Enrollment.objects.filter(
+            section_id=OuterRef('section_id'), student_id=OuterRef('student_id'), status='enrolled',
+        )))
+        .order_by().values('section_id').annotate(n=Sum(F('present_count') + F('late_count')))
+        .values_list('section_id', 'n')
+    )
+    pending = dict(
+        LeaveRequest.objects.filter(section_id__in=section_ids, status='pending')
+        .order_by().values('section_id').annotate(n=Count('id')).values_list('section_id', 'n')
+    )
+
+    result = []
+    for section in sections:
+        sessions_held = held.get(section['id'], {}).get('n', 0)
+        # อัตราเฉลี่ย = มาเรียนรวม / (เซสชัน × นักศึกษาที่ลงทะเบียน)
+        possible = sessions_held * section['enrolled_count']
+        rate = round(min((attended.get(section['id']) or 0) / possible * 100, 100), 1) if possible else None
+        result.append({
+            'id': section['id'],
+            'section_number': section['section_number'],
+            'course': {'course_code': section['course__course_code'], 'course_name': section['course__course_name']},
+            'semester': f'{section["semester__semester_number"]}/{section["semester__academic_year__year"]}',
+            'enrolled_count': section['enrolled_count'],
+            'sessions_held': sessions_held,
+            'last_session_at': held.get(section['id'], {}).get('last'),
+            'attendance_rate': rate,
+            'today_session': today_sessions.get(section['id']),
+            'pending_leaves': pending.get(section['id'], 0),
+        })
+    return result
+
+
+def _fresh(cache, entry):
+    return cache.get_many(list(entry['versions'])) == entry['versions']
+
+
+def _rebuild(cache, teacher_id, today):
+    from academic.models import Section
+
+    # อ่าน version ก่อน query - ถ้ามีการเปลี่ยนแปลงระหว่างสร้าง snapshot นี้จะหมดอายุทันที
+    teacher_key = _teacher_version_key(teacher_id)
+    versions = _versions(cache, [teacher_key])
+    section_ids = Section.objects.filter(teacher_id=teacher_id).values_list('id', flat=True)
+    versions.update(_versions(cache, [_section_version_key(section_id) for section_id in section_ids]))
+    entry = {'date': today, 'versions': versions, 'sections': build(teacher_id, today)}
+    cache.set(_key(teacher_id), entry, getattr(settings, 'TEACHER_DASHBOARD_CACHE_TIMEOUT', 300))
+    return entry
+
+
+def snapshot(teacher_id, now=None):
+    """
+    build() ผ่าน cache พร้อม active_session (เซสชันวันนี้ที่ QR ยังไม่หมดอายุ ณ เวลา now)
+    คืนค่า list ใหม่ทุกครั้ง (แก้ไขได้โดยไม่กระทบ cache)
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    cache = _cache()
+    entry = cache.get(_key(teacher_id))
+    if entry is None or entry['date'] != today:
+        # ไม่มี snapshot ที่ใช้แทนได้ - ต้องสร้างเอง
+        entry = _rebuild(cache, teacher_id, today)
+    elif not _fresh(cache, entry) and cache.add(_lock_key(teacher_id), 1, LOCK_SECONDS):
+        try:
+            entry = _rebuild(cache, teacher_id, today)
+        finally:
+            cache.delete(_lock_key(teacher_id))
+    # หมดอายุแต่ไม่ได้ lock: มี request อื่นกำลังสร้างใหม่ ใช้ snapshot เดิมไปก่อน
+
+    sections = []
+    for section in entry['sections']:
+        session = section['today_session']
+        active = session if session and session['expires_at'] and session['expires_at'] > now else None
+        sections.append({**section, 'active_session': active})
+    return sections
+
+
+def warm(teacher_ids=None):
+    """สร้าง snapshot ของอาจารย์ (ทั้งหมดถ้าไม่ระบุ) คืนค่าจำนวนอาจารย์"""
+    from accounts.models import User
+
+    if teacher_ids is None:
+        teacher_ids = User.objects.filter(role='teacher', is_active=True).values_list('id', flat=True)
+    cache = _cache()
+    today = timezone.localdate()
+    count = 0
+    for teacher_id in teacher_ids:
+        _rebuild(cache, teacher_id, today)
+        count += 1
+    return count
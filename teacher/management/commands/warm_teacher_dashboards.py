@@ -0,0 +1,22 @@
+"""
+สร้าง dashboard snapshot ของอาจารย์ล่วงหน้า (ดู teacher/dashboard.py)
+
+    python manage.py warm_teacher_dashboards                 # อาจารย์ทุกคน (เช่น cron ก่อนเริ่มคาบเช้า)
+    python manage.py warm_teacher_dashboards --teacher 5 8   # เฉพาะอาจารย์ที่กำหนด
+
+ใช้ได้เมื่อ TEACHER_DASHBOARD_CACHE_ALIAS เป็น cache ที่ใช้ร่วมกันทุก worker (Redis/Memcached)
+"""
+from django.core.management.base import BaseCommand
+
+from teacher import dashboard
+
+
+class Command(BaseCommand):
+    help = 'Pre-build cached teacher dashboard snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teacher', type=int, nargs='+', dest='teachers', help='Teacher user id(s)')
+
+    def handle(self, *args, **options):
+        count = dashboard.warm(options['teachers'])
+        self.stdout.write(self.style.SUCCESS(f'Warmed {count} teacher dashboard(s)'))
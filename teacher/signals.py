@@ -0,0 +1,47 @@
+"""
+Signal handlers for teacher app
+- ทำให้ dashboard snapshot (dashboard.py) หมดอายุเมื่อเซสชัน ใบลา กลุ่มเรียน หรือรายวิชาเปลี่ยน
+  และเมื่อ attendance.summary ส่ง summary_changed (การเช็คชื่อ การแก้สถานะ ใบลาที่อนุมัติ)
+  และเมื่อ academic.counters ส่ง counters_changed (ตัวนับการลงทะเบียนของกลุ่มเรียนเปลี่ยน)
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from academic.counters import counters_changed
+from academic.models import Course, Section
+from attendance.models import AttendanceSession, LeaveRequest
+from attendance.summary import summary_changed
+from . import dashboard
+
+
+@receiver(summary_changed)
+def invalidate_dashboard_on_summary_change(sender, section_ids, **kwargs):
+    dashboard.bump_sections(section_ids)
+
+
+@receiver(counters_changed)
+def invalidate_dashboard_on_counters_change(sender, section_ids, **kwargs):
+    # ส่งภายใน transaction - invalidate_sections รอ commit
+    dashboard.invalidate_sections(section_ids)
+
+
+@receiver(post_save, sender=AttendanceSession)
+@receiver(post_delete, sender=AttendanceSession)
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+def invalidate_dashboard_on_section_data_change(sender, instance, **kwargs):
+    dashboard.invalidate_sections([instance.section_id])
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+def invalidate_dashboard_on_section_change(sender, instance, **kwargs):
+    # อาจารย์เดิม (ถ้าเปลี่ยนผู้สอน) มีกลุ่มเรียนนี้ใน snapshot อยู่แล้ว - อาจารย์ใหม่ต้องรู้ว่ามีกลุ่มเรียนเพิ่ม
+    dashboard.invalidate_sections([instance.id])
+    dashboard.invalidate_teacher(instance.teacher_id)
+
+
+@receiver(post_save, sender=Course)
+def invalidate_dashboard_on_course_save(sender, instance, created, **kwargs):
+    if not created:
+        dashboard.invalidate_sections(instance.sections.values_list('id', flat=True))
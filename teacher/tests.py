@@ -1,4 +1,152 @@
-from django.test import TestCase
+"""
+- Teacher dashboard: snapshot ต่ออาจารย์สร้างด้วย query คงที่ อ่านซ้ำจาก cache โดยไม่แตะฐานข้อมูล
+  และหมดอายุเมื่อมีการเช็คชื่อ การลงทะเบียน เซสชัน หรือใบลาเปลี่ยน (dashboard.py)
+  การเช็คชื่อจาก scan_qr รวมเป็นการล้างครั้งเดียวต่อกลุ่มเรียน (attendance.summary.flush_checkins)
+"""
+import datetime
 
-# Create your tests here.
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
 
+from academic.models import AcademicYear, Course, Enrollment, Section, Semester
+from accounts.models import User
+from attendance.models import AttendanceRecord, AttendanceSession, LeaveRequest
+from . import dashboard
+
+
+class DashboardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        year = AcademicYear.objects.create(year='2566')
+        semester = Semester.objects.create(
+            academic_year=year, semester_number=1,
+            start_date=datetime.date(2023, 6, 1), end_date=datetime.date(2023, 9, 30),
+        )
+        cls.course = Course.objects.create(course_code='CS300', course_name='Databases', credit=3)
+        cls.teacher = User.objects.create_user('teacher', password='pw', role='teacher')
+        cls.other_teacher = User.objects.create_user('teacher2', password='pw', role='teacher')
+        cls.section = Section.objects.create(course=cls.course, semester=semester, section_number='1', teacher=cls.teacher)
+        cls.other_section = Section.objects.create(
+            course=cls.course, semester=semester, section_number='2', teacher=cls.other_teacher,
+        )
+        cls.students = [User.objects.create_user(f'66{i:03d}', password='pw', role='student') for i in range(4)]
+        for student in cls.students:
+            Enrollment.objects.create(student=student, section=cls.section, status='enrolled')
+        past = timezone.localdate() - datetime.timedelta(days=7)
+        cls.past_session = cls.create_session(past)
+        for student in cls.students[:3]:
+            AttendanceRecord.objects.create(session=cls.past_session, student=student, status='present')
+        from attendance import summary
+        summary.rebuild()
+
+    @classmethod
+    def create_session(cls, date, time=datetime.time(8, 0)):
+        return AttendanceSession.objects.create(
+            section=cls.section, teacher=cls.teacher, session_date=date, session_time=time,
+        )
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def section_row(self, teacher=None):
+        rows = dashboard.snapshot((teacher or self.teacher).id)
+        return rows[0] if rows else None
+
+    def test_snapshot_stats(self):
+        with self.assertNumQueries(6):
+            row = self.section_row()
+        self.assertEqual(row['enrolled_count'], 4)
+        self.assertEqual(row['sessions_held'], 1)
+        self.assertEqual(row['attendance_rate'], 75.0)
+        self.assertEqual(row['pending_leaves'], 0)
+        self.assertIsNone(row['active_session'])
+        self.assertEqual(row['course']['course_code'], 'CS300')
+
+    def test_cached_until_invalidated(self):
+        self.section_row()
+        with self.assertNumQueries(0):
+            self.section_row()
+
+    def test_check_in_and_session_invalidate(self):
+        self.section_row()
+        with self.captureOnCommitCallbacks(execute=True):
+            session = self.create_session(timezone.localdate())
+        row = self.section_row()
+        self.assertEqual(row['sessions_held'], 2)
+        self.assertEqual(row['active_session']['id'], session.id)
+        self.assertEqual(row['attendance_rate'], 37.5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceRecord.objects.create(session=session, student=self.students[0], status='late')
+        self.assertEqual(self.section_row()['attendance_rate'], 50.0)
+
+    @override_settings(ATTENDANCE_SUMMARY_NOTIFY_INTERVAL=60)
+    def test_check_ins_collapse_to_one_bump_per_section(self):
+        from attendance import summary
+
+        session = self.create_session(timezone.localdate())
+        self.section_row()
+        sent = []
+        receiver = lambda sender, section_ids, **kwargs: sent.append(section_ids)  # noqa: E731
+        summary.summary_changed.connect(receiver)
+        self.addCleanup(summary.summary_changed.disconnect, receiver)
+
+        for student in self.students:
+            with self.captureOnCommitCallbacks(execute=True):
+                AttendanceRecord.objects.bulk_create([AttendanceRecord(session=session, student=student, status='present')])
+                summary.record_created(self.section.id, student.id, 'present', timezone.now())
+        # ยังไม่ flush: snapshot เดิมยังใช้ได้ และยังไม่มีการล้าง
+        self.assertEqual(sent, [])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.section_row()['attendance_rate'], 37.5)
+
+        self.assertEqual(summary.flush_checkins(), 1)
+        self.assertEqual(sent, [{self.section.id}])
+        self.assertEqual(self.section_row()['attendance_rate'], 87.5)
+        self.assertEqual(summary.flush_checkins(), 0)
+
+    def test_leave_and_enrollment_changes_invalidate(self):
+        self.section_row()
+        with self.captureOnCommitCallbacks(execute=True):
+            leave = LeaveRequest.objects.create(
+                student=self.students[3], section=self.section, leave_date=timezone.localdate(), reason='-',
+            )
+        self.assertEqual(self.section_row()['pending_leaves'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            leave.status = 'approved'
+            leave.save()
+            Enrollment.objects.filter(student=self.students[3]).delete()
+        row = self.section_row()
+        self.assertEqual(row['pending_leaves'], 0)
+        self.assertEqual(row['enrolled_count'], 3)
+        self.assertEqual(row['attendance_rate'], 100.0)
+
+    def test_section_reassignment(self):
+        self.section_row(self.other_teacher)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.section.teacher = self.other_teacher
+            self.section.save()
+        self.assertIsNone(self.section_row())
+        self.assertEqual(len(dashboard.snapshot(self.other_teacher.id)), 2)
+
+    def test_stale_snapshot_served_while_rebuilding(self):
+        self.section_row()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_session(timezone.localdate())
+        # อีก request ถือ lock อยู่ - ใช้ snapshot เดิมโดยไม่ query
+        caches['default'].add(dashboard._lock_key(self.teacher.id), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.section_row()['sessions_held'], 1)
+        caches['default'].delete(dashboard._lock_key(self.teacher.id))
+        self.assertEqual(self.section_row()['sessions_held'], 2)
+
+    def test_dashboard_view(self):
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('teacher:dashboard'))
+        self.assertContains(response, 'Databases')
+        self.assertContains(response, '75.0%')
+        with self.assertNumQueries(2):  # session + user
+            self.client.get(reverse('teacher:dashboard'))
@@ -3,12 +3,8 @@ Views for teacher dashboard
 """
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required, user_passes_test
-from academic.models import Section
-
-
-def is_teacher(user):
-    """Check if user is teacher"""
-    return user.is_authenticated and user.is_teacher()
+from accounts.authz import is_teacher
+from . import dashboard
 
 
 @login_required
@@ -16,11 +12,13 @@ def is_teacher(user):
 def dashboard_view(request):
     """
     Teacher dashboard - หน้าหลักสำหรับอาจารย์
+    สถิติต่อกลุ่มเรียนอ่านจาก snapshot ใน cache (see dashboard.py)
     """
-    sections = Section.objects.filter(teacher=request.user).select_related('course', 'semester')
+    sections = dashboard.snapshot(request.user.id)
     
     context = {
         'sections': sections,
+        'active_sessions': [section for section in sections if section['active_session']],
+        'pending_leaves': sum(section['pending_leaves'] for section in sections),
     }
     return render(request, 'teacher/dashboard.html', context)
-